@@ -2,7 +2,7 @@
 核心模块
 """
 
-from .analysis_utils import ChatAnalysisUtils
+from .analysis_utils import ChatAnalysisUtils, ParsedMessage
 from .summary_image_generator import SummaryImageGenerator
 from .constants import (
     FontConfig,
@@ -14,6 +14,7 @@ from .constants import (
 
 __all__ = [
     'ChatAnalysisUtils',
+    'ParsedMessage',
     'SummaryImageGenerator',
     'FontConfig',
     'ColorScheme',
@@ -5,64 +5,589 @@
 """
 
 import re
+import copy
 import json
+import heapq
+import asyncio
+import hashlib
+from bisect import bisect_right
 from datetime import datetime
-from typing import List, Dict, Optional, Callable, Any
+from functools import lru_cache, wraps
+from itertools import accumulate
+from operator import attrgetter
+from typing import List, Dict, Optional, Callable, Any, Tuple, NamedTuple, Union
 from collections import Counter
 
 from src.config.config import model_config
 from src.plugin_system import llm_api, get_logger
 from .constants import AnalysisConfig
+from .ttl_cache import TTLCache
 
 logger = get_logger("chat_analysis_utils")
 
+# 优先使用 orjson 解析 LLM 返回的 JSON（未安装时回退到标准库）
+# orjson.JSONDecodeError 继承自 json.JSONDecodeError，异常处理无需区分
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+
+class ParsedMessage(NamedTuple):
+    """预处理后的消息（每条消息只解析一次，供各分析函数共用）"""
+    user_id: str        # 用户ID（字符串）
+    nickname: str       # 用户昵称
+    display_name: str   # 显示名称（优先群名片）
+    text: str           # 原始文本（None 已处理为空字符串）
+    clean_text: str     # 移除 @提及 并去除首尾空白后的文本
+    time_hm: str        # 发言时间 "%H:%M"
+    time_hms: str       # 发言时间 "%H:%M:%S"
+    hour: int           # 发言小时（0-23）
+    text_len: int       # 原始文本长度
+    emoji_count: int    # emoji 数量
+    timestamp: int      # 发言时间戳（秒，含日期）
+
+
+# 分析函数既接受原始消息字典，也接受预处理后的消息
+MessageList = Union[List[dict], List[ParsedMessage]]
+
+@lru_cache(maxsize=8192)
+def _minute_clock(minute: int) -> Tuple[int, str]:
+    """按分钟缓存本地时间的小时和 "%H:%M" 字符串（同一分钟内的消息共享结果）
+
+    Args:
+        minute: Unix 时间戳除以 60 取整
+
+    Returns:
+        (小时, "%H:%M")
+    """
+    dt = datetime.fromtimestamp(minute * 60)
+    return dt.hour, dt.strftime("%H:%M")
+
+
+# 单用户分析结果缓存：同一用户的消息没有变化时（重试、重复查询），跳过 prompt 构建和 LLM 请求
+_user_analysis_cache = TTLCache(
+    AnalysisConfig.USER_ANALYSIS_CACHE_SIZE, AnalysisConfig.USER_ANALYSIS_CACHE_TTL
+)
+
+
+def _user_messages_fingerprint(kind: str, user_messages: MessageList, user_name: str, user_id: str) -> str:
+    """计算单用户分析的缓存键（分析类型 + 用户 + 全部消息的时间戳和内容）
+
+    原始消息和预处理后的消息都使用整数时间戳，同一批消息得到相同的键，不同日期同一时刻的发言也不会冲突。
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{kind}\x00{user_id}\x00{user_name}\x00{len(user_messages)}".encode("utf-8"))
+    for msg in user_messages:
+        if isinstance(msg, ParsedMessage):
+            digest.update(f"\x00{msg.timestamp}\x00{msg.text}".encode("utf-8"))
+        else:
+            digest.update(f"\x00{int(msg.get('time', 0))}\x00{msg.get('processed_plain_text') or ''}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _cache_user_analysis(kind: str):
+    """单用户分析结果缓存装饰器
+
+    只缓存成功（非 None）的结果；写入和读取时都深拷贝，避免调用方修改返回值污染缓存。
+
+    Args:
+        kind: 分析类型（区分同一用户的不同分析）
+    """
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(user_messages: MessageList, user_name: str, user_id: str, *args, **kwargs):
+            if not user_messages:
+                return await func(user_messages, user_name, user_id, *args, **kwargs)
+
+            cache_key = _user_messages_fingerprint(kind, user_messages, user_name, user_id)
+            cached = await _user_analysis_cache.get(cache_key)
+            if cached is not None:
+                logger.debug(f"单用户分析命中缓存: {kind} {user_name}")
+                return copy.deepcopy(cached[0])
+
+            result = await func(user_messages, user_name, user_id, *args, **kwargs)
+            if result is not None:
+                await _user_analysis_cache.set(cache_key, (copy.deepcopy(result),))
+            return result
+        return wrapper
+    return decorator
+
+
+# 以下 *_PROMPT_PREFIX 为各项群聊分析 prompt 的固定部分：指令与返回格式在前，
+# 调用时把动态数据拼接在末尾，相同的前缀便于服务商缓存
+
+# 话题分析 prompt 的固定部分
+TOPICS_PROMPT_PREFIX = """从群聊记录中提取3-5个热门话题。
+
+要求：
+1. 话题标题4-8个字，简洁明了
+2. 参与者列表包含2-5个主要发言人
+3. 详情描述50-80字，说明讨论了什么、有什么有趣的观点
+4. 只提取有实质内容的话题，避免简单问候、闲聊
+5. 话题按热度排序（参与人数多、讨论深入的优先）
+
+返回JSON（不要markdown代码块，不要emoji）：
+[
+  {
+    "topic": "话题标题",
+    "contributors": ["参与者1", "参与者2"],
+    "detail": "话题详情描述"
+  }
+]
+
+---
+群聊记录：
+"""
+
+# 群友称号 prompt 的固定部分
+TITLES_PROMPT_PREFIX = """根据群友数据创造有趣的称号，并判断MBTI类型。
+
+要求：
+1. 称号2-4个汉字
+2. MBTI类型基于发言特征判断（如ENFP、INTJ等16种之一）
+   - E/I: 外向(话多、互动多) vs 内向(话少、深度思考)
+   - S/N: 实感(具体事实) vs 直觉(抽象概念)
+   - T/F: 思考(逻辑理性) vs 情感(感性表达)
+   - J/P: 判断(有条理) vs 知觉(随性自由)
+3. 基于真实数据，不要编造
+4. 避免重复类型（不要多个"龙王""话痨"）
+5. 有创意，避免陈词滥调
+6. **理由必须写满60-80字，引用具体数据说明为什么（发言数、平均字数、表情比例、夜间比例等），不要空洞，要详细**
+
+参考分类：活跃度（龙王、潜水员）、时间特征（夜猫子）、内容风格（段子手）、表情/情绪（表情帝）、互动特征（接梗高手）
+
+返回JSON（不要markdown代码块，不要emoji）：
+[
+  {
+    "name": "用户名",
+    "title": "称号（2-4字）",
+    "mbti": "MBTI类型（如ENFP）",
+    "reason": "获得理由,必须60-80字,引用数据"
+  }
+]
+
+---
+用户数据：
+"""
+
+# 金句 prompt 的固定部分
+QUOTES_PROMPT_PREFIX = """从群聊记录中挑选3-5句最有趣的金句。
+
+优先级（从高到低）：
+1. 神回复、接梗高手（优先选择回复的那句，不是发起的）
+2. 有上下文才有笑点的梗
+3. 精彩吐槽或离谱观点
+4. 高/低情商发言
+
+要求：
+- 每个金句来自不同发言人
+- 避免平淡陈述句、问候语
+- 内容水可以只返回2-3个
+- 理由严格控制在50-70字，说明为什么有趣、回应了什么
+
+返回JSON（不要markdown代码块，不要emoji）：
+[
+  {
+    "content": "金句原文",
+    "sender": "发言人",
+    "reason": "选择理由（50-70字）"
+  }
+]
+
+---
+群聊记录：
+"""
+
+# 炫压抑指数 prompt 的固定部分
+DEPRESSION_PROMPT_PREFIX = """分析群友的"炫压抑"指数（娱乐向）。炫压抑=性欲望强烈但表达受抑制的失衡状态。
+
+评级标准（分数越高越压抑）：
+- S级(121-150分)：想色色但欲言又止,或疯狂发涩图/开黄腔(过度补偿)。150分=极度压抑爆发，121分=明显压抑
+- A级(91-120分)：经常想开车但克制扭捏。120分=频繁压抑，91分=较常压抑
+- B级(61-90分)：偶尔开车,表达自然。90分=偶尔有想法，61分=基本正常
+- C级(31-60分)：很少提及或表达健康。60分=偶尔提及，31分=几乎不提
+- D级(0-30分)：完全回避性话题。30分=刻意回避，0分=完全无关
+
+要求：
+1. 对所有用户进行评级，评价25-30字，采用文言文风格，文雅而有趣
+2. 每个用户必须给出一个0-150的精确分数(score)，用于排名
+3. 分数要能区分同等级内的差异，例如同为S级，更压抑的给145分，稍轻的给125分
+4. 按分数从高到低排序返回
+
+返回JSON（不要markdown代码块，不要emoji）：
+[
+  {
+    "name": "用户名",
+    "rank": "S/A/B/C/D",
+    "score": 0-150的整数分数,
+    "comment": "简短评价"
+  }
+]
+
+---
+用户发言样本：
+"""
+
+# 用户画像 prompt 的固定部分（用户数据拼接在末尾）
+USER_PROFILE_PROMPT_PREFIX = """分析这个用户的聊天画像（娱乐向，有趣但不失真实）。
+
+要求：
+1. tags: 1-3个有趣的个性标签（3-6字），基于真实数据，避免陈词滥调
+   - 参考维度：时间特征（夜猫子/早起鸟）、表达风格（表情包选手/文字工匠）、互动特征（好奇宝宝/话题终结者）、情绪倾向（开心果/emo精）
+   - 例如："深夜哲学家"、"表情包达人"、"提问小能手"、"简洁派发言"
+
+2. active_time: 描述活跃时段特征（12-15字），有趣且准确
+   - 例如："深夜冲浪型选手"、"朝九晚五社畜"、"全天候在线人"
+
+3. fun_score: 整活质量评分（0-100）
+   - 0-30: 发言平淡无趣，无亮点
+   - 31-60: 偶尔有梗，但不够出彩
+   - 61-85: 经常有有趣发言，能活跃气氛
+   - 86-100: 群聊灵魂，笑点制造机
+
+4. fun_comment: 整活质量评价（18-25字），幽默点评今天的有趣发言
+   - 例如："3次神回复让群友笑喷，段子手潜质显现"
+   - 或："发言质朴无华，建议多学习群友整活"
+
+5. topic_leadership: 话题引导力（0-100）
+   - 基于发言是否引发他人回复、讨论热度等
+   - 0-30: 话题终结者，发言无人接
+   - 31-60: 偶尔能引起讨论
+   - 61-85: 经常引发话题，有带动力
+   - 86-100: 群聊节奏大师，一呼百应
+
+6. topic_comment: 话题引导力评价（18-25字）
+   - 例如："发起2个热门话题，群友积极响应"
+   - 或："发言自说自话，缺乏互动吸引力"
+
+7. rank_title: 段位称号（6-10字），根据综合表现评定
+   - 参考维度：发言数、质量、互动、活跃时段等
+   - 例如："黄金话痨III"、"钻石夜猫I"、"青铜潜水员V"、"白银表情包II"
+   - 段位等级：青铜 < 白银 < 黄金 < 铂金 < 钻石 < 大师 < 王者
+   - 每个等级有I到V五个小段位
+
+8. rank_desc: 段位描述（20-28字），说明为什么是这个段位
+   - 例如："今日发言50条且质量上乘，晋升在即"
+   - 或："潜水选手，发言稀少，建议多冒泡"
+
+9. mood: 今日整体心情（积极/中性/消极）
+
+10. mood_score: 心情分数（0-100，综合表情、用词、语气判断）
+   - 0-30: 明显消极/emo
+   - 31-60: 平淡/中性
+   - 61-85: 积极/活跃
+   - 86-100: 非常开心/兴奋
+
+11. mood_reason: 心情评估依据（15-22字），简洁引用具体数据或特征
+
+返回JSON（不要markdown代码块）：
+{
+  "tags": ["标签1", "标签2", "标签3"],
+  "active_time": "活跃时段描述",
+  "fun_score": 75,
+  "fun_comment": "整活质量评价",
+  "topic_leadership": 68,
+  "topic_comment": "话题引导力评价",
+  "rank_title": "黄金话痨III",
+  "rank_desc": "段位描述",
+  "mood": "积极/中性/消极",
+  "mood_score": 75,
+  "mood_reason": "基于表情使用、用词倾向等的评估理由"
+}
+
+---
+"""
+
+
+class _WordCharTable(dict):
+    """str.translate 映射表：保留汉字和英文字母，其余字符替换为空格（按需填充）"""
+
+    def __missing__(self, codepoint: int):
+        char = chr(codepoint)
+        keep = "\u4e00" <= char <= "\u9fff" or "a" <= char <= "z" or "A" <= char <= "Z"
+        value = codepoint if keep else " "
+        self[codepoint] = value
+        return value
+
+
+_WORD_CHAR_TABLE = _WordCharTable()
+_ASCII_LETTERS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+
+# Emoji 码点范围表（已排序并合并相邻区间，用于构建正则字符类）
+EMOJI_RANGES = (
+    (0x2600, 0x26FF),    # misc symbols
+    (0x2702, 0x27B0),    # dingbats
+    (0xFE00, 0xFE0F),    # variation selectors
+    (0x1F000, 0x1F02F),  # mahjong tiles
+    (0x1F0A0, 0x1F0FF),  # playing cards
+    (0x1F1E0, 0x1F1FF),  # flags
+    (0x1F300, 0x1F64F),  # symbols & pictographs + emoticons
+    (0x1F680, 0x1F6FF),  # transport & map symbols
+    (0x1F900, 0x1FAFF),  # supplemental symbols + chess symbols + extended-A
+)
+
 
 class ChatAnalysisUtils:
     """聊天记录分析工具类"""
 
-    # Emoji 正则表达式（精确匹配，避免误伤中文字符）
+    # Emoji 正则表达式（精确匹配，避免误伤中文字符；由排序后的范围表生成紧凑字符类）
     EMOJI_PATTERN = re.compile(
-        "["
-        "\U0001F600-\U0001F64F"  # emoticons
-        "\U0001F300-\U0001F5FF"  # symbols & pictographs
-        "\U0001F680-\U0001F6FF"  # transport & map symbols
-        "\U0001F1E0-\U0001F1FF"  # flags
-        "\U00002702-\U000027B0"  # dingbats
-        "\U0001F900-\U0001F9FF"  # supplemental symbols
-        "\U0001FA00-\U0001FA6F"  # chess symbols
-        "\U0001FA70-\U0001FAFF"  # symbols and pictographs extended-A
-        "\U00002600-\U000026FF"  # misc symbols
-        "\U0000FE00-\U0000FE0F"  # variation selectors
-        "\U0001F000-\U0001F02F"  # mahjong tiles
-        "\U0001F0A0-\U0001F0FF"  # playing cards
-        "]+",
+        "[" + "".join(f"{chr(start)}-{chr(end)}" for start, end in EMOJI_RANGES) + "]+",
         flags=re.UNICODE
     )
 
+    # @提及格式（如 @理理<123456>）
+    MENTION_PATTERN = re.compile(r'@[^<\s]+<\d+>\s*')
+
+    # 简单分词：连续汉字或连续英文字母
+    WORD_PATTERN = re.compile(r'[\u4e00-\u9fff]+|[a-zA-Z]+')
+
+    # LLM 输出清理：中文字符、数字之间的异常空格
+    CJK_SPACE_CJK_PATTERN = re.compile(r'([\u4e00-\u9fff])\s+([\u4e00-\u9fff])')
+    CJK_SPACE_DIGIT_PATTERN = re.compile(r'([\u4e00-\u9fff])\s+([\d])')
+    DIGIT_SPACE_CJK_PATTERN = re.compile(r'([\d])\s+([\u4e00-\u9fff])')
+
+    # 对象/数组末尾多余的逗号（LLM 常见的格式错误）
+    TRAILING_COMMA_PATTERN = re.compile(r',(\s*[}\]])')
+
+    # JSON 提取：整段字符串字面量或一个括号，正则在 C 层跳过其余字符，
+    # 整个字符串字面量被当作一个 token 消耗掉，其中的括号不会影响深度计数
+    JSON_BRACKET_TOKEN_PATTERNS = {
+        "{": re.compile(r'"(?:[^"\\]|\\.)*"|[{}]', re.S),
+        "[": re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]]', re.S),
+    }
+
+    # MBTI类型白名单
+    VALID_MBTI_TYPES = frozenset({
+        "INTJ", "INTP", "ENTJ", "ENTP",
+        "INFJ", "INFP", "ENFJ", "ENFP",
+        "ISTJ", "ISFJ", "ESTJ", "ESFJ",
+        "ISTP", "ISFP", "ESTP", "ESFP"
+    })
+
+    # 炫压抑评级等级及缺少 score 时的默认分数
+    VALID_RANKS = frozenset({"S", "A", "B", "C", "D"})
+    RANK_DEFAULT_SCORES = {"S": 135, "A": 105, "B": 75, "C": 45, "D": 15}
+
+    # LLM 返回数据的必需字段（用集合差集检查缺失字段）
+    TOPIC_REQUIRED_FIELDS = frozenset({"topic", "contributors", "detail"})
+    TITLE_REQUIRED_FIELDS = frozenset({"name", "title", "mbti", "reason"})
+    QUOTE_REQUIRED_FIELDS = frozenset({"content", "sender", "reason"})
+    DEPRESSION_REQUIRED_FIELDS = frozenset({"name", "rank", "comment"})
+    USER_PROFILE_REQUIRED_FIELDS = frozenset({
+        "tags", "active_time", "fun_score", "fun_comment", "topic_leadership", "topic_comment",
+        "rank_title", "rank_desc", "mood", "mood_score", "mood_reason"
+    })
+
+    # 用户画像心情取值
+    VALID_MOODS = frozenset({"积极", "中性", "消极"})
+
+    # LLM 并发限制（懒加载，确保在事件循环内创建）
+    _llm_semaphore: Optional[asyncio.Semaphore] = None
+
+    # LLM 响应缓存（相同提示词直接复用结果）
+    _llm_cache = TTLCache(AnalysisConfig.LLM_CACHE_SIZE, AnalysisConfig.LLM_CACHE_TTL)
+
+    @staticmethod
+    def _llm_cache_key(prompt: str, request_type: str, model: str = "") -> str:
+        """根据模型、请求类型和提示词生成 LLM 响应缓存键
+
+        Args:
+            prompt: 提示词
+            request_type: 请求类型标识
+            model: 模型标识（切换模型或修改模型配置后不再命中旧模型的结果）
+        """
+        digest = hashlib.sha256()
+        digest.update(model.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(request_type.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    async def _generate_with_model(prompt: str, request_type: str) -> Tuple[bool, str, str, str]:
+        """调用 LLM 生成（带响应缓存，受并发上限保护）
+
+        Args:
+            prompt: 提示词
+            request_type: 请求类型标识
+
+        Returns:
+            (success, result, reasoning, model_name)
+        """
+        # 模型配置参与缓存键：配置中的模型列表、温度等变化后重新请求（repr 包含全部配置字段）
+        task_config = model_config.model_task_config.replyer
+        cache_key = ChatAnalysisUtils._llm_cache_key(prompt, request_type, repr(task_config))
+        cached = await ChatAnalysisUtils._llm_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"LLM 缓存命中: {request_type}")
+            return cached
+
+        if ChatAnalysisUtils._llm_semaphore is None:
+            ChatAnalysisUtils._llm_semaphore = asyncio.Semaphore(AnalysisConfig.MAX_LLM_CONCURRENCY)
+
+        async with ChatAnalysisUtils._llm_semaphore:
+            response = await llm_api.generate_with_model(
+                prompt=prompt,
+                model_config=task_config,
+                request_type=request_type,
+            )
+
+        # 只缓存成功的结果，失败的请求下次重试
+        if response[0]:
+            await ChatAnalysisUtils._llm_cache.set(cache_key, tuple(response))
+
+        return response
+
+    @staticmethod
+    async def analyze_all(
+        messages: List[dict],
+        user_stats: Dict
+    ) -> Tuple[List[Dict], List[Dict], List[Dict], List[Dict]]:
+        """并发执行群聊的四项 LLM 分析（互不依赖，总耗时约等于最慢的一项）
+
+        Args:
+            messages: 聊天记录列表
+            user_stats: 用户统计数据
+
+        Returns:
+            (topics, user_titles, golden_quotes, depression_index)，失败项为空列表
+        """
+        results = await asyncio.gather(
+            ChatAnalysisUtils.analyze_topics(messages),
+            ChatAnalysisUtils.analyze_user_titles(messages, user_stats),
+            ChatAnalysisUtils.analyze_golden_quotes(messages),
+            ChatAnalysisUtils.analyze_depression_index(messages, user_stats),
+            return_exceptions=True,
+        )
+
+        normalized = []
+        for result in results:
+            if isinstance(result, BaseException):
+                logger.error(f"并发分析任务失败: {result}")
+                result = None
+            normalized.append(result or [])
+
+        return tuple(normalized)
+
+    @staticmethod
+    def preprocess_messages(messages: MessageList) -> List[ParsedMessage]:
+        """预处理聊天记录（一次遍历完成字段提取、时间格式化、@提及清理和 emoji 统计）
+
+        Args:
+            messages: 聊天记录列表
+
+        Returns:
+            预处理后的消息列表
+        """
+        if messages and isinstance(messages[0], ParsedMessage):
+            return messages
+
+        texts = [msg.get("processed_plain_text") or "" for msg in messages]  # 正确处理 None 值
+        emoji_counts = ChatAnalysisUtils.count_emojis_bulk(texts)
+
+        # 热循环内使用局部变量，避免重复的全局/属性查找
+        parsed = []
+        append = parsed.append
+        strip_mentions = ChatAnalysisUtils._strip_mentions
+        minute_clock = _minute_clock
+
+        for msg, text, emoji_count in zip(messages, texts, emoji_counts):
+            get = msg.get
+            nickname = get("user_nickname", "未知用户")
+            cardname = get("user_cardname", "")
+            seconds = int(get("time", 0))
+            hour, time_hm = minute_clock(seconds // 60)
+
+            # 按 ParsedMessage 字段顺序构造
+            append(ParsedMessage(
+                str(get("user_id", "")),
+                nickname,
+                cardname if cardname else nickname,
+                text,
+                strip_mentions(text),
+                time_hm,
+                f"{time_hm}:{seconds % 60:02d}",
+                hour,
+                len(text),
+                emoji_count,
+                seconds,
+            ))
+
+        return parsed
+
+    @staticmethod
+    def _strip_mentions(text: str) -> str:
+        """移除 @提及 并去除首尾空白（不含 @ 的文本跳过正则）"""
+        if "@" in text:
+            text = ChatAnalysisUtils.MENTION_PATTERN.sub('', text)
+        return text.strip()
+
     @staticmethod
-    def format_messages(messages: List[dict]) -> str:
+    def _ensure_parsed(messages: MessageList) -> List[ParsedMessage]:
+        """确保消息已预处理（已预处理的列表直接返回）"""
+        return ChatAnalysisUtils.preprocess_messages(messages)
+
+    @staticmethod
+    def format_messages(messages: MessageList, max_chars: int = 0) -> str:
         """格式化聊天记录为文本
 
         Args:
             messages: 聊天记录列表
+            max_chars: 文本长度上限（0 表示不限制）；超出时按整行保留开头和结尾各约一半，中间用省略标记代替
 
         Returns:
             格式化的聊天记录文本
         """
         formatted = []
-        for msg in messages:
-            timestamp = msg.get("time", 0)
-            time_str = datetime.fromtimestamp(timestamp).strftime("%H:%M:%S")
-            nickname = msg.get("user_nickname", "未知用户")
-            cardname = msg.get("user_cardname", "")
-            display_name = cardname if cardname else nickname
-            text = msg.get("processed_plain_text") or ""  # 正确处理 None 值
+        for msg in ChatAnalysisUtils._ensure_parsed(messages):
+            if msg.text:
+                formatted.append(f"[{msg.time_hms}] {msg.display_name}: {msg.text}")
 
-            if text:
-                formatted.append(f"[{time_str}] {display_name}: {text}")
+        if max_chars > 0:
+            formatted = ChatAnalysisUtils._trim_lines_head_tail(formatted, max_chars)
 
         return "\n".join(formatted)
 
+    @staticmethod
+    def _trim_lines_head_tail(lines: List[str], max_chars: int) -> List[str]:
+        """按整行截取文本开头和结尾，使总长度（含换行）不超过 max_chars
+
+        Args:
+            lines: 文本行列表
+            max_chars: 总长度上限
+
+        Returns:
+            未超出时返回原列表；否则返回 开头若干行 + 省略标记 + 结尾若干行
+        """
+        if sum(map(len, lines)) + len(lines) <= max_chars:
+            return lines
+
+        budget = max_chars // 2
+        head_count = 0
+        used = 0
+        for line in lines:
+            used += len(line) + 1
+            if used > budget:
+                break
+            head_count += 1
+
+        tail_count = 0
+        used = 0
+        for line in reversed(lines[head_count:]):
+            used += len(line) + 1
+            if used > budget:
+                break
+            tail_count += 1
+
+        omitted = len(lines) - head_count - tail_count
+        tail = lines[len(lines) - tail_count:] if tail_count else []
+        return lines[:head_count] + [f"……（中间省略 {omitted} 条消息）……"] + tail
+
     @staticmethod
     def count_emojis(text: str) -> int:
         """统计文本中的 emoji 数量（使用正则表达式）
@@ -73,11 +598,37 @@ class ChatAnalysisUtils:
         Returns:
             emoji 数量
         """
+        # 纯 ASCII 文本不可能包含 emoji，跳过正则扫描
+        if text.isascii():
+            return 0
         matches = ChatAnalysisUtils.EMOJI_PATTERN.findall(text)
         return len(matches)
 
     @staticmethod
-    def analyze_user_stats(messages: List[dict]) -> Dict[str, Dict]:
+    def count_emojis_bulk(texts: List[str]) -> List[int]:
+        """批量统计多段文本的 emoji 数量（拼接后只做一次正则扫描）
+
+        Args:
+            texts: 待统计的文本列表
+
+        Returns:
+            与 texts 一一对应的 emoji 数量列表
+        """
+        counts = [0] * len(texts)
+        joined = "\n".join(texts)
+        if joined.isascii():
+            return counts
+
+        # 每段文本在拼接串中的起始位置（换行分隔，emoji 连续段不会跨越文本）
+        starts = list(accumulate((len(text) + 1 for text in texts), initial=0))
+
+        for match in ChatAnalysisUtils.EMOJI_PATTERN.finditer(joined):
+            counts[bisect_right(starts, match.start()) - 1] += 1
+
+        return counts
+
+    @staticmethod
+    def analyze_user_stats(messages: MessageList) -> Dict[str, Dict]:
         """分析用户统计数据
 
         Args:
@@ -86,43 +637,94 @@ class ChatAnalysisUtils:
         Returns:
             用户统计字典，格式: {user_id: {nickname, message_count, char_count, emoji_count, hours}}
         """
+        # 先按用户分组，再对每组做聚合（求和在 C 层完成）
+        grouped = ChatAnalysisUtils.group_messages_by_user(messages)
+
+        get_text_len = attrgetter("text_len")
+        get_emoji_count = attrgetter("emoji_count")
+        get_hour = attrgetter("hour")
+
         user_stats = {}
+        for user_id, user_messages in grouped.items():
+            # 统计发言时间
+            hours = [0] * 24  # 各小时发言次数（下标为小时）
+            for hour in map(get_hour, user_messages):
+                hours[hour] += 1
+
+            user_stats[user_id] = {
+                "user_id": user_id,  # 保存 user_id
+                "nickname": user_messages[0].nickname,
+                "message_count": len(user_messages),
+                "char_count": sum(map(get_text_len, user_messages)),
+                "emoji_count": sum(map(get_emoji_count, user_messages)),
+                "hours": hours,
+            }
+
+        return user_stats
 
+    @staticmethod
+    def analyze_group_overview(messages: MessageList) -> Tuple[int, Dict[int, int]]:
+        """一次遍历统计参与人数和24小时发言分布
+
+        Args:
+            messages: 聊天记录列表
+
+        Returns:
+            (参与人数, 24小时发言分布 {小时: 发言数}，只包含有发言的小时)
+        """
+        messages = ChatAnalysisUtils._ensure_parsed(messages)
+
+        participants = set()
+        add_participant = participants.add
+        hours = [0] * 24  # 各小时发言次数（下标为小时，预处理时已按分钟缓存计算）
         for msg in messages:
-            user_id = str(msg.get("user_id", ""))
-            if not user_id:
-                continue
+            if msg.nickname:
+                add_participant(msg.nickname)
+            hours[msg.hour] += 1
 
-            nickname = msg.get("user_nickname", "未知用户")
-            text = msg.get("processed_plain_text") or ""  # 正确处理 None 值
+        hourly_distribution = {hour: count for hour, count in enumerate(hours) if count}
+        return len(participants), hourly_distribution
 
-            if user_id not in user_stats:
-                user_stats[user_id] = {
-                    "user_id": user_id,  # 保存 user_id
-                    "nickname": nickname,
-                    "message_count": 0,
-                    "char_count": 0,
-                    "emoji_count": 0,
-                    "hours": Counter(),  # 各小时发言次数
-                }
+    @staticmethod
+    def _collect_user_samples(
+        messages: MessageList,
+        user_ids,
+        limit: int,
+        max_chars: Optional[int] = None
+    ) -> Dict[str, List[str]]:
+        """按用户收集发言样本（过滤少于5字的消息，所有人收满后提前结束遍历）
 
-            stats = user_stats[user_id]
-            stats["message_count"] += 1
-            stats["char_count"] += len(text)
+        Args:
+            messages: 聊天记录列表
+            user_ids: 需要收集样本的用户ID集合
+            limit: 每人最多收集的样本数
+            max_chars: 每条样本截断长度（None 表示不截断）
 
-            # 使用改进的 emoji 统计
-            stats["emoji_count"] += ChatAnalysisUtils.count_emojis(text)
+        Returns:
+            {user_id: [样本文本, ...]}，按首次出现顺序排列，没有有效发言的用户不包含在内
+        """
+        samples = {}
+        remaining = {uid: limit for uid in user_ids}
+        pending_users = len(remaining)
+
+        for msg in ChatAnalysisUtils._ensure_parsed(messages):
+            user_id = msg.user_id
+            quota = remaining.get(user_id, 0)
+            if not quota or msg.text_len < 5:
+                continue
 
-            # 统计发言时间
-            timestamp = msg.get("time", 0)
-            hour = datetime.fromtimestamp(timestamp).hour
-            stats["hours"][hour] += 1
+            samples.setdefault(user_id, []).append(msg.text[:max_chars])
+            remaining[user_id] = quota - 1
+            if quota == 1:
+                pending_users -= 1
+                if not pending_users:
+                    break
 
-        return user_stats
+        return samples
 
     @staticmethod
     async def analyze_topics(
-        messages: List[dict],
+        messages: MessageList,
         get_config: Callable = None
     ) -> Optional[List[Dict]]:
         """使用 LLM 分析聊天话题
@@ -138,63 +740,27 @@ class ChatAnalysisUtils:
             if not messages:
                 return []
 
-            # 提取文本消息
-            text_messages = []
-            for msg in messages:
-                nickname = msg.get("user_nickname", "未知用户")
-                cardname = msg.get("user_cardname", "")
-                display_name = cardname if cardname else nickname
-                text = msg.get("processed_plain_text") or ""  # 正确处理 None 值
-                timestamp = msg.get("time", 0)
-                time_str = datetime.fromtimestamp(timestamp).strftime("%H:%M")
-
-                # 清理文本
-                text = re.sub(r'@[^<\s]+<\d+>\s*', '', text)
-                text = text.strip()
+            # 提取文本消息（直接格式化为行）
+            lines = []
+            for msg in ChatAnalysisUtils._ensure_parsed(messages):
+                # 使用已清理 @提及 的文本
+                text = msg.clean_text
 
                 if len(text) > 2 and not text.startswith("/"):
-                    text_messages.append({
-                        "sender": display_name,
-                        "time": time_str,
-                        "content": text
-                    })
+                    lines.append(f"[{msg.time_hm}] {msg.display_name}: {text}")
 
-            if not text_messages:
+            if not lines:
                 return []
 
             # 构建消息文本
-            messages_text = "\n".join([
-                f"[{msg['time']}] {msg['sender']}: {msg['content']}"
-                for msg in text_messages
-            ])
+            messages_text = "\n".join(lines)
 
             # 构建 prompt
-            prompt = f"""从群聊记录中提取3-5个热门话题。
-
-群聊记录：
-{messages_text}
-
-要求：
-1. 话题标题4-8个字，简洁明了
-2. 参与者列表包含2-5个主要发言人
-3. 详情描述50-80字，说明讨论了什么、有什么有趣的观点
-4. 只提取有实质内容的话题，避免简单问候、闲聊
-5. 话题按热度排序（参与人数多、讨论深入的优先）
-
-返回JSON（不要markdown代码块，不要emoji）：
-[
-  {{
-    "topic": "话题标题",
-    "contributors": ["参与者1", "参与者2"],
-    "detail": "话题详情描述"
-  }}
-]"""
+            prompt = TOPICS_PROMPT_PREFIX + messages_text
 
             # 使用 LLM 生成
-            model_task_config = model_config.model_task_config.replyer
-            success, result, reasoning, model_name = await llm_api.generate_with_model(
+            success, result, reasoning, model_name = await ChatAnalysisUtils._generate_with_model(
                 prompt=prompt,
-                model_config=model_task_config,
                 request_type="plugin.chat_summary.topics",
             )
 
@@ -212,7 +778,7 @@ class ChatAnalysisUtils:
 
     @staticmethod
     async def analyze_user_titles(
-        messages: List[dict],
+        messages: MessageList,
         user_stats: Dict,
         get_config: Callable = None
     ) -> Optional[List[Dict]]:
@@ -238,26 +804,15 @@ class ChatAnalysisUtils:
 
             # 构建用户数据文本（包含发言样本用于MBTI判断）
             users_text = []
-            user_samples = {}
 
-            # 收集每个用户的发言样本
-            for msg in messages:
-                user_id = str(msg.get("user_id", ""))
-                if user_id not in active_users:
-                    continue
-                text = msg.get("processed_plain_text") or ""  # 正确处理 None 值
-                if len(text) < 5:
-                    continue
-                if user_id not in user_samples:
-                    user_samples[user_id] = []
-                if len(user_samples[user_id]) < 5:  # 每人最多5条样本
-                    user_samples[user_id].append(text[:60])
+            # 收集每个用户的发言样本（每人最多5条）
+            user_samples = ChatAnalysisUtils._collect_user_samples(messages, active_users, 5, max_chars=60)
 
-            for user_id, stats in sorted(
+            for user_id, stats in heapq.nlargest(
+                AnalysisConfig.MAX_USERS_FOR_TITLE,  # 使用配置的最大用户数
                 active_users.items(),
-                key=lambda x: x[1]["message_count"],
-                reverse=True
-            )[:AnalysisConfig.MAX_USERS_FOR_TITLE]:  # 使用配置的最大用户数
+                key=lambda x: x[1]["message_count"]
+            ):
                 night_messages = sum(stats["hours"][h] for h in range(0, 6))
                 avg_chars = stats["char_count"] / stats["message_count"] if stats["message_count"] > 0 else 0
                 emoji_ratio = stats["emoji_count"] / stats["message_count"] if stats["message_count"] > 0 else 0
@@ -277,40 +832,11 @@ class ChatAnalysisUtils:
             users_info = "\n\n".join(users_text)
 
             # 构建 prompt（添加MBTI要求）
-            prompt = f"""根据群友数据创造有趣的称号，并判断MBTI类型。
-
-用户数据：
-{users_info}
-
-要求：
-1. 称号2-4个汉字
-2. MBTI类型基于发言特征判断（如ENFP、INTJ等16种之一）
-   - E/I: 外向(话多、互动多) vs 内向(话少、深度思考)
-   - S/N: 实感(具体事实) vs 直觉(抽象概念)
-   - T/F: 思考(逻辑理性) vs 情感(感性表达)
-   - J/P: 判断(有条理) vs 知觉(随性自由)
-3. 基于真实数据，不要编造
-4. 避免重复类型（不要多个"龙王""话痨"）
-5. 有创意，避免陈词滥调
-6. **理由必须写满60-80字，引用具体数据说明为什么（发言数、平均字数、表情比例、夜间比例等），不要空洞，要详细**
-
-参考分类：活跃度（龙王、潜水员）、时间特征（夜猫子）、内容风格（段子手）、表情/情绪（表情帝）、互动特征（接梗高手）
-
-返回JSON（不要markdown代码块，不要emoji）：
-[
-  {{
-    "name": "用户名",
-    "title": "称号（2-4字）",
-    "mbti": "MBTI类型（如ENFP）",
-    "reason": "获得理由,必须60-80字,引用数据"
-  }}
-]"""
+            prompt = TITLES_PROMPT_PREFIX + users_info
 
             # 使用 LLM 生成
-            model_task_config = model_config.model_task_config.replyer
-            success, result, reasoning, model_name = await llm_api.generate_with_model(
+            success, result, reasoning, model_name = await ChatAnalysisUtils._generate_with_model(
                 prompt=prompt,
-                model_config=model_task_config,
                 request_type="plugin.chat_summary.titles",
             )
 
@@ -328,7 +854,7 @@ class ChatAnalysisUtils:
 
     @staticmethod
     async def analyze_golden_quotes(
-        messages: List[dict],
+        messages: MessageList,
         get_config: Callable = None
     ) -> Optional[List[Dict]]:
         """使用 LLM 提取群聊金句（群圣经）
@@ -341,70 +867,28 @@ class ChatAnalysisUtils:
             金句列表，格式: [{content, sender, reason}, ...]
         """
         try:
-            # 提取适合的消息（使用配置的长度范围）
-            interesting_messages = []
-            for msg in messages:
-                nickname = msg.get("user_nickname", "未知用户")
-                cardname = msg.get("user_cardname", "")
-                display_name = cardname if cardname else nickname
-                text = msg.get("processed_plain_text") or ""  # 正确处理 None 值
-                timestamp = msg.get("time", 0)
-                time_str = datetime.fromtimestamp(timestamp).strftime("%H:%M")
-
-                # 清理 @ 提及格式（如 @理理<123456> → 去掉整个提及部分）
-                # 使用正则移除 @用户名<数字> 格式
-                text = re.sub(r'@[^<\s]+<\d+>\s*', '', text)
-                text = text.strip()
+            # 提取适合的消息（使用配置的长度范围，直接格式化为行）
+            lines = []
+            for msg in ChatAnalysisUtils._ensure_parsed(messages):
+                # 使用已清理 @ 提及格式的文本（如 @理理<123456> → 去掉整个提及部分）
+                text = msg.clean_text
 
                 if (AnalysisConfig.MIN_QUOTE_LENGTH <= len(text) <= AnalysisConfig.MAX_QUOTE_LENGTH
                     and not text.startswith(("http", "www", "/"))):
-                    interesting_messages.append({
-                        "sender": display_name,
-                        "time": time_str,
-                        "content": text
-                    })
+                    lines.append(f"[{msg.time_hm}] {msg.display_name}: {text}")
 
-            if not interesting_messages:
+            if not lines:
                 return []
 
             # 构建消息文本
-            messages_text = "\n".join([
-                f"[{msg['time']}] {msg['sender']}: {msg['content']}"
-                for msg in interesting_messages
-            ])
+            messages_text = "\n".join(lines)
 
             # 构建 prompt
-            prompt = f"""从群聊记录中挑选3-5句最有趣的金句。
-
-优先级（从高到低）：
-1. 神回复、接梗高手（优先选择回复的那句，不是发起的）
-2. 有上下文才有笑点的梗
-3. 精彩吐槽或离谱观点
-4. 高/低情商发言
-
-要求：
-- 每个金句来自不同发言人
-- 避免平淡陈述句、问候语
-- 内容水可以只返回2-3个
-- 理由严格控制在50-70字，说明为什么有趣、回应了什么
-
-群聊记录：
-{messages_text}
-
-返回JSON（不要markdown代码块，不要emoji）：
-[
-  {{
-    "content": "金句原文",
-    "sender": "发言人",
-    "reason": "选择理由（50-70字）"
-  }}
-]"""
+            prompt = QUOTES_PROMPT_PREFIX + messages_text
 
             # 使用 LLM 生成
-            model_task_config = model_config.model_task_config.replyer
-            success, result, reasoning, model_name = await llm_api.generate_with_model(
+            success, result, reasoning, model_name = await ChatAnalysisUtils._generate_with_model(
                 prompt=prompt,
-                model_config=model_task_config,
                 request_type="plugin.chat_summary.quotes",
             )
 
@@ -422,7 +906,7 @@ class ChatAnalysisUtils:
 
     @staticmethod
     async def analyze_depression_index(
-        messages: List[dict],
+        messages: MessageList,
         user_stats: Dict,
         get_config: Callable = None
     ) -> Optional[List[Dict]]:
@@ -446,23 +930,8 @@ class ChatAnalysisUtils:
             if not active_users:
                 return []
 
-            # 提取用户发言内容样本
-            user_messages = {}
-            for msg in messages:
-                user_id = str(msg.get("user_id", ""))
-                if user_id not in active_users:
-                    continue
-
-                text = msg.get("processed_plain_text") or ""  # 正确处理 None 值
-                if len(text) < 5:  # 过滤太短的消息
-                    continue
-
-                if user_id not in user_messages:
-                    user_messages[user_id] = []
-
-                # 每人最多收集20条有效发言
-                if len(user_messages[user_id]) < 20:
-                    user_messages[user_id].append(text)
+            # 提取用户发言内容样本（每人提供10条有效发言）
+            user_messages = ChatAnalysisUtils._collect_user_samples(messages, active_users, 10)
 
             if not user_messages:
                 return []
@@ -471,7 +940,7 @@ class ChatAnalysisUtils:
             users_sample = []
             for user_id in sorted(user_messages.keys(), key=lambda uid: active_users[uid]["message_count"], reverse=True):
                 nickname = active_users[user_id]["nickname"]
-                sample_texts = user_messages[user_id][:10]  # 提供10条样本
+                sample_texts = user_messages[user_id]
                 users_sample.append(
                     f"【{nickname}】\n" + "\n".join(f"  - {text[:60]}" for text in sample_texts)
                 )
@@ -479,39 +948,11 @@ class ChatAnalysisUtils:
             users_info = "\n\n".join(users_sample)
 
             # 构建 prompt
-            prompt = f"""分析群友的"炫压抑"指数（娱乐向）。炫压抑=性欲望强烈但表达受抑制的失衡状态。
-
-用户发言样本：
-{users_info}
-
-评级标准（分数越高越压抑）：
-- S级(121-150分)：想色色但欲言又止,或疯狂发涩图/开黄腔(过度补偿)。150分=极度压抑爆发，121分=明显压抑
-- A级(91-120分)：经常想开车但克制扭捏。120分=频繁压抑，91分=较常压抑
-- B级(61-90分)：偶尔开车,表达自然。90分=偶尔有想法，61分=基本正常
-- C级(31-60分)：很少提及或表达健康。60分=偶尔提及，31分=几乎不提
-- D级(0-30分)：完全回避性话题。30分=刻意回避，0分=完全无关
-
-要求：
-1. 对所有用户进行评级，评价25-30字，采用文言文风格，文雅而有趣
-2. 每个用户必须给出一个0-150的精确分数(score)，用于排名
-3. 分数要能区分同等级内的差异，例如同为S级，更压抑的给145分，稍轻的给125分
-4. 按分数从高到低排序返回
-
-返回JSON（不要markdown代码块，不要emoji）：
-[
-  {{
-    "name": "用户名",
-    "rank": "S/A/B/C/D",
-    "score": 0-150的整数分数,
-    "comment": "简短评价"
-  }}
-]"""
+            prompt = DEPRESSION_PROMPT_PREFIX + users_info
 
             # 使用 LLM 生成
-            model_task_config = model_config.model_task_config.replyer
-            success, result, reasoning, model_name = await llm_api.generate_with_model(
+            success, result, reasoning, model_name = await ChatAnalysisUtils._generate_with_model(
                 prompt=prompt,
-                model_config=model_task_config,
                 request_type="plugin.chat_summary.depression",
             )
 
@@ -527,6 +968,23 @@ class ChatAnalysisUtils:
             logger.error(f"分析炫压抑指数失败: {e}", exc_info=True)
             return []
 
+    @staticmethod
+    def _as_str(value: Any, max_len: Optional[int] = None) -> str:
+        """将 LLM 返回的字段转为字符串并按需截断（已是字符串且不超长时直接复用原对象）
+
+        Args:
+            value: 原始字段值
+            max_len: 最大长度（None 表示不截断）
+
+        Returns:
+            字符串
+        """
+        if not isinstance(value, str):
+            value = str(value)
+        if max_len is not None and len(value) > max_len:
+            value = value[:max_len]
+        return value
+
     @staticmethod
     def _validate_topics(data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """验证并清理话题数据
@@ -543,13 +1001,13 @@ class ChatAnalysisUtils:
                 continue
 
             # 必需字段
-            if not all(key in item for key in ["topic", "contributors", "detail"]):
+            if ChatAnalysisUtils.TOPIC_REQUIRED_FIELDS - item.keys():
                 logger.warning(f"话题数据缺少必需字段: {item}")
                 continue
 
             # 验证数据类型和长度
-            topic = str(item["topic"])[:30]  # 话题标题限制30字符
-            detail = str(item["detail"])[:200]  # 详情限制200字符
+            topic = ChatAnalysisUtils._as_str(item["topic"], 30)  # 话题标题限制30字符
+            detail = ChatAnalysisUtils._as_str(item["detail"], 200)  # 详情限制200字符
 
             # 验证参与者列表
             contributors = item.get("contributors", [])
@@ -557,7 +1015,7 @@ class ChatAnalysisUtils:
                 contributors = []
             # 清理参与者名称，最多5个
             contributors = [
-                str(c).strip()[:20] for c in contributors if c and str(c).strip()
+                name[:20] for name in (ChatAnalysisUtils._as_str(c).strip() for c in contributors if c) if name
             ][:5]
 
             if not topic or not detail or not contributors:
@@ -571,6 +1029,23 @@ class ChatAnalysisUtils:
 
         return validated[:5]  # 最多返回5个话题
 
+    @staticmethod
+    def _build_nickname_index(user_stats: Optional[Dict[str, Dict]]) -> Dict[str, str]:
+        """构建 昵称 -> user_id 的反向索引（昵称重复时保留第一个）
+
+        Args:
+            user_stats: 用户统计数据
+
+        Returns:
+            昵称到 user_id 的映射
+        """
+        index = {}
+        for uid, stats in (user_stats or {}).items():
+            nickname = stats.get("nickname")
+            if nickname not in index:
+                index[nickname] = uid
+        return index
+
     @staticmethod
     def _validate_titles(data: List[Dict[str, Any]], user_stats: Dict[str, Dict] = None) -> List[Dict[str, Any]]:
         """验证并清理群友称号数据（包含MBTI）
@@ -582,13 +1057,7 @@ class ChatAnalysisUtils:
         Returns:
             验证后的数据列表
         """
-        # MBTI类型白名单
-        valid_mbti_types = {
-            "INTJ", "INTP", "ENTJ", "ENTP",
-            "INFJ", "INFP", "ENFJ", "ENFP",
-            "ISTJ", "ISFJ", "ESTJ", "ESFJ",
-            "ISTP", "ISFP", "ESTP", "ESFP"
-        }
+        nickname_index = ChatAnalysisUtils._build_nickname_index(user_stats)
 
         validated = []
         for item in data:
@@ -596,18 +1065,18 @@ class ChatAnalysisUtils:
                 continue
 
             # 必需字段（现在包含mbti）
-            if not all(key in item for key in ["name", "title", "mbti", "reason"]):
+            if ChatAnalysisUtils.TITLE_REQUIRED_FIELDS - item.keys():
                 logger.warning(f"群友称号数据缺少必需字段: {item}")
                 continue
 
             # 验证数据类型和长度
-            name = str(item["name"])[:50]  # 限制长度
-            title = str(item["title"])[:AnalysisConfig.MAX_TITLE_LENGTH]
-            mbti = str(item["mbti"]).upper().strip()  # 转大写并去空格
-            reason = str(item["reason"])[:AnalysisConfig.MAX_REASON_LENGTH]
+            name = ChatAnalysisUtils._as_str(item["name"], 50)  # 限制长度
+            title = ChatAnalysisUtils._as_str(item["title"], AnalysisConfig.MAX_TITLE_LENGTH)
+            mbti = ChatAnalysisUtils._as_str(item["mbti"]).upper().strip()  # 转大写并去空格
+            reason = ChatAnalysisUtils._as_str(item["reason"], AnalysisConfig.MAX_REASON_LENGTH)
 
             # 验证MBTI类型是否有效
-            if mbti not in valid_mbti_types:
+            if mbti not in ChatAnalysisUtils.VALID_MBTI_TYPES:
                 logger.warning(f"无效的MBTI类型: {mbti}，使用默认值ENFP")
                 mbti = "ENFP"  # 默认值
 
@@ -615,12 +1084,7 @@ class ChatAnalysisUtils:
                 continue
 
             # 尝试从 user_stats 中查找匹配的 user_id
-            user_id = ""
-            if user_stats:
-                for uid, stats in user_stats.items():
-                    if stats.get("nickname") == name:
-                        user_id = uid
-                        break
+            user_id = nickname_index.get(name, "")
 
             validated.append({
                 "name": name,
@@ -648,18 +1112,17 @@ class ChatAnalysisUtils:
                 continue
 
             # 必需字段
-            if not all(key in item for key in ["content", "sender", "reason"]):
+            if ChatAnalysisUtils.QUOTE_REQUIRED_FIELDS - item.keys():
                 logger.warning(f"金句数据缺少必需字段: {item}")
                 continue
 
             # 验证数据类型和长度
-            content = str(item["content"])[:200]  # 限制长度
-            sender = str(item["sender"])[:50]
-            reason = str(item["reason"])[:AnalysisConfig.MAX_REASON_LENGTH]
+            content = ChatAnalysisUtils._as_str(item["content"], 200)  # 限制长度
+            sender = ChatAnalysisUtils._as_str(item["sender"], 50)
+            reason = ChatAnalysisUtils._as_str(item["reason"], AnalysisConfig.MAX_REASON_LENGTH)
 
             # 清理 @ 提及格式（如 @理理<123456> → 去掉整个提及部分）
-            content = re.sub(r'@[^<\s]+<\d+>\s*', '', content)
-            content = content.strip()
+            content = ChatAnalysisUtils._strip_mentions(content)
 
             if not content or not sender or not reason:
                 continue
@@ -683,23 +1146,25 @@ class ChatAnalysisUtils:
         Returns:
             验证后的数据列表，按 score 从高到低排序
         """
+        nickname_index = ChatAnalysisUtils._build_nickname_index(user_stats)
+
         validated = []
         for item in data:
             if not isinstance(item, dict):
                 continue
 
             # 必需字段
-            if not all(key in item for key in ["name", "rank", "comment"]):
+            if ChatAnalysisUtils.DEPRESSION_REQUIRED_FIELDS - item.keys():
                 logger.warning(f"炫压抑指数数据缺少必需字段: {item}")
                 continue
 
             # 验证数据类型和长度
-            name = str(item["name"])[:50]
-            rank = str(item["rank"]).upper().strip()
-            comment = str(item["comment"])[:60]  # 限制评价长度（30字约60字符）
+            name = ChatAnalysisUtils._as_str(item["name"], 50)
+            rank = ChatAnalysisUtils._as_str(item["rank"]).upper().strip()
+            comment = ChatAnalysisUtils._as_str(item["comment"], 60)  # 限制评价长度（30字约60字符）
 
             # 验证rank是否在S/A/B/C/D中
-            if rank not in ["S", "A", "B", "C", "D"]:
+            if rank not in ChatAnalysisUtils.VALID_RANKS:
                 logger.warning(f"无效的rank值: {rank}")
                 continue
 
@@ -712,16 +1177,10 @@ class ChatAnalysisUtils:
                 score = max(0, min(150, score))  # 限制在 0-150 范围内
             except (ValueError, TypeError):
                 # 如果没有 score 或无效，根据 rank 给一个默认分数
-                rank_default_scores = {"S": 135, "A": 105, "B": 75, "C": 45, "D": 15}
-                score = rank_default_scores.get(rank, 75)
+                score = ChatAnalysisUtils.RANK_DEFAULT_SCORES.get(rank, 75)
 
             # 尝试从 user_stats 中查找匹配的 user_id
-            user_id = ""
-            if user_stats:
-                for uid, stats in user_stats.items():
-                    if stats.get("nickname") == name:
-                        user_id = uid
-                        break
+            user_id = nickname_index.get(name, "")
 
             validated.append({
                 "name": name,
@@ -737,96 +1196,99 @@ class ChatAnalysisUtils:
         return validated  # 返回所有数据，由渲染层控制显示数量
 
     @staticmethod
-    async def analyze_user_profile(
-        messages: List[dict],
-        user_name: str,
-        get_config: Callable = None
-    ) -> Optional[Dict[str, Any]]:
-        """分析单个用户的个人画像
+    def _extract_words(text: str) -> List[str]:
+        """简单分词：提取连续汉字或连续英文字母（与 WORD_PATTERN.findall 结果一致）
+
+        先用 str.translate 将其他字符替换为空格再 split，
+        只有汉字与字母相连的片段才回退到正则拆分。
 
         Args:
-            messages: 用户的聊天记录列表
-            user_name: 用户昵称
-            get_config: 配置获取函数（可选）
+            text: 待分词的文本
 
         Returns:
-            用户画像数据，格式: {
-                user_id: "QQ号",  # 用户ID
-                tags: [标签1, 标签2],  # 1-2个个性标签
-                active_hours: "18:00-23:00",  # 活跃时段描述
-                fun_score: 85,  # 整活质量评分 0-100
-                fun_comment: "整活评价",  # 简短评价
-                topic_leadership: 75,  # 话题引导力 0-100
-                topic_comment: "话题引导评价",
-                rank_title: "黄金话痨III",  # 段位称号
-                rank_desc: "段位描述",
-                mood: "积极/中性/消极",
-                mood_score: 0-100  # 心情分数
-            }
+            词列表
         """
-        try:
-            if not messages:
-                return None
+        words = []
+        for token in text.translate(_WORD_CHAR_TABLE).split():
+            if token.isascii() or _ASCII_LETTERS.isdisjoint(token):
+                words.append(token)
+            else:
+                words.extend(ChatAnalysisUtils.WORD_PATTERN.findall(token))
+        return words
 
-            # 获取用户ID（从第一条消息中提取）
-            user_id = str(messages[0].get("user_id", "")) if messages else ""
+    @staticmethod
+    def _build_user_profile_section(
+        messages: MessageList,
+        user_name: str
+    ) -> Optional[Tuple[str, str]]:
+        """统计单个用户的画像数据并格式化为 prompt 段落
 
-            # 统计基础数据
-            hours_counter = Counter()
-            all_texts = []
+        Args:
+            messages: 用户的聊天记录列表
+            user_name: 用户昵称
 
-            for msg in messages:
-                timestamp = msg.get("time", 0)
-                hour = datetime.fromtimestamp(timestamp).hour
-                hours_counter[hour] += 1
+        Returns:
+            (user_id, 用户数据段落)，没有消息时返回 None
+        """
+        if not messages:
+            return None
 
-                text = msg.get("processed_plain_text") or ""  # 正确处理 None 值
-                if len(text) >= 5:  # 收集有效发言
-                    all_texts.append(text)
+        messages = ChatAnalysisUtils._ensure_parsed(messages)
 
-            # 找出最活跃的时段
-            if hours_counter:
-                most_active_hours = hours_counter.most_common(3)
-                active_hours_list = sorted([h for h, _ in most_active_hours])
-            else:
-                active_hours_list = []
-
-            # 构建聊天记录样本（最多15条）
-            sample_texts = all_texts[:15] if len(all_texts) > 15 else all_texts
-            chat_sample = "\n".join([f"- {text[:80]}" for text in sample_texts])
-
-            # 构建统计信息
-            total_chars = sum(len(text) for text in all_texts)
-            avg_chars = total_chars / len(all_texts) if all_texts else 0
-            emoji_count = sum(ChatAnalysisUtils.count_emojis(text) for text in all_texts)
-            emoji_ratio = emoji_count / len(all_texts) if all_texts else 0
-
-            # 统计时段分布
-            morning = sum(hours_counter[h] for h in range(6, 12))  # 6-12点
-            afternoon = sum(hours_counter[h] for h in range(12, 18))  # 12-18点
-            evening = sum(hours_counter[h] for h in range(18, 24))  # 18-24点
-            night = sum(hours_counter[h] for h in range(0, 6))  # 0-6点
-
-            time_distribution = f"早{morning}条/午{afternoon}条/晚{evening}条/夜{night}条"
-
-            # 计算更多维度的统计
-            total_messages = len(messages)
-            # 话题关键词（简单统计）
-            words_freq = Counter()
-            for text in all_texts:
-                # 简单分词（按空格和标点）
-                words = re.findall(r'[\u4e00-\u9fff]+|[a-zA-Z]+', text)
-                words_freq.update([w for w in words if len(w) >= 2])
-            top_words = ', '.join([w for w, _ in words_freq.most_common(5)])
-
-            # 互动特征（简单判断）
-            question_count = sum(1 for text in all_texts if '?' in text or '？' in text)
-            question_ratio = question_count / total_messages if total_messages > 0 else 0
+        # 获取用户ID（从第一条消息中提取）
+        user_id = messages[0].user_id
 
-            # 构建 prompt
-            prompt = f"""分析这个用户的聊天画像（娱乐向，有趣但不失真实）。
+        # 统计基础数据
+        hour_counts = [0] * 24  # 各小时发言次数（下标为小时）
+        all_texts = []
+        emoji_count = 0
 
-用户基础数据：
+        for msg in messages:
+            hour_counts[msg.hour] += 1
+
+            if msg.text_len >= 5:  # 收集有效发言
+                all_texts.append(msg.text)
+                emoji_count += msg.emoji_count
+
+        # 找出最活跃的时段（发言数相同时取较早的小时）
+        active_hours_list = sorted(heapq.nlargest(
+            3,
+            [h for h in range(24) if hour_counts[h]],
+            key=hour_counts.__getitem__
+        ))
+
+        # 构建聊天记录样本（最多15条）
+        sample_texts = all_texts[:15] if len(all_texts) > 15 else all_texts
+        chat_sample = "\n".join([f"- {text[:80]}" for text in sample_texts])
+
+        # 构建统计信息
+        total_chars = sum(len(text) for text in all_texts)
+        avg_chars = total_chars / len(all_texts) if all_texts else 0
+        emoji_ratio = emoji_count / len(all_texts) if all_texts else 0
+
+        # 统计时段分布
+        morning = sum(hour_counts[6:12])  # 6-12点
+        afternoon = sum(hour_counts[12:18])  # 12-18点
+        evening = sum(hour_counts[18:24])  # 18-24点
+        night = sum(hour_counts[0:6])  # 0-6点
+
+        time_distribution = f"早{morning}条/午{afternoon}条/晚{evening}条/夜{night}条"
+
+        # 计算更多维度的统计
+        total_messages = len(messages)
+        # 话题关键词（简单统计）
+        words_freq = Counter()
+        for text in all_texts:
+            # 简单分词（按空格和标点）
+            words = ChatAnalysisUtils._extract_words(text)
+            words_freq.update([w for w in words if len(w) >= 2])
+        top_words = ', '.join([w for w, _ in words_freq.most_common(5)])
+
+        # 互动特征（简单判断）
+        question_count = sum(1 for text in all_texts if '?' in text or '？' in text)
+        question_ratio = question_count / total_messages if total_messages > 0 else 0
+
+        section = f"""用户基础数据：
 - 用户名：{user_name}
 - 发言数：{total_messages}条
 - 平均长度：{avg_chars:.1f}字/条
@@ -841,77 +1303,50 @@ class ChatAnalysisUtils:
 - 高频词：{top_words}
 
 发言样本（最近{len(sample_texts)}条）：
-{chat_sample}
-
-要求：
-1. tags: 1-3个有趣的个性标签（3-6字），基于真实数据，避免陈词滥调
-   - 参考维度：时间特征（夜猫子/早起鸟）、表达风格（表情包选手/文字工匠）、互动特征（好奇宝宝/话题终结者）、情绪倾向（开心果/emo精）
-   - 例如："深夜哲学家"、"表情包达人"、"提问小能手"、"简洁派发言"
+{chat_sample}"""
 
-2. active_time: 描述活跃时段特征（12-15字），有趣且准确
-   - 例如："深夜冲浪型选手"、"朝九晚五社畜"、"全天候在线人"
-
-3. fun_score: 整活质量评分（0-100）
-   - 0-30: 发言平淡无趣，无亮点
-   - 31-60: 偶尔有梗，但不够出彩
-   - 61-85: 经常有有趣发言，能活跃气氛
-   - 86-100: 群聊灵魂，笑点制造机
+        return user_id, section
 
-4. fun_comment: 整活质量评价（18-25字），幽默点评今天的有趣发言
-   - 例如："3次神回复让群友笑喷，段子手潜质显现"
-   - 或："发言质朴无华，建议多学习群友整活"
-
-5. topic_leadership: 话题引导力（0-100）
-   - 基于发言是否引发他人回复、讨论热度等
-   - 0-30: 话题终结者，发言无人接
-   - 31-60: 偶尔能引起讨论
-   - 61-85: 经常引发话题，有带动力
-   - 86-100: 群聊节奏大师，一呼百应
-
-6. topic_comment: 话题引导力评价（18-25字）
-   - 例如："发起2个热门话题，群友积极响应"
-   - 或："发言自说自话，缺乏互动吸引力"
-
-7. rank_title: 段位称号（6-10字），根据综合表现评定
-   - 参考维度：发言数、质量、互动、活跃时段等
-   - 例如："黄金话痨III"、"钻石夜猫I"、"青铜潜水员V"、"白银表情包II"
-   - 段位等级：青铜 < 白银 < 黄金 < 铂金 < 钻石 < 大师 < 王者
-   - 每个等级有I到V五个小段位
-
-8. rank_desc: 段位描述（20-28字），说明为什么是这个段位
-   - 例如："今日发言50条且质量上乘，晋升在即"
-   - 或："潜水选手，发言稀少，建议多冒泡"
-
-9. mood: 今日整体心情（积极/中性/消极）
+    @staticmethod
+    async def analyze_user_profile(
+        messages: MessageList,
+        user_name: str,
+        get_config: Callable = None
+    ) -> Optional[Dict[str, Any]]:
+        """分析单个用户的个人画像
 
-10. mood_score: 心情分数（0-100，综合表情、用词、语气判断）
-   - 0-30: 明显消极/emo
-   - 31-60: 平淡/中性
-   - 61-85: 积极/活跃
-   - 86-100: 非常开心/兴奋
+        Args:
+            messages: 用户的聊天记录列表
+            user_name: 用户昵称
+            get_config: 配置获取函数（可选）
 
-11. mood_reason: 心情评估依据（15-22字），简洁引用具体数据或特征
+        Returns:
+            用户画像数据，格式: {
+                user_id: "QQ号",  # 用户ID
+                tags: [标签1, 标签2],  # 1-2个个性标签
+                active_hours: "18:00-23:00",  # 活跃时段描述
+                fun_score: 85,  # 整活质量评分 0-100
+                fun_comment: "整活评价",  # 简短评价
+                topic_leadership: 75,  # 话题引导力 0-100
+                topic_comment: "话题引导评价",
+                rank_title: "黄金话痨III",  # 段位称号
+                rank_desc: "段位描述",
+                mood: "积极/中性/消极",
+                mood_score: 0-100  # 心情分数
+            }
+        """
+        try:
+            built = ChatAnalysisUtils._build_user_profile_section(messages, user_name)
+            if not built:
+                return None
+            user_id, section = built
 
-返回JSON（不要markdown代码块）：
-{{
-  "tags": ["标签1", "标签2", "标签3"],
-  "active_time": "活跃时段描述",
-  "fun_score": 75,
-  "fun_comment": "整活质量评价",
-  "topic_leadership": 68,
-  "topic_comment": "话题引导力评价",
-  "rank_title": "黄金话痨III",
-  "rank_desc": "段位描述",
-  "mood": "积极/中性/消极",
-  "mood_score": 75,
-  "mood_reason": "基于表情使用、用词倾向等的评估理由"
-}}"""
+            # 构建 prompt（固定说明在前，用户数据在后）
+            prompt = USER_PROFILE_PROMPT_PREFIX + section
 
             # 使用 LLM 生成
-            model_task_config = model_config.model_task_config.replyer
-            success, result, reasoning, model_name = await llm_api.generate_with_model(
+            success, result, reasoning, model_name = await ChatAnalysisUtils._generate_with_model(
                 prompt=prompt,
-                model_config=model_task_config,
                 request_type="plugin.chat_summary.user_profile",
             )
 
@@ -949,8 +1384,7 @@ class ChatAnalysisUtils:
                 return None
 
             # 验证必需字段
-            required_fields = ["tags", "active_time", "fun_score", "fun_comment", "topic_leadership", "topic_comment", "rank_title", "rank_desc", "mood", "mood_score", "mood_reason"]
-            if not all(key in data for key in required_fields):
+            if ChatAnalysisUtils.USER_PROFILE_REQUIRED_FIELDS - data.keys():
                 logger.warning(f"用户画像数据缺少必需字段: {data}")
                 return None
 
@@ -959,10 +1393,12 @@ class ChatAnalysisUtils:
             if not isinstance(tags, list):
                 tags = []
             # 最多3个标签，每个3-6个汉字（9-18字节）
-            tags = [str(tag)[:18] for tag in tags[:3] if len(str(tag).strip()) >= 3]
+            tags = [
+                tag[:18] for tag in (ChatAnalysisUtils._as_str(t) for t in tags[:3]) if len(tag.strip()) >= 3
+            ]
 
             # 验证其他字段
-            active_time = str(data.get("active_time", ""))[:30]
+            active_time = ChatAnalysisUtils._as_str(data.get("active_time", ""), 30)
 
             # 验证整活质量评分
             try:
@@ -971,7 +1407,7 @@ class ChatAnalysisUtils:
             except (ValueError, TypeError):
                 fun_score = 50
 
-            fun_comment = str(data.get("fun_comment", ""))[:60]  # 约30字
+            fun_comment = ChatAnalysisUtils._as_str(data.get("fun_comment", ""), 60)  # 约30字
 
             # 验证话题引导力
             try:
@@ -980,16 +1416,16 @@ class ChatAnalysisUtils:
             except (ValueError, TypeError):
                 topic_leadership = 50
 
-            topic_comment = str(data.get("topic_comment", ""))[:60]  # 约30字
+            topic_comment = ChatAnalysisUtils._as_str(data.get("topic_comment", ""), 60)  # 约30字
 
             # 验证段位信息
-            rank_title = str(data.get("rank_title", ""))[:30]
-            rank_desc = str(data.get("rank_desc", ""))[:70]  # 约35字
+            rank_title = ChatAnalysisUtils._as_str(data.get("rank_title", ""), 30)
+            rank_desc = ChatAnalysisUtils._as_str(data.get("rank_desc", ""), 70)  # 约35字
 
-            mood = str(data.get("mood", "中性"))
+            mood = ChatAnalysisUtils._as_str(data.get("mood", "中性"))
 
             # 验证 mood 值
-            if mood not in ["积极", "中性", "消极"]:
+            if mood not in ChatAnalysisUtils.VALID_MOODS:
                 mood = "中性"
 
             # 验证 mood_score
@@ -999,7 +1435,7 @@ class ChatAnalysisUtils:
             except (ValueError, TypeError):
                 mood_score = 50
 
-            mood_reason = str(data.get("mood_reason", ""))[:50]  # 限制为50字符（约25汉字）
+            mood_reason = ChatAnalysisUtils._as_str(data.get("mood_reason", ""), 50)  # 限制为50字符（约25汉字）
 
             if not tags or not active_time or not fun_comment or not topic_comment or not rank_title or not rank_desc or not mood_reason:
                 logger.warning("用户画像数据字段为空")
@@ -1023,6 +1459,107 @@ class ChatAnalysisUtils:
             logger.error(f"验证用户画像数据失败: {e}")
             return None
 
+    @staticmethod
+    def _extract_first_json(text: str, opener: str) -> Optional[str]:
+        """单遍扫描提取第一个括号配平的 JSON 对象/数组
+
+        跳过字符串字面量中的括号，避免 JSON 后附带的说明文字里出现括号时截取范围出错。
+
+        Args:
+            text: 待扫描文本
+            opener: 起始括号，"{" 或 "["
+
+        Returns:
+            配平的 JSON 片段，没有起始括号或未闭合（被截断）时返回 None
+        """
+        start = text.find(opener)
+        if start == -1:
+            return None
+
+        depth = 0
+        for match in ChatAnalysisUtils.JSON_BRACKET_TOKEN_PATTERNS[opener].finditer(text, start):
+            token = match.group()
+            if token == opener:
+                depth += 1
+            elif token[0] != '"':
+                depth -= 1
+                if depth == 0:
+                    return text[start:match.end()]
+        return None
+
+    @staticmethod
+    def _strip_markdown_fence(result: str) -> str:
+        """去除 LLM 输出中可能的 markdown 代码块标记"""
+        result = result.strip()
+        if result.startswith("```"):
+            parts = result.split("```")
+            if len(parts) >= 2:
+                result = parts[1]
+                if result.startswith("json"):
+                    result = result[4:]
+        return result.strip()
+
+    @staticmethod
+    def _slice_json(
+        text: str,
+        opener: str,
+        closer: str,
+        balanced: bool = True,
+        keep_truncated: bool = False
+    ) -> str:
+        """截取文本中的 JSON 部分
+
+        Args:
+            text: 待截取文本
+            opener: 起始括号，"{" 或 "["
+            closer: 结束括号，"}" 或 "]"
+            balanced: 是否优先提取第一个配平的片段（否则直接取第一个起始括号到最后一个结束括号）
+            keep_truncated: 没有结束括号（被截断）时是否保留从起始括号到末尾的内容
+
+        Returns:
+            截取后的文本，找不到起始括号时原样返回
+        """
+        if balanced:
+            extracted = ChatAnalysisUtils._extract_first_json(text, opener)
+            if extracted is not None:
+                return extracted
+
+        start_idx = text.find(opener)
+        end_idx = text.rfind(closer)
+        if start_idx != -1 and end_idx > start_idx:
+            return text[start_idx:end_idx + 1]
+        if keep_truncated and start_idx != -1:
+            return text[start_idx:]
+        return text
+
+    @staticmethod
+    def _loads_without_trailing_commas(text: str) -> Any:
+        """去除对象/数组末尾多余的逗号后重新解析
+
+        代价远低于 emoji 和空格清理，解析失败时优先尝试。
+
+        Returns:
+            解析结果，没有多余逗号或仍然解析失败时返回 None
+        """
+        fixed, count = ChatAnalysisUtils.TRAILING_COMMA_PATTERN.subn(r'\1', text)
+        if not count:
+            return None
+        try:
+            return _json_loads(fixed)
+        except json.JSONDecodeError:
+            return None
+
+    @staticmethod
+    def _clean_llm_json(text: str) -> str:
+        """清理 LLM 输出中导致 JSON 解析失败的内容：emoji 及中文字符、数字间的异常空格"""
+        # 纯 ASCII 文本不可能含 emoji 或中文，无需任何替换
+        if text.isascii():
+            return text
+        text = ChatAnalysisUtils.EMOJI_PATTERN.sub('', text)
+        text = ChatAnalysisUtils.CJK_SPACE_CJK_PATTERN.sub(r'\1\2', text)
+        text = ChatAnalysisUtils.CJK_SPACE_DIGIT_PATTERN.sub(r'\1\2', text)
+        return ChatAnalysisUtils.DIGIT_SPACE_CJK_PATTERN.sub(r'\1\2', text)
+
     @staticmethod
     def _parse_llm_json_object(result: str) -> Optional[Dict[str, Any]]:
         """解析 LLM 返回的 JSON 对象（非数组）
@@ -1034,25 +1571,19 @@ class ChatAnalysisUtils:
             解析后的字典，失败返回 None
         """
         try:
-            # 去除可能的 markdown 代码块标记
-            result = result.strip()
-            if result.startswith("```"):
-                parts = result.split("```")
-                if len(parts) >= 2:
-                    result = parts[1]
-                    if result.startswith("json"):
-                        result = result[4:]
-            result = result.strip()
-
-            # 尝试提取JSON对象部分（从第一个 { 到最后一个 }）
-            start_idx = result.find('{')
-            end_idx = result.rfind('}')
-
-            if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                result = result[start_idx:end_idx + 1]
-
-            # 尝试直接解析
-            data = json.loads(result)
+            text = ChatAnalysisUtils._strip_markdown_fence(result)
+            sliced = ChatAnalysisUtils._slice_json(text, '{', '}')
+            try:
+                data = _json_loads(sliced)
+            except json.JSONDecodeError as e:
+                # 先尝试代价最低的修复：去除末尾多余的逗号
+                data = ChatAnalysisUtils._loads_without_trailing_commas(sliced)
+                if data is None:
+                    # 仍然失败才清理后重试（放宽为第一个 { 到最后一个 }）
+                    logger.warning(f"解析 JSON 对象失败: {e}, 尝试清理后重试")
+                    cleaned = ChatAnalysisUtils._clean_llm_json(text)
+                    data = _json_loads(ChatAnalysisUtils._slice_json(cleaned, '{', '}', balanced=False))
+                    logger.info("成功通过清理解析JSON对象")
 
             # 验证返回的是字典
             if not isinstance(data, dict):
@@ -1061,34 +1592,8 @@ class ChatAnalysisUtils:
 
             return data
 
-        except json.JSONDecodeError as e:
-            logger.warning(f"解析 JSON 对象失败: {e}, 尝试清理后重试")
-            try:
-                # 移除 emoji
-                result_cleaned = ChatAnalysisUtils.EMOJI_PATTERN.sub('', result)
-
-                # 再次提取JSON对象部分
-                start_idx = result_cleaned.find('{')
-                end_idx = result_cleaned.rfind('}')
-
-                if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                    result_cleaned = result_cleaned[start_idx:end_idx + 1]
-
-                # 修复中文字符间的异常空格
-                result_cleaned = re.sub(r'([\u4e00-\u9fff])\s+([\u4e00-\u9fff])', r'\1\2', result_cleaned)
-
-                data = json.loads(result_cleaned)
-
-                if not isinstance(data, dict):
-                    return None
-
-                logger.info("成功通过清理解析JSON对象")
-                return data
-            except Exception as e2:
-                logger.error(f"清理后仍然失败: {e2}")
-                return None
         except Exception as e:
-            logger.error(f"解析JSON对象时发生错误: {e}")
+            logger.error(f"解析JSON对象失败: {e}")
             return None
 
     @staticmethod
@@ -1102,26 +1607,33 @@ class ChatAnalysisUtils:
             解析后的列表，失败返回空列表
         """
         try:
-            # 去除可能的 markdown 代码块标记
-            result = result.strip()
-            if result.startswith("```"):
-                parts = result.split("```")
-                if len(parts) >= 2:
-                    result = parts[1]
-                    if result.startswith("json"):
-                        result = result[4:]
-            result = result.strip()
-
-            # 尝试提取JSON数组部分（从第一个 [ 到最后一个 ]）
-            # 这可以处理LLM在JSON后添加额外说明文本的情况
-            start_idx = result.find('[')
-            end_idx = result.rfind(']')
-
-            if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                result = result[start_idx:end_idx + 1]
-
-            # 尝试直接解析
-            data = json.loads(result)
+            text = ChatAnalysisUtils._strip_markdown_fence(result)
+            # 提取第一个配平的JSON数组，可以处理LLM在JSON后添加额外说明文本的情况
+            sliced = ChatAnalysisUtils._slice_json(text, '[', ']')
+            try:
+                data = _json_loads(sliced)
+            except json.JSONDecodeError as e:
+                # 先尝试代价最低的修复：去除末尾多余的逗号
+                data = ChatAnalysisUtils._loads_without_trailing_commas(sliced)
+                if data is None:
+                    logger.warning(f"解析 JSON 失败: {e}, 尝试清理emoji和修复格式后重试")
+                    logger.debug(f"原始LLM输出（前500字符）: {text[:500]}")
+                    # 只有解析失败时才清理，JSON 被截断（没有闭合的 ]）时保留到末尾以便修复
+                    cleaned = ChatAnalysisUtils._slice_json(
+                        ChatAnalysisUtils._clean_llm_json(text), '[', ']',
+                        balanced=False, keep_truncated=True
+                    )
+                    try:
+                        data = _json_loads(cleaned)
+                    except json.JSONDecodeError:
+                        # JSON 被截断，尝试找到最后一个完整的 } 并闭合数组
+                        fixed = ChatAnalysisUtils._fix_truncated_json_array(cleaned)
+                        if not fixed:
+                            logger.debug(f"清理后的内容（前500字符）: {cleaned[:500]}")
+                            raise
+                        data = _json_loads(fixed)
+                        logger.info(f"成功修复截断的JSON，解析出 {len(data)} 个对象")
+                    logger.info("成功通过清理和修复解析JSON")
 
             # 验证返回的是列表
             if not isinstance(data, list):
@@ -1135,57 +1647,8 @@ class ChatAnalysisUtils:
 
             return data
 
-        except json.JSONDecodeError as e:
-            logger.warning(f"解析 JSON 失败: {e}, 尝试清理emoji和修复格式后重试")
-            logger.debug(f"原始LLM输出（前500字符）: {result[:500]}")
-            # 只有解析失败时才尝试清理和修复
-            try:
-                # 1. 移除emoji
-                result_cleaned = ChatAnalysisUtils.EMOJI_PATTERN.sub('', result)
-
-                # 2. 再次提取JSON数组部分
-                start_idx = result_cleaned.find('[')
-                end_idx = result_cleaned.rfind(']')
-
-                if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                    result_cleaned = result_cleaned[start_idx:end_idx + 1]
-                elif start_idx != -1:
-                    # JSON 被截断，没有闭合的 ]，尝试修复
-                    result_cleaned = result_cleaned[start_idx:]
-
-                # 3. 尝试修复中文字符间的异常空格（可能是emoji清理或LLM输出导致）
-                # 保留JSON结构中的必要空格，只清理中文字符、数字、标点间的多余空格
-                result_cleaned = re.sub(r'([\u4e00-\u9fff])\s+([\u4e00-\u9fff])', r'\1\2', result_cleaned)
-                result_cleaned = re.sub(r'([\u4e00-\u9fff])\s+([\d])', r'\1\2', result_cleaned)
-                result_cleaned = re.sub(r'([\d])\s+([\u4e00-\u9fff])', r'\1\2', result_cleaned)
-
-                # 4. 尝试修复被截断的 JSON（找到最后一个完整的对象）
-                try:
-                    data = json.loads(result_cleaned)
-                except json.JSONDecodeError:
-                    # JSON 被截断，尝试找到最后一个完整的 } 并闭合数组
-                    result_fixed = ChatAnalysisUtils._fix_truncated_json_array(result_cleaned)
-                    if result_fixed:
-                        data = json.loads(result_fixed)
-                        logger.info(f"成功修复截断的JSON，解析出 {len(data)} 个对象")
-                    else:
-                        raise
-
-                if not isinstance(data, list):
-                    logger.warning(f"清理后的数据类型错误: {type(data)}")
-                    return []
-                if data and not all(isinstance(item, dict) for item in data):
-                    logger.warning("清理后的列表包含非字典元素")
-                    return []
-
-                logger.info("成功通过清理和修复解析JSON")
-                return data
-            except Exception as e2:
-                logger.error(f"清理emoji和修复格式后仍然失败: {e2}")
-                logger.debug(f"清理后的内容（前500字符）: {result_cleaned[:500] if 'result_cleaned' in locals() else 'N/A'}")
-                return []
         except Exception as e:
-            logger.error(f"解析JSON时发生未预期错误: {e}")
+            logger.error(f"解析JSON失败: {e}")
             return []
 
     @staticmethod
@@ -1232,7 +1695,7 @@ class ChatAnalysisUtils:
                 candidate = candidate + '\n]'
 
                 try:
-                    data = json.loads(candidate)
+                    data = _json_loads(candidate)
                     if isinstance(data, list) and len(data) > 0:
                         return candidate
                 except json.JSONDecodeError:
@@ -1246,7 +1709,26 @@ class ChatAnalysisUtils:
     # ==================== 单用户总结专用函数 ====================
 
     @staticmethod
-    def filter_user_messages(messages: List[dict], user_id: str) -> List[dict]:
+    def group_messages_by_user(messages: MessageList) -> Dict[str, List[ParsedMessage]]:
+        """按用户分组消息（保持原有顺序），同一群分析多个用户时只需遍历一次全部消息
+
+        Args:
+            messages: 聊天记录列表
+
+        Returns:
+            {user_id: 该用户的预处理消息列表}，忽略没有 user_id 的消息
+        """
+        grouped: Dict[str, List[ParsedMessage]] = {}
+        for msg in ChatAnalysisUtils._ensure_parsed(messages):
+            if msg.user_id:
+                grouped.setdefault(msg.user_id, []).append(msg)
+        return grouped
+
+    @staticmethod
+    def filter_user_messages(
+        messages: MessageList,
+        user_id: str
+    ) -> MessageList:
         """过滤出指定用户的消息
 
         Args:
@@ -1257,13 +1739,15 @@ class ChatAnalysisUtils:
             该用户的消息列表
         """
         user_id_str = str(user_id)
+        if messages and isinstance(messages[0], ParsedMessage):
+            return [msg for msg in messages if msg.user_id == user_id_str]
         return [
             msg for msg in messages
             if str(msg.get("user_id", "")) == user_id_str
         ]
 
     @staticmethod
-    def analyze_single_user_stats(messages: List[dict]) -> Dict:
+    def analyze_single_user_stats(messages: MessageList) -> Dict:
         """分析单个用户的统计数据（只使用该用户的消息）
 
         Args:
@@ -1277,27 +1761,22 @@ class ChatAnalysisUtils:
                 "message_count": 0,
                 "char_count": 0,
                 "emoji_count": 0,
-                "hours": Counter(),
+                "hours": [0] * 24,
                 "hourly_distribution": {}
             }
 
-        message_count = 0
-        char_count = 0
-        emoji_count = 0
-        hours = Counter()
-
-        for msg in messages:
-            text = msg.get("processed_plain_text") or ""
-            message_count += 1
-            char_count += len(text)
-            emoji_count += ChatAnalysisUtils.count_emojis(text)
+        messages = ChatAnalysisUtils._ensure_parsed(messages)
+        message_count = len(messages)
+        char_count = sum(map(attrgetter("text_len"), messages))
+        emoji_count = sum(map(attrgetter("emoji_count"), messages))
 
-            timestamp = msg.get("time", 0)
-            hour = datetime.fromtimestamp(timestamp).hour
+        # 各小时发言次数（下标为小时）
+        hours = [0] * 24
+        for hour in map(attrgetter("hour"), messages):
             hours[hour] += 1
 
-        # 构建24小时分布
-        hourly_distribution = {h: hours.get(h, 0) for h in range(24)}
+        # 构建24小时分布（hours 已是稠密列表，直接按下标展开）
+        hourly_distribution = dict(enumerate(hours))
 
         return {
             "message_count": message_count,
@@ -1308,8 +1787,228 @@ class ChatAnalysisUtils:
         }
 
     @staticmethod
+    def _extract_samples(user_messages: MessageList) -> Dict[str, List[str]]:
+        """单次遍历收集单用户画像、炫压抑评级和金句所需的发言样本
+
+        三类样本各自收满后不再追加，全部收满时提前结束遍历。
+
+        Args:
+            user_messages: 该用户的聊天记录列表（已过滤）
+
+        Returns:
+            {"portrait": 画像样本, "depression": 炫压抑评级样本, "quotes": 金句候选}
+        """
+        portrait: List[str] = []    # 至少5字，截取前80字，最多10条
+        depression: List[str] = []  # 至少5字，截取前100字，最多15条
+        quotes: List[str] = []      # 8-100字的完整发言，最多30条
+
+        for msg in ChatAnalysisUtils._ensure_parsed(user_messages):
+            text = msg.text
+            text_len = len(text)
+            if text_len >= 5:
+                if len(portrait) < 10:
+                    portrait.append(text[:80])
+                if len(depression) < 15:
+                    depression.append(text[:100])
+            if 8 <= text_len <= 100 and len(quotes) < 30:
+                quotes.append(text)
+
+            if len(portrait) >= 10 and len(depression) >= 15 and len(quotes) >= 30:
+                break
+
+        return {"portrait": portrait, "depression": depression, "quotes": quotes}
+
+    @staticmethod
+    async def analyze_single_user_all(
+        user_messages: MessageList,
+        user_name: str,
+        user_id: str
+    ) -> Dict[str, Any]:
+        """并发执行单个用户的统计和全部分析（总结、画像、炫压抑评级、金句）
+
+        消息只预处理一次，样本只收集一次，四个 LLM 请求同时发出。
+
+        Args:
+            user_messages: 该用户的聊天记录列表（已过滤）
+            user_name: 用户名称
+            user_id: 用户ID
+
+        Returns:
+            {"stats": ..., "summary": ..., "portrait": ..., "depression": ..., "quotes": ...}，失败项为 None
+        """
+        user_messages = ChatAnalysisUtils.preprocess_messages(user_messages)
+        stats = ChatAnalysisUtils.analyze_single_user_stats(user_messages)
+        samples = ChatAnalysisUtils._extract_samples(user_messages)
+
+        keys = ("summary", "portrait", "depression", "quotes")
+        results = await asyncio.gather(
+            ChatAnalysisUtils.analyze_single_user_summary(user_messages, user_name, user_id),
+            ChatAnalysisUtils.analyze_single_user_portrait(
+                user_messages, user_name, user_id, samples["portrait"], stats
+            ),
+            ChatAnalysisUtils.analyze_single_user_depression(
+                user_messages, user_name, user_id, samples["depression"]
+            ),
+            ChatAnalysisUtils.analyze_single_user_quotes(
+                user_messages, user_name, user_id, samples["quotes"]
+            ),
+            return_exceptions=True,
+        )
+
+        user_results: Dict[str, Any] = {"stats": stats}
+        for key, result in zip(keys, results):
+            if isinstance(result, BaseException):
+                logger.error(f"分析用户 {user_name} 的{key}失败: {result}")
+                result = None
+            user_results[key] = result
+        return user_results
+
+    @staticmethod
+    async def analyze_single_user_combined(
+        user_messages: MessageList,
+        user_name: str,
+        user_id: str
+    ) -> Dict[str, Any]:
+        """用一次 LLM 调用完成单个用户的总结、画像、炫压抑评级和金句
+
+        发言记录只在 prompt 中出现一次（分开请求时每项都要重复发送），只需一次往返。
+        合并请求失败或返回无法解析时，回退到 analyze_single_user_all 分别并发请求。
+
+        Args:
+            user_messages: 该用户的聊天记录列表（已过滤）
+            user_name: 用户名称
+            user_id: 用户ID
+
+        Returns:
+            {"stats": ..., "summary": ..., "portrait": ..., "depression": ..., "quotes": ...}，失败项为 None
+        """
+        user_messages = ChatAnalysisUtils.preprocess_messages(user_messages)
+        stats = ChatAnalysisUtils.analyze_single_user_stats(user_messages)
+        samples = ChatAnalysisUtils._extract_samples(user_messages)
+
+        results = await ChatAnalysisUtils._analyze_single_user_combined_llm(
+            user_messages, user_name, user_id, stats, samples
+        )
+        if results is None:
+            logger.warning(f"合并分析用户 {user_name} 失败，改为分别请求")
+            return await ChatAnalysisUtils.analyze_single_user_all(user_messages, user_name, user_id)
+
+        return {"stats": stats, **results}
+
+    @staticmethod
+    @_cache_user_analysis("combined")
+    async def _analyze_single_user_combined_llm(
+        user_messages: List[ParsedMessage],
+        user_name: str,
+        user_id: str,
+        stats: Dict,
+        samples: Dict[str, List[str]]
+    ) -> Optional[Dict[str, Any]]:
+        """构建合并 prompt 并解析结果（各项的适用条件与单独分析时一致）
+
+        Returns:
+            {"summary": ..., "portrait": ..., "depression": ..., "quotes": ...}，请求或解析失败时返回 None
+        """
+        try:
+            messages_text = ChatAnalysisUtils._summary_messages_text(user_messages)
+            if not messages_text:
+                return None
+
+            message_count = len(user_messages)
+            want_profile = message_count >= 3 and bool(samples["portrait"])
+            want_depression = message_count >= 3 and bool(samples["depression"])
+            want_quotes = message_count >= 5 and len(samples["quotes"]) >= 5
+
+            tasks = ['"summary"：今日总结（80-150字）。总结聊了什么话题、表达了什么观点，描述活跃程度和情绪状态，语气轻松有趣，像朋友聊天一样']
+            fields = ['  "summary": "总结文本"']
+            if want_profile:
+                tasks.append('"portrait"：群友画像。title 为称号（2-4个汉字），有趣且贴切；mbti 为基于发言特征判断的MBTI类型（如ENFP）；reason 为画像描述（60-80字），引用上方统计数据，有趣但不失真实')
+                fields.append(f'  "portrait": {{"name": "{user_name}", "title": "称号", "mbti": "MBTI类型", "reason": "画像描述"}}')
+            if want_depression:
+                tasks.append('"depression"：娱乐向"炫压抑"指数（性欲望强烈但表达受抑制的失衡状态）。'
+                             'S级(121-150分)想色色但欲言又止,或疯狂发涩图/开黄腔(过度补偿)；A级(91-120分)经常想开车但克制扭捏；'
+                             'B级(61-90分)偶尔开车,表达自然；C级(31-60分)很少提及或表达健康；D级(0-30分)完全回避性话题。'
+                             '给出0-150的精确分数，评价25-30字，采用文言文风格，文雅而有趣')
+                fields.append(f'  "depression": {{"name": "{user_name}", "rank": "S/A/B/C/D", "score": 0-150的整数分数, "comment": "简短评价"}}')
+            if want_quotes:
+                tasks.append('"quotes"：从发言记录中挑选1-2条最有趣/最有深度/最搞笑的金句（原文照录，8-100字），每条配10-15字的点评理由；没有特别出彩的发言可以只返回1条或空数组')
+                fields.append('  "quotes": [{"content": "金句内容", "reason": "点评理由"}]')
+
+            tasks_text = "\n".join(f"{i}. {task}" for i, task in enumerate(tasks, 1))
+            fields_text = ",\n".join(fields)
+            stats_text = f"\n\n统计数据：\n{ChatAnalysisUtils._format_user_stats(user_name, stats)}" if want_profile else ""
+
+            prompt = f"""这是用户"{user_name}"今天在群里的发言记录：
+{messages_text}{stats_text}
+
+请一次完成以下分析：
+{tasks_text}
+
+返回一个JSON对象（不要markdown代码块，不要emoji）：
+{{
+{fields_text}
+}}"""
+
+            success, result, reasoning, model_name = await ChatAnalysisUtils._generate_with_model(
+                prompt=prompt,
+                request_type="plugin.chat_summary.single_user_combined",
+            )
+
+            if not success:
+                logger.error(f"LLM合并分析单用户失败: {result}")
+                return None
+
+            data = ChatAnalysisUtils._parse_llm_json_object(result)
+            if not data:
+                return None
+
+            summary = ChatAnalysisUtils._as_str(data.get("summary", "")).strip()
+            if not summary:
+                return None
+
+            portrait = None
+            if want_profile and isinstance(data.get("portrait"), dict):
+                portrait = ChatAnalysisUtils._validate_single_user_portrait(data["portrait"], user_name, user_id)
+
+            depression = None
+            if want_depression and isinstance(data.get("depression"), dict):
+                depression = ChatAnalysisUtils._validate_single_user_depression(data["depression"], user_name, user_id)
+
+            quotes = None
+            if want_quotes and isinstance(data.get("quotes"), list):
+                quotes = ChatAnalysisUtils._validate_single_user_quotes(data["quotes"], user_name)
+
+            return {"summary": summary, "portrait": portrait, "depression": depression, "quotes": quotes}
+
+        except Exception as e:
+            logger.error(f"合并分析单用户失败: {e}", exc_info=True)
+            return None
+
+    @staticmethod
+    def _summary_messages_text(user_messages: MessageList) -> Optional[str]:
+        """选取单用户总结使用的发言并格式化为 "[HH:MM] 内容" 文本
+
+        限制消息数量，避免 prompt 过长：超过50条时取前20条、中间10条、后20条，只格式化这些消息。
+
+        Returns:
+            格式化后的发言文本，没有文本消息时返回 None
+        """
+        text_messages = [msg for msg in ChatAnalysisUtils._ensure_parsed(user_messages) if msg.text]
+        if not text_messages:
+            return None
+
+        n = len(text_messages)
+        if n > 50:
+            sample_messages = text_messages[:20] + text_messages[n // 2 - 5:n // 2 + 5] + text_messages[-20:]
+        else:
+            sample_messages = text_messages
+
+        return "\n".join(f"[{msg.time_hm}] {msg.text}" for msg in sample_messages)
+
+    @staticmethod
+    @_cache_user_analysis("summary")
     async def analyze_single_user_summary(
-        user_messages: List[dict],
+        user_messages: MessageList,
         user_name: str,
         user_id: str
     ) -> Optional[str]:
@@ -1327,27 +2026,10 @@ class ChatAnalysisUtils:
             if not user_messages:
                 return None
 
-            # 格式化该用户的消息
-            formatted_messages = []
-            for msg in user_messages:
-                timestamp = msg.get("time", 0)
-                time_str = datetime.fromtimestamp(timestamp).strftime("%H:%M")
-                text = msg.get("processed_plain_text") or ""
-                if text:
-                    formatted_messages.append(f"[{time_str}] {text}")
-
-            if not formatted_messages:
+            messages_text = ChatAnalysisUtils._summary_messages_text(user_messages)
+            if not messages_text:
                 return None
 
-            # 限制消息数量，避免 prompt 过长
-            if len(formatted_messages) > 50:
-                # 取前20条、中间10条、后20条
-                sample_messages = formatted_messages[:20] + formatted_messages[len(formatted_messages)//2-5:len(formatted_messages)//2+5] + formatted_messages[-20:]
-            else:
-                sample_messages = formatted_messages
-
-            messages_text = "\n".join(sample_messages)
-
             # 构建 prompt
             prompt = f"""请根据以下聊天记录，为用户"{user_name}"生成一段今日总结。
 
@@ -1363,10 +2045,8 @@ class ChatAnalysisUtils:
 6. 直接输出总结文本，不要加任何前缀或标题"""
 
             # 使用 LLM 生成
-            model_task_config = model_config.model_task_config.replyer
-            success, result, reasoning, model_name = await llm_api.generate_with_model(
+            success, result, reasoning, model_name = await ChatAnalysisUtils._generate_with_model(
                 prompt=prompt,
-                model_config=model_task_config,
                 request_type="plugin.chat_summary.single_user_summary",
             )
 
@@ -1381,57 +2061,90 @@ class ChatAnalysisUtils:
             return None
 
     @staticmethod
-    async def analyze_single_user_portrait(
-        user_messages: List[dict],
+    def _build_portrait_section(
+        user_messages: MessageList,
         user_name: str,
-        user_id: str
-    ) -> Optional[Dict]:
-        """生成单用户的群友画像（只使用该用户的消息）
+        samples: Optional[List[str]] = None,
+        stats: Optional[Dict] = None
+    ) -> Optional[str]:
+        """统计单个用户的画像数据并格式化为 prompt 段落
 
         Args:
             user_messages: 该用户的聊天记录列表（已过滤）
             user_name: 用户名称
-            user_id: 用户ID
+            samples: 已收集的发言样本（_extract_samples 的 portrait 项），不提供时重新收集
+            stats: 已计算的统计数据（analyze_single_user_stats 的结果），不提供时重新计算
 
         Returns:
-            画像数据字典
+            用户数据段落，发言太少或没有有效样本时返回 None
         """
-        try:
-            if not user_messages or len(user_messages) < 3:
-                return None
+        if not user_messages or len(user_messages) < 3:
+            return None
 
-            # 收集发言样本
-            samples = []
-            for msg in user_messages:
-                text = msg.get("processed_plain_text") or ""
-                if len(text) >= 5 and len(samples) < 10:
-                    samples.append(text[:80])
+        user_messages = ChatAnalysisUtils._ensure_parsed(user_messages)
+        if samples is None:
+            samples = ChatAnalysisUtils._extract_samples(user_messages)["portrait"]
 
-            if not samples:
-                return None
+        if not samples:
+            return None
 
-            samples_text = "\n".join([f"- {s}" for s in samples])
+        samples_text = "\n".join([f"- {s}" for s in samples])
 
-            # 统计数据
+        # 统计数据
+        if stats is None:
             stats = ChatAnalysisUtils.analyze_single_user_stats(user_messages)
-            avg_chars = stats["char_count"] / stats["message_count"] if stats["message_count"] > 0 else 0
-            emoji_ratio = stats["emoji_count"] / stats["message_count"] if stats["message_count"] > 0 else 0
 
-            # 时段分布
-            hours = stats["hours"]
-            night_messages = sum(hours[h] for h in range(0, 6))
-            night_ratio = night_messages / stats["message_count"] if stats["message_count"] > 0 else 0
+        return f"""{ChatAnalysisUtils._format_user_stats(user_name, stats)}
 
-            prompt = f"""根据用户数据生成群友画像。
+发言样本：
+{samples_text}"""
 
-用户：{user_name}
-发言数：{stats['message_count']}条
+    @staticmethod
+    def _format_user_stats(user_name: str, stats: Dict) -> str:
+        """将单用户统计数据格式化为画像 prompt 的数据行（发言数、平均字数、表情比例、夜间发言比例）"""
+        message_count = stats["message_count"]
+        avg_chars = stats["char_count"] / message_count if message_count > 0 else 0
+        emoji_ratio = stats["emoji_count"] / message_count if message_count > 0 else 0
+
+        # 时段分布
+        night_messages = sum(stats["hours"][:6])
+        night_ratio = night_messages / message_count if message_count > 0 else 0
+
+        return f"""用户：{user_name}
+发言数：{message_count}条
 平均字数：{avg_chars:.1f}字/条
 表情比例：{emoji_ratio:.2f}
-夜间发言比例：{night_ratio:.2f}
+夜间发言比例：{night_ratio:.2f}"""
 
-发言样本：
-{samples_text}
+    @staticmethod
+    @_cache_user_analysis("portrait")
+    async def analyze_single_user_portrait(
+        user_messages: MessageList,
+        user_name: str,
+        user_id: str,
+        samples: Optional[List[str]] = None,
+        stats: Optional[Dict] = None
+    ) -> Optional[Dict]:
+        """生成单用户的群友画像（只使用该用户的消息）
+
+        Args:
+            user_messages: 该用户的聊天记录列表（已过滤）
+            user_name: 用户名称
+            user_id: 用户ID
+            samples: 已收集的发言样本，不提供时重新收集
+            stats: 已计算的统计数据，不提供时重新计算
+
+        Returns:
+            画像数据字典
+        """
+        try:
+            section = ChatAnalysisUtils._build_portrait_section(user_messages, user_name, samples, stats)
+            if not section:
+                return None
+
+            prompt = f"""根据用户数据生成群友画像。
+
+{section}
 
 要求：
 1. title: 称号（2-4个汉字），有趣且贴切
@@ -1446,10 +2159,8 @@ class ChatAnalysisUtils:
   "reason": "画像描述"
 }}"""
 
-            model_task_config = model_config.model_task_config.replyer
-            success, result, reasoning, model_name = await llm_api.generate_with_model(
+            success, result, reasoning, model_name = await ChatAnalysisUtils._generate_with_model(
                 prompt=prompt,
-                model_config=model_task_config,
                 request_type="plugin.chat_summary.single_user_portrait",
             )
 
@@ -1461,23 +2172,19 @@ class ChatAnalysisUtils:
             if not data:
                 return None
 
-            return {
-                "name": data.get("name", user_name),
-                "title": data.get("title", ""),
-                "mbti": data.get("mbti", ""),
-                "reason": data.get("reason", ""),
-                "user_id": user_id
-            }
+            return ChatAnalysisUtils._validate_single_user_portrait(data, user_name, user_id)
 
         except Exception as e:
             logger.error(f"生成单用户画像失败: {e}", exc_info=True)
             return None
 
     @staticmethod
+    @_cache_user_analysis("depression")
     async def analyze_single_user_depression(
-        user_messages: List[dict],
+        user_messages: MessageList,
         user_name: str,
-        user_id: str
+        user_id: str,
+        samples: Optional[List[str]] = None
     ) -> Optional[Dict]:
         """生成单用户的炫压抑评级（只使用该用户的消息）
 
@@ -1485,6 +2192,7 @@ class ChatAnalysisUtils:
             user_messages: 该用户的聊天记录列表（已过滤）
             user_name: 用户名称
             user_id: 用户ID
+            samples: 已收集的发言样本（_extract_samples 的 depression 项），不提供时重新收集
 
         Returns:
             评级数据字典
@@ -1493,12 +2201,8 @@ class ChatAnalysisUtils:
             if not user_messages or len(user_messages) < 3:
                 return None
 
-            # 收集发言样本
-            samples = []
-            for msg in user_messages:
-                text = msg.get("processed_plain_text") or ""
-                if len(text) >= 5 and len(samples) < 15:
-                    samples.append(text[:100])
+            if samples is None:
+                samples = ChatAnalysisUtils._extract_samples(user_messages)["depression"]
 
             if not samples:
                 return None
@@ -1530,10 +2234,8 @@ class ChatAnalysisUtils:
   "comment": "简短评价"
 }}"""
 
-            model_task_config = model_config.model_task_config.replyer
-            success, result, reasoning, model_name = await llm_api.generate_with_model(
+            success, result, reasoning, model_name = await ChatAnalysisUtils._generate_with_model(
                 prompt=prompt,
-                model_config=model_task_config,
                 request_type="plugin.chat_summary.single_user_depression",
             )
 
@@ -1545,33 +2247,77 @@ class ChatAnalysisUtils:
             if not data:
                 return None
 
-            # 验证并提取 score（0-150），用于精确排序
-            rank = data.get("rank", "C")
-            try:
-                score = int(data.get("score", 0))
-                score = max(0, min(150, score))  # 限制在 0-150 范围内
-            except (ValueError, TypeError):
-                # 如果没有 score 或无效，根据 rank 给一个默认分数
-                rank_default_scores = {"S": 135, "A": 105, "B": 75, "C": 45, "D": 15}
-                score = rank_default_scores.get(rank, 75)
-
-            return {
-                "name": data.get("name", user_name),
-                "rank": rank,
-                "score": score,
-                "comment": data.get("comment", ""),
-                "user_id": user_id
-            }
+            return ChatAnalysisUtils._validate_single_user_depression(data, user_name, user_id)
 
         except Exception as e:
             logger.error(f"生成单用户炫压抑评级失败: {e}", exc_info=True)
             return None
 
     @staticmethod
+    def _validate_single_user_portrait(data: Dict[str, Any], user_name: str, user_id: str) -> Dict[str, Any]:
+        """按固定结构验证单用户画像（只保留约定字段，限制长度，MBTI 取值校验）
+
+        Args:
+            data: LLM 返回的原始数据
+            user_name: 用户名称（name 缺失时使用）
+            user_id: 用户ID
+
+        Returns:
+            验证后的画像数据
+        """
+        mbti = ChatAnalysisUtils._as_str(data.get("mbti", "")).upper().strip()
+        if mbti not in ChatAnalysisUtils.VALID_MBTI_TYPES:
+            logger.warning(f"无效的MBTI类型: {mbti}，使用默认值ENFP")
+            mbti = "ENFP"
+
+        return {
+            "name": ChatAnalysisUtils._as_str(data.get("name", user_name), 50),
+            "title": ChatAnalysisUtils._as_str(data.get("title", ""), AnalysisConfig.MAX_TITLE_LENGTH),
+            "mbti": mbti,
+            "reason": ChatAnalysisUtils._as_str(data.get("reason", ""), AnalysisConfig.MAX_REASON_LENGTH),
+            "user_id": user_id
+        }
+
+    @staticmethod
+    def _validate_single_user_depression(data: Dict[str, Any], user_name: str, user_id: str) -> Dict[str, Any]:
+        """按固定结构验证单用户炫压抑评级（rank 取值校验，score 限制在 0-150）
+
+        Args:
+            data: LLM 返回的原始数据
+            user_name: 用户名称（name 缺失时使用）
+            user_id: 用户ID
+
+        Returns:
+            验证后的评级数据
+        """
+        rank = ChatAnalysisUtils._as_str(data.get("rank", "C")).upper().strip()
+        if rank not in ChatAnalysisUtils.VALID_RANKS:
+            logger.warning(f"无效的rank值: {rank}，使用默认值C")
+            rank = "C"
+
+        # 验证并提取 score（0-150），用于精确排序
+        try:
+            score = int(data.get("score", 0))
+            score = max(0, min(150, score))  # 限制在 0-150 范围内
+        except (ValueError, TypeError):
+            # 如果没有 score 或无效，根据 rank 给一个默认分数
+            score = ChatAnalysisUtils.RANK_DEFAULT_SCORES[rank]
+
+        return {
+            "name": ChatAnalysisUtils._as_str(data.get("name", user_name), 50),
+            "rank": rank,
+            "score": score,
+            "comment": ChatAnalysisUtils._as_str(data.get("comment", ""), 60),  # 30字约60字符
+            "user_id": user_id
+        }
+
+    @staticmethod
+    @_cache_user_analysis("quotes")
     async def analyze_single_user_quotes(
-        user_messages: List[dict],
+        user_messages: MessageList,
         user_name: str,
-        user_id: str
+        user_id: str,
+        samples: Optional[List[str]] = None
     ) -> Optional[List[Dict]]:
         """提取单用户的金句（只使用该用户的消息）
 
@@ -1579,6 +2325,7 @@ class ChatAnalysisUtils:
             user_messages: 该用户的聊天记录列表（已过滤）
             user_name: 用户名称
             user_id: 用户ID
+            samples: 已收集的有效发言（_extract_samples 的 quotes 项），不提供时重新收集
 
         Returns:
             金句列表
@@ -1587,21 +2334,13 @@ class ChatAnalysisUtils:
             if not user_messages or len(user_messages) < 5:
                 return None
 
-            # 收集有效发言
-            valid_messages = []
-            for msg in user_messages:
-                text = msg.get("processed_plain_text") or ""
-                # 过滤太短或太长的消息
-                if 8 <= len(text) <= 100:
-                    valid_messages.append(text)
+            valid_messages = samples
+            if valid_messages is None:
+                valid_messages = ChatAnalysisUtils._extract_samples(user_messages)["quotes"]
 
             if len(valid_messages) < 5:
                 return None
 
-            # 限制数量
-            if len(valid_messages) > 30:
-                valid_messages = valid_messages[:30]
-
             messages_text = "\n".join([f"- {msg}" for msg in valid_messages])
 
             prompt = f"""从用户发言中挑选1-2条最有趣/最有深度/最搞笑的金句。
@@ -1623,10 +2362,8 @@ class ChatAnalysisUtils:
   }}
 ]"""
 
-            model_task_config = model_config.model_task_config.replyer
-            success, result, reasoning, model_name = await llm_api.generate_with_model(
+            success, result, reasoning, model_name = await ChatAnalysisUtils._generate_with_model(
                 prompt=prompt,
-                model_config=model_task_config,
                 request_type="plugin.chat_summary.single_user_quotes",
             )
 
@@ -1638,18 +2375,26 @@ class ChatAnalysisUtils:
             if not data:
                 return None
 
-            # 验证并返回
-            quotes = []
-            for item in data[:2]:  # 最多2条
-                if isinstance(item, dict) and item.get("content") and item.get("reason"):
-                    quotes.append({
-                        "content": str(item["content"])[:100],
-                        "reason": str(item["reason"])[:30],
-                        "sender": user_name
-                    })
-
-            return quotes if quotes else None
+            return ChatAnalysisUtils._validate_single_user_quotes(data, user_name)
 
         except Exception as e:
             logger.error(f"生成单用户金句失败: {e}", exc_info=True)
             return None
+
+    @staticmethod
+    def _validate_single_user_quotes(data: List[Any], user_name: str) -> Optional[List[Dict]]:
+        """验证单用户金句（最多2条，content 和 reason 都不能为空）
+
+        Returns:
+            验证后的金句列表，没有有效金句时返回 None
+        """
+        quotes = []
+        for item in data[:2]:  # 最多2条
+            if isinstance(item, dict) and item.get("content") and item.get("reason"):
+                quotes.append({
+                    "content": ChatAnalysisUtils._as_str(item["content"], 100),
+                    "reason": ChatAnalysisUtils._as_str(item["reason"], 30),
+                    "sender": user_name
+                })
+
+        return quotes if quotes else None
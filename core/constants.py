@@ -115,6 +115,23 @@ class AnalysisConfig:
     MAX_REASON_LENGTH: int = 200     # 理由最大长度（防止LLM返回过长，容纳80字+标点符号）
     MAX_TITLE_LENGTH: int = 10       # 称号最大长度
 
+    # LLM 调用
+    MAX_LLM_CONCURRENCY: int = 4     # 同时进行的 LLM 请求上限（避免触发服务商限流）
+    LLM_CACHE_SIZE: int = 1024       # LLM 响应缓存最大条目数
+    LLM_CACHE_TTL: int = 3600        # LLM 响应缓存过期时间（秒）
+    USER_ANALYSIS_CACHE_SIZE: int = 256     # 单用户分析结果缓存最大条目数
+    USER_ANALYSIS_CACHE_TTL: int = 86400    # 单用户分析结果缓存过期时间（秒）
+    SUMMARY_IMAGE_CACHE_SIZE: int = 64          # 总结图片缓存最大条目数（按群/用户 + 时间范围 + 日期）
+    SUMMARY_IMAGE_CACHE_TTL_TODAY: int = 300    # "今天"的总结图片缓存时间（秒），当天仍有新消息
+    SUMMARY_IMAGE_CACHE_TTL_PAST: int = 86400   # "昨天"的总结图片缓存时间（秒），记录已不再变化
+    SUMMARY_IMAGE_CACHE_MAX_MB: int = 16          # 总结图片缓存占用内存上限（MB，按 base64 长度计）
+    DAILY_SUMMARY_CONCURRENCY: int = 2          # 每日自动总结同时处理的群聊数量上限
+    MESSAGE_CACHE_SIZE: int = 32                # 聊天记录查询结果缓存最大条目数（按聊天 + 时间段）
+    MESSAGE_CACHE_TTL: int = 60                 # 聊天记录查询结果缓存时间（秒），期间的新消息不计入
+
     # 炫压抑评级展示配置
     MAX_DEPRESSION_DISPLAY: int = 6          # 炫压抑评级最多展示人数
     DEPRESSION_SHOW_BOTTOM_HALF: bool = True # 是否展示倒数排名（True=前N/2+后N/2，False=只展示前N名）
+
+    # 图片渲染缓存（按渲染后HTML内容哈希复用已生成的图片）
+    IMAGE_CACHE_MAX_MB: int = 50             # 图片缓存目录容量上限（MB），超出时删除最久未用的图片
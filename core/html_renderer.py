@@ -4,25 +4,77 @@ HTML渲染服务
 使用Playwright将HTML转换为图片
 """
 
+import io
 import os
 import asyncio
-from typing import Optional, Dict, Any
-from playwright.async_api import async_playwright, Browser, Page
+import itertools
+from typing import Optional, Dict, Any, Union, Iterator, List, Set
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 
 from src.plugin_system import get_logger
 
+# Pillow 为可选依赖：Chromium 不能直接输出 WebP，需要先截 PNG 再转码
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
 logger = get_logger("html_renderer")
 
+# Chromium 启动参数：只做 HTML 截图，关闭与渲染无关的子系统（扩展、同步、翻译、后台网络等）
+CHROMIUM_LAUNCH_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',       # 容器中 /dev/shm 通常很小，改用临时目录
+    '--disable-gpu',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-sync',
+    '--disable-translate',
+    '--disable-default-apps',
+    '--no-first-run',
+    '--disable-features=Translate,BackForwardCache,AcceptCHFrame',
+    '--hide-scrollbars',
+    '--mute-audio',
+]
+
+
+def _png_to_webp(png_bytes: bytes, quality: int) -> bytes:
+    """将 PNG 截图转码为 WebP（同等观感下体积通常比 JPEG 小 30%~50%）"""
+    output = io.BytesIO()
+    with Image.open(io.BytesIO(png_bytes)) as image:
+        image.save(output, format="WEBP", quality=quality)
+    return output.getvalue()
+
+
+def write_bytes(path: str, data: bytes):
+    """将图片字节写入文件（阻塞操作，由调用方放到线程中执行）"""
+    with open(path, "wb") as f:
+        f.write(data)
+
 
 class HTMLRenderer:
     """HTML渲染器 - 使用Playwright将HTML渲染为图片"""
 
-    def __init__(self):
-        """初始化渲染器"""
+    def __init__(self, pool_size: int = 2):
+        """初始化渲染器
+
+        Args:
+            pool_size: 每种设备像素比预热的页面数量
+        """
         self.browser: Optional[Browser] = None
+        self._playwright = None
         self._lock = asyncio.Lock()
         self._initialized = False
 
+        # 页面池：device_scale_factor -> 空闲页面队列
+        # 设备像素比只能在创建 BrowserContext 时指定，因此按其分池；视口在借出时重新设置
+        self.pool_size = pool_size
+        self._page_pools: Dict[float, asyncio.Queue] = {}
+        # 触发过 crash 事件的页面：崩溃的页面不会自动关闭，归还时需要识别并替换
+        self._crashed_pages: Set[Page] = set()
+
     async def initialize(self):
         """初始化Playwright浏览器"""
         if self._initialized:
@@ -33,11 +85,11 @@ class HTMLRenderer:
                 return
 
             try:
-                playwright = await async_playwright().start()
+                self._playwright = await async_playwright().start()
                 # 使用chromium，headless模式
-                self.browser = await playwright.chromium.launch(
+                self.browser = await self._playwright.chromium.launch(
                     headless=True,
-                    args=['--no-sandbox', '--disable-setuid-sandbox']
+                    args=CHROMIUM_LAUNCH_ARGS
                 )
                 self._initialized = True
                 logger.info("Playwright浏览器已启动")
@@ -46,71 +98,149 @@ class HTMLRenderer:
                 raise
 
     async def close(self):
-        """关闭浏览器"""
+        """关闭浏览器并停止 Playwright 驱动进程"""
         if self.browser:
             await self.browser.close()
+            self.browser = None
+            self._page_pools.clear()
+            self._crashed_pages.clear()
             self._initialized = False
             logger.info("Playwright浏览器已关闭")
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _new_pooled_page(self, device_scale_factor: float) -> Page:
+        """创建一个独立上下文中的页面（用于放入页面池）"""
+        context: BrowserContext = await self.browser.new_context(
+            device_scale_factor=device_scale_factor
+        )
+        page = await context.new_page()
+        page.on("crash", self._crashed_pages.add)
+        return page
+
+    async def _get_page_pool(self, device_scale_factor: float) -> asyncio.Queue:
+        """获取指定设备像素比的页面池，首次使用时预热 pool_size 个页面"""
+        pool = self._page_pools.get(device_scale_factor)
+        if pool is not None:
+            return pool
+
+        async with self._lock:
+            pool = self._page_pools.get(device_scale_factor)
+            if pool is None:
+                pool = asyncio.Queue()
+                pages = await asyncio.gather(*(
+                    self._new_pooled_page(device_scale_factor)
+                    for _ in range(self.pool_size)
+                ))
+                for pooled_page in pages:
+                    pool.put_nowait(pooled_page)
+                self._page_pools[device_scale_factor] = pool
+            return pool
+
+    async def _release_page(
+        self, pool: asyncio.Queue, page: Page, device_scale_factor: float, discard: bool = False
+    ):
+        """归还页面；页面已崩溃、已关闭或本次渲染出错（discard）时关闭其上下文，
+        换一个新页面补回池中，保持池容量不变
+        """
+        crashed = page in self._crashed_pages
+        self._crashed_pages.discard(page)
+        if discard or crashed or page.is_closed():
+            try:
+                await page.context.close()
+            except Exception:
+                pass
+            try:
+                page = await self._new_pooled_page(device_scale_factor)
+            except Exception as e:
+                logger.error(f"补充页面池失败: {e}", exc_info=True)
+                return
+        pool.put_nowait(page)
 
     async def render_html_to_image(
         self,
         html_content: str,
-        output_path: str,
+        output_path: Optional[str] = None,
         viewport_width: int = 1200,
         viewport_height: int = 800,
         full_page: bool = True,
         image_type: str = "jpeg",
         quality: int = 95,
         device_scale_factor: float = 1.0,
-    ) -> bool:
+    ) -> Union[bool, Optional[bytes]]:
         """将HTML内容渲染为图片
 
         Args:
             html_content: HTML内容字符串
-            output_path: 输出图片路径
+            output_path: 输出图片路径；为None时不落盘，直接返回图片字节
             viewport_width: 视口宽度
             viewport_height: 视口高度
             full_page: 是否截取整个页面（True=完整页面，False=仅视口）
-            image_type: 图片类型 ("jpeg" 或 "png")
-            quality: 图片质量 (0-100，仅对jpeg有效)
+            image_type: 图片类型 ("jpeg"、"png" 或 "webp"，webp 需要 Pillow，缺失时退回 jpeg)
+            quality: 图片质量 (0-100，对jpeg和webp有效)
             device_scale_factor: 设备像素比（2.0=2倍清晰度，3.0=3倍清晰度）
 
         Returns:
-            是否成功
+            指定output_path时返回是否成功；否则返回图片字节，失败返回None
         """
+        failed = False if output_path else None
+
+        if image_type == "webp" and not HAS_PIL:
+            logger.warning("未安装 Pillow，无法输出 WebP，改用 JPEG")
+            image_type = "jpeg"
+
         if not self._initialized:
             await self.initialize()
 
         if not self.browser:
             logger.error("浏览器未初始化")
-            return False
+            return failed
 
+        pool: Optional[asyncio.Queue] = None
         page: Optional[Page] = None
+        render_error = False
         try:
-            # 创建新页面，设置视口和设备像素比
-            page = await self.browser.new_page(
-                viewport={'width': viewport_width, 'height': viewport_height},
-                device_scale_factor=device_scale_factor
-            )
+            # 从页面池借出预热好的页面，只重置视口，省去每次新建上下文和页面的开销
+            pool = await self._get_page_pool(device_scale_factor)
+            page = await pool.get()
+            await page.set_viewport_size({'width': viewport_width, 'height': viewport_height})
 
-            # 设置HTML内容
-            await page.set_content(html_content, wait_until="networkidle")
+            # 设置HTML内容；模板引用了远程字体样式表和头像图片，load 事件会等待它们加载完成
+            await page.set_content(html_content, wait_until="load")
 
-            # 等待所有字体和图片加载完成
-            await page.wait_for_load_state("networkidle")
-            await asyncio.sleep(0.5)  # 额外等待0.5秒确保渲染完成
+            # 等待 Web 字体解析完毕，确定性地完成渲染，无需 networkidle 和固定延时
+            await page.evaluate("async () => { await document.fonts.ready; }")
 
-            # 截图配置
+            # 截图配置（WebP 先截无损 PNG 再转码）
             screenshot_options: Dict[str, Any] = {
-                "path": output_path,
                 "full_page": full_page,
-                "type": image_type,
+                "type": "png" if image_type == "webp" else image_type,
             }
 
             if image_type == "jpeg":
                 screenshot_options["quality"] = quality
 
+            if image_type == "webp":
+                png_bytes = await page.screenshot(**screenshot_options)
+                # 转码是 CPU 密集操作，放到线程中执行，避免阻塞事件循环
+                image_bytes = await asyncio.to_thread(_png_to_webp, png_bytes, quality)
+                if not output_path:
+                    logger.info(f"成功渲染WebP图片 ({len(image_bytes)} 字节)")
+                    return image_bytes
+
+                await asyncio.to_thread(write_bytes, output_path, image_bytes)
+                logger.info(f"成功渲染WebP图片: {output_path}")
+                return True
+
+            # 未指定输出路径时直接返回截图字节，省去写盘再读回的开销
+            if not output_path:
+                image_bytes = await page.screenshot(**screenshot_options)
+                logger.info(f"成功渲染图片 ({len(image_bytes)} 字节)")
+                return image_bytes
+
             # 截图
+            screenshot_options["path"] = output_path
             await page.screenshot(**screenshot_options)
 
             # 验证文件生成
@@ -123,43 +253,80 @@ class HTMLRenderer:
 
         except Exception as e:
             logger.error(f"渲染HTML为图片失败: {e}", exc_info=True)
-            return False
+            render_error = True
+            return failed
         finally:
             if page:
-                await page.close()
+                # 出错的页面状态未知（如 "Target crashed"），不放回池中复用
+                await self._release_page(pool, page, device_scale_factor, discard=render_error)
 
 
-# 全局单例渲染器
-_global_renderer: Optional[HTMLRenderer] = None
+# 全局渲染器数量：每个渲染器独占一个 Chromium 进程并各自预热页面池。
+# 同一浏览器内的页面已在各自的渲染进程中运行，默认只启动一个以节省内存
+RENDERER_COUNT = 1
+
+# 全局渲染器（轮询分发渲染请求）；浏览器只在首次使用时启动一次，之后所有图片生成共用
+_global_renderers: List[HTMLRenderer] = []
+_renderer_cycle: Optional[Iterator[HTMLRenderer]] = None
+_renderer_lock: Optional[asyncio.Lock] = None
+
+
+def _get_renderer_lock() -> asyncio.Lock:
+    # 懒加载，确保在事件循环内创建
+    global _renderer_lock
+    if _renderer_lock is None:
+        _renderer_lock = asyncio.Lock()
+    return _renderer_lock
 
 
 async def get_renderer() -> HTMLRenderer:
-    """获取全局HTML渲染器实例（单例模式）
+    """获取全局HTML渲染器实例（首次调用时启动 RENDERER_COUNT 个浏览器，之后轮询返回）
+
+    启动过程加锁，并发的首次调用不会重复启动浏览器。
 
     Returns:
         HTMLRenderer实例
     """
-    global _global_renderer
-    if _global_renderer is None:
-        _global_renderer = HTMLRenderer()
-        await _global_renderer.initialize()
-    return _global_renderer
+    global _renderer_cycle
+    if _renderer_cycle is None:
+        async with _get_renderer_lock():
+            if _renderer_cycle is None:
+                renderers = [HTMLRenderer() for _ in range(RENDERER_COUNT)]
+                await asyncio.gather(*(renderer.initialize() for renderer in renderers))
+                _global_renderers[:] = renderers
+                _renderer_cycle = itertools.cycle(renderers)
+    return next(_renderer_cycle)
+
+
+async def close_renderer():
+    """关闭全部全局渲染器（插件卸载或程序退出时调用），下次渲染会重新启动浏览器"""
+    global _renderer_cycle
+    async with _get_renderer_lock():
+        renderers = list(_global_renderers)
+        _global_renderers.clear()
+        _renderer_cycle = None
+
+    for renderer in renderers:
+        try:
+            await renderer.close()
+        except Exception as e:
+            logger.warning(f"关闭渲染器失败: {e}")
 
 
 async def render_html_to_image(
     html_content: str,
-    output_path: str,
+    output_path: Optional[str] = None,
     **kwargs
-) -> bool:
+) -> Union[bool, Optional[bytes]]:
     """便捷函数：渲染HTML为图片
 
     Args:
         html_content: HTML内容
-        output_path: 输出路径
+        output_path: 输出路径；为None时直接返回图片字节
         **kwargs: 传递给HTMLRenderer.render_html_to_image的参数
 
     Returns:
-        是否成功
+        指定output_path时返回是否成功；否则返回图片字节，失败返回None
     """
     renderer = await get_renderer()
     return await renderer.render_html_to_image(html_content, output_path, **kwargs)
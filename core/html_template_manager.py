@@ -5,8 +5,8 @@ HTML模板管理器
 """
 
 import os
-from typing import Dict, Any
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from typing import Dict, Any, Optional
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, select_autoescape
 
 from src.plugin_system import get_logger
 
@@ -24,9 +24,16 @@ class HTMLTemplateManager:
         """
         self.template_dir = template_dir
 
+        # 主图片模板原始内容（首次读取后缓存，运行期间模板文件不会变化）
+        self._image_template: Optional[str] = None
+
         # 创建Jinja2环境
+        # 编译后的模板字节码缓存到系统临时目录（按用户隔离），进程重启后无需重新解析模板源码；
+        # 模板在运行期间不会变化，关闭 auto_reload 省去每次渲染时的文件 stat
         self.env = Environment(
             loader=FileSystemLoader(template_dir),
+            bytecode_cache=FileSystemBytecodeCache(),
+            auto_reload=False,
             autoescape=select_autoescape(['html', 'xml']),
             trim_blocks=True,  # 移除块级标签后的第一个换行符
             lstrip_blocks=True,  # 移除块级标签前的空白
@@ -57,10 +64,14 @@ class HTMLTemplateManager:
         Returns:
             主模板HTML字符串（包含{{placeholder}}占位符）
         """
+        if self._image_template is not None:
+            return self._image_template
+
         try:
             template_path = os.path.join(self.template_dir, "image_template.html")
             with open(template_path, "r", encoding="utf-8") as f:
-                return f.read()
+                self._image_template = f.read()
+            return self._image_template
         except Exception as e:
             logger.error(f"读取主模板失败: {e}", exc_info=True)
             return ""
@@ -4,14 +4,17 @@
 """
 
 import os
+import time
+import shutil
+import hashlib
 import uuid
-import base64
-import aiohttp
-from typing import List, Dict, Optional
+import asyncio
+from functools import lru_cache
+from typing import List, Dict, Optional, Union, Tuple
 from datetime import datetime
 
 from .html_template_manager import HTMLTemplateManager
-from .html_renderer import render_html_to_image
+from .html_renderer import render_html_to_image, write_bytes, HAS_PIL
 from .constants import AnalysisConfig
 
 # 导入logger
@@ -22,37 +25,320 @@ except ImportError:
     import logging
     logger = logging.getLogger("summary_image_generator")
 
+# 插件目录和模板目录（运行期间不变，导入时计算一次）
+_PLUGIN_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_TEMPLATE_DIR = os.path.join(_PLUGIN_ROOT, "templates", "scrapbook")
+
+# 插件目录下的图片目录：tmpfs 不可用时保存临时图片，图片缓存始终放在这里（不占用内存）
+_PLUGIN_IMAGES_DIR = os.path.join(_PLUGIN_ROOT, "data_GeneratePicture")
+
+# 内存文件系统（tmpfs）至少需要的剩余空间，不足时退回插件目录
+_TMPFS_MIN_FREE_BYTES = 100 * 1024 * 1024
+
+
+@lru_cache(maxsize=1)
+def _get_images_dir() -> str:
+    """选择临时图片保存目录（首次生成图片时调用，结果缓存）
+
+    图片发送后即被删除，优先放在 Linux 的 /dev/shm（tmpfs，写入只是内存拷贝，不落盘）。
+    目录名带插件目录的哈希，同一主机上的多个实例互不干扰；容器中 /dev/shm 通常很小，
+    剩余空间不足 100MB、不可写（如目录属于其他系统用户）时使用插件目录下的 data_GeneratePicture。
+
+    Returns:
+        str: 已创建好的图片目录绝对路径
+    """
+    shm_root = "/dev/shm"
+    if hasattr(os, "statvfs") and os.path.isdir(shm_root) and os.access(shm_root, os.W_OK):
+        try:
+            stat = os.statvfs(shm_root)
+            if stat.f_bavail * stat.f_frsize >= _TMPFS_MIN_FREE_BYTES:
+                instance_key = hashlib.blake2b(_PLUGIN_ROOT.encode("utf-8"), digest_size=6).hexdigest()
+                shm_dir = os.path.join(shm_root, f"maibot_chat_summary_{instance_key}")
+                os.makedirs(shm_dir, exist_ok=True)
+                if os.access(shm_dir, os.W_OK):
+                    return shm_dir
+                logger.warning(f"{shm_dir} 不可写，改用插件目录保存图片")
+        except OSError as e:
+            logger.warning(f"无法使用 {shm_root} 保存图片，改用插件目录: {e}")
+
+    os.makedirs(_PLUGIN_IMAGES_DIR, exist_ok=True)
+    return _PLUGIN_IMAGES_DIR
+
+
+@lru_cache(maxsize=1)
+def _get_cache_dir() -> str:
+    """获取图片缓存目录（文件名为渲染后HTML内容的哈希，相同内容的重复生成直接复用）
+
+    缓存需要长期保留，放在插件目录下而不是 tmpfs，避免占用内存。
+    """
+    cache_dir = os.path.join(_PLUGIN_IMAGES_DIR, "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+_IMAGE_CACHE_MAX_BYTES = AnalysisConfig.IMAGE_CACHE_MAX_MB * 1024 * 1024
+
+# 输出格式 -> 文件扩展名（WebP 同等观感下比 JPEG 小 25%~35%，需要在配置中开启且安装 Pillow）
+_IMAGE_EXTS = {"jpeg": ".jpg", "webp": ".webp"}
+
+# 清理旧图片时两种格式都要匹配（切换格式后遗留的文件也能删掉）
+_IMAGE_SUFFIXES = (".webp", ".jpg")
+
+# 图片中显示的日期格式
+_DATE_FMT = "%Y年%m月%d日"
+
+# 炫压抑评级默认配置（导入时读取一次 constants.py）
+_DEFAULT_MAX_DEP = AnalysisConfig.MAX_DEPRESSION_DISPLAY
+_DEFAULT_SHOW_BOTTOM = AnalysisConfig.DEPRESSION_SHOW_BOTTOM_HALF
+
+
+def _cleanup_old_images(images_dir: str, prefix: str, suffix: Union[str, tuple] = _IMAGE_SUFFIXES):
+    """删除图片目录中指定前缀的旧图片（单次 scandir 遍历，无需 glob 编译通配符）
+
+    Args:
+        images_dir: 图片目录
+        prefix: 文件名前缀（如 "summary_群号_"）
+        suffix: 文件扩展名（可以是多个扩展名组成的元组）
+    """
+    try:
+        with os.scandir(images_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if not (name.startswith(prefix) and name.endswith(suffix)):
+                    continue
+                try:
+                    os.unlink(entry.path)
+                    logger.debug(f"已删除旧图片: {entry.path}")
+                except OSError as e:
+                    logger.warning(f"删除旧图片失败 {entry.path}: {e}")
+    except OSError as e:
+        logger.warning(f"清理旧图片失败: {e}")
+
+
+def _resolve_image_type(image_format: str) -> str:
+    """将配置的图片格式转换为实际输出格式：只有配置为 webp 且安装了 Pillow 时输出 WebP，其余均为 JPEG"""
+    return "webp" if image_format == "webp" and HAS_PIL else "jpeg"
+
+
+def _link_cached_image(cache_path: str, img_path: str) -> bool:
+    """命中缓存时把缓存图片硬链接到目标路径（不支持硬链接或跨文件系统时复制），并刷新其修改时间
+
+    Returns:
+        bool: 缓存存在并已放到目标路径时返回 True
+    """
+    try:
+        os.link(cache_path, img_path)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        try:
+            shutil.copyfile(cache_path, img_path)
+        except OSError:
+            return False
+    try:
+        # 修改时间作为最近使用时间，裁剪缓存时优先删除最久未用的图片
+        os.utime(cache_path)
+    except OSError:
+        pass
+    return True
+
+
+def _store_image(img_path: str, cache_path: str, data: bytes, max_cache_bytes: int):
+    """写入图片文件，同时放入缓存目录并把缓存裁剪到容量上限以内"""
+    write_bytes(img_path, data)
+    try:
+        os.link(img_path, cache_path)
+    except FileExistsError:
+        pass
+    except OSError:
+        try:
+            write_bytes(cache_path, data)
+        except OSError as e:
+            logger.warning(f"写入图片缓存失败 {cache_path}: {e}")
+            return
+    _prune_image_cache(os.path.dirname(cache_path), max_cache_bytes)
+
+
+def _read_cached_image(cache_path: str) -> Optional[bytes]:
+    """读取缓存图片并刷新其修改时间，缓存不存在时返回 None"""
+    try:
+        with open(cache_path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass
+    return data
+
+
+def _store_cached_image(cache_path: str, data: bytes, max_cache_bytes: int):
+    """只把图片写入缓存目录（不生成临时文件），并把缓存裁剪到容量上限以内"""
+    try:
+        write_bytes(cache_path, data)
+    except OSError as e:
+        logger.warning(f"写入图片缓存失败 {cache_path}: {e}")
+        return
+    _prune_image_cache(os.path.dirname(cache_path), max_cache_bytes)
+
+
+def _prune_image_cache(cache_dir: str, max_bytes: int):
+    """缓存目录总大小超过上限时，按修改时间从旧到新删除图片"""
+    try:
+        with os.scandir(cache_dir) as entries:
+            files = [(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                     for entry in entries if entry.is_file()]
+    except OSError as e:
+        logger.warning(f"扫描图片缓存失败: {e}")
+        return
+
+    total = sum(size for _, size, _ in files)
+    if total <= max_bytes:
+        return
+
+    for _, size, path in sorted(files):
+        try:
+            os.unlink(path)
+            total -= size
+        except OSError as e:
+            logger.warning(f"删除缓存图片失败 {path}: {e}")
+        if total <= max_bytes:
+            break
+
+
+def _hourly_percentages(counts: List[int]) -> Tuple[List[int], int]:
+    """计算各小时发言数相对最活跃小时的百分比（整数运算），一次遍历同时得到最活跃小时
+
+    Args:
+        counts: 按小时下标排列的发言数
+
+    Returns:
+        (百分比列表, 最活跃小时下标)
+    """
+    max_count = max(counts)
+    max_hour = counts.index(max_count)
+    if max_count <= 0:
+        return [0] * len(counts), max_hour
+    return [count * 100 // max_count for count in counts], max_hour
+
+
+def _ranking_entry(entry: dict, position) -> dict:
+    """构建炫压抑评级展示项"""
+    return {
+        "name": entry.get("name", ""),
+        "rank": entry.get("rank", ""),
+        "comment": entry.get("comment", ""),
+        "position": position
+    }
+
+
+@lru_cache(maxsize=4)
+def _get_template_manager(template_dir: str) -> HTMLTemplateManager:
+    """获取指定模板目录的模板管理器（单例，避免每次生成图片都重建 Jinja2 环境）"""
+    return HTMLTemplateManager(template_dir)
+
 
 class SummaryImageGenerator:
     """生成聊天总结图片 - HTML渲染版本"""
 
     @staticmethod
-    async def _download_qq_avatar_base64(qq_id: str, size: int = 100) -> Optional[str]:
-        """下载QQ用户头像并转换为base64
+    async def _render_and_save(
+        html_content: str,
+        filename_prefix: str,
+        entity_id: Optional[str],
+        label: str,
+        high_dpi: bool = False,
+        return_bytes: bool = False,
+        image_format: str = "jpeg"
+    ) -> Union[str, bytes]:
+        """清理旧图片，将HTML渲染为图片保存到图片目录（群聊总结和个人总结共用）
 
         Args:
-            qq_id: QQ号
-            size: 头像尺寸
+            html_content: 渲染好的HTML
+            filename_prefix: 文件名前缀（"summary" 或 "user_summary"）
+            entity_id: 群号或用户QQ号，用于标识和清理旧图片；为空时使用随机文件名
+            label: 日志中的图片描述
+            high_dpi: 是否使用高清渲染
+            return_bytes: 是否直接返回图片字节（不生成临时文件，只写入缓存）
+            image_format: 图片格式（"jpeg" 或 "webp"）
 
         Returns:
-            base64编码的图片数据URL，失败返回 None
+            图片文件的绝对路径；return_bytes 为 True 时返回图片字节
         """
-        if not qq_id:
-            return None
+        image_type = _resolve_image_type(image_format)
+        image_ext = _IMAGE_EXTS[image_type]
+
+        # 相同HTML渲染结果相同：缓存键为渲染后HTML内容的哈希
+        html_key = hashlib.blake2b(
+            f"{html_content}|{high_dpi}".encode("utf-8"), digest_size=8
+        ).hexdigest()
+        # 目录首次使用时才创建（文件系统操作放到线程中执行）
+        cache_dir = await asyncio.to_thread(_get_cache_dir)
+        cache_path = os.path.join(cache_dir, f"{html_key}{image_ext}")
+
+        if return_bytes:
+            image_bytes = await asyncio.to_thread(_read_cached_image, cache_path)
+            if image_bytes is not None:
+                logger.info(f"命中图片缓存，复用{label} ({len(image_bytes)} 字节)")
+                return image_bytes
+
+            image_bytes = await SummaryImageGenerator._render_bytes(html_content, high_dpi, image_type)
+            await asyncio.to_thread(_store_cached_image, cache_path, image_bytes, _IMAGE_CACHE_MAX_BYTES)
+            logger.info(f"成功生成{label} (大小: {len(image_bytes) / (1024 * 1024):.2f}MB)")
+            return image_bytes
+
+        images_dir = await asyncio.to_thread(_get_images_dir)
+
+        # 清理同一群/用户的旧图片（文件系统操作放到线程中执行，避免阻塞事件循环）
+        if entity_id:
+            await asyncio.to_thread(_cleanup_old_images, images_dir, f"{filename_prefix}_{entity_id}_")
+
+        # 生成新文件名（包含群号/QQ号和时间戳）
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        if entity_id:
+            filename = f"{filename_prefix}_{entity_id}_{timestamp}{image_ext}"
+        else:
+            filename = f"{filename_prefix}_{uuid.uuid4().hex[:8]}_{timestamp}{image_ext}"
+
+        img_path = os.path.join(images_dir, filename)
+
+        # 命中缓存时直接复用已生成的图片，不调用 Playwright
+        if await asyncio.to_thread(_link_cached_image, cache_path, img_path):
+            logger.info(f"命中图片缓存，复用{label}: {img_path}")
+            return img_path
 
-        avatar_url = f"https://q1.qlogo.cn/g?b=qq&nk={qq_id}&s={size}"
-        try:
-            timeout = aiohttp.ClientTimeout(total=5)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(avatar_url) as resp:
-                    if resp.status == 200:
-                        avatar_data = await resp.read()
-                        avatar_base64 = base64.b64encode(avatar_data).decode('utf-8')
-                        return f"data:image/jpeg;base64,{avatar_base64}"
-        except Exception as e:
-            logger.debug(f"下载头像失败 (QQ:{qq_id}): {e}")
+        # 直接取回截图字节（不经 Playwright 驱动写盘），由线程写入文件，大小即字节数
+        image_bytes = await SummaryImageGenerator._render_bytes(html_content, high_dpi, image_type)
 
-        return None
+        await asyncio.to_thread(
+            _store_image, img_path, cache_path, image_bytes, _IMAGE_CACHE_MAX_BYTES
+        )
+
+        logger.info(f"成功生成{label}: {img_path} (大小: {len(image_bytes) / (1024 * 1024):.2f}MB)")
+
+        return img_path
+
+    @staticmethod
+    async def _render_bytes(html_content: str, high_dpi: bool, image_type: str) -> bytes:
+        """使用 Playwright 将HTML渲染为图片字节，失败时抛出 IOError"""
+        # 使用 Playwright 渲染（保持原始宽度）
+        # 默认1.5倍像素密度：光栅化像素减少约44%，文字和头像观感几乎无差别
+        # 质量：WebP 85 / JPEG 88，高清模式统一为 95
+        image_bytes = await render_html_to_image(
+            html_content,
+            viewport_width=1000,         # 保持原始宽度
+            viewport_height=800,         # 保持原始高度
+            full_page=True,
+            image_type=image_type,
+            quality=95 if high_dpi else (85 if image_type == "webp" else 88),
+            device_scale_factor=2.0 if high_dpi else 1.5
+        )
+
+        if not image_bytes:
+            raise IOError("HTML渲染为图片失败")
+
+        return image_bytes
 
     @staticmethod
     async def generate_summary_image(
@@ -72,8 +358,11 @@ class SummaryImageGenerator:
         display_order: list = None,
         target_date: datetime = None,
         max_depression_display: int = None,
-        depression_show_bottom: bool = None
-    ) -> str:
+        depression_show_bottom: bool = None,
+        high_dpi: bool = False,
+        return_bytes: bool = False,
+        image_format: str = "jpeg"
+    ) -> Union[str, bytes]:
         """生成聊天总结图片 - 使用HTML模板渲染
 
         Args:
@@ -92,9 +381,12 @@ class SummaryImageGenerator:
             group_id: QQ群号，用于标识和清理旧图片
             display_order: 模块显示顺序（可选项：24H, Topics, Titles, Depression, Quotes）
             target_date: 目标日期（用于显示正确的日期，默认为今天）
+            high_dpi: 是否使用高清渲染（2倍像素密度、质量95，用于打印等场景）
+            return_bytes: 是否直接返回图片字节（不生成临时文件，调用方无需读取和删除）
+            image_format: 图片格式（"jpeg" 或 "webp"，webp 需要安装 Pillow，否则仍输出 JPEG）
 
         Returns:
-            str: 图片文件的绝对路径
+            图片文件的绝对路径；return_bytes 为 True 时返回图片字节
         """
         # 初始化
         if topics is None:
@@ -109,23 +401,19 @@ class SummaryImageGenerator:
             display_order = ["24H", "Topics", "Portraits", "Quotes", "Rankings"]
         # 炫压抑评级配置：如果未传入则使用 constants.py 中的默认值
         if max_depression_display is None:
-            max_depression_display = AnalysisConfig.MAX_DEPRESSION_DISPLAY
+            max_depression_display = _DEFAULT_MAX_DEP
         if depression_show_bottom is None:
-            depression_show_bottom = AnalysisConfig.DEPRESSION_SHOW_BOTTOM_HALF
+            depression_show_bottom = _DEFAULT_SHOW_BOTTOM
 
-        # 获取插件目录和模板目录
-        plugin_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        template_dir = os.path.join(plugin_dir, "templates", "scrapbook")
-
-        # 创建模板管理器
-        template_manager = HTMLTemplateManager(template_dir)
+        # 获取模板管理器（按模板目录缓存，Jinja2 已编译的模板在多次生成间复用）
+        template_manager = _get_template_manager(_TEMPLATE_DIR)
 
         # ===== 准备模板数据 =====
 
         # 目标日期（如果未指定则使用今天）
         if target_date is None:
             target_date = datetime.now()
-        current_date = target_date.strftime("%Y年%m月%d日")
+        current_date = target_date.strftime(_DATE_FMT)
 
         # 计算总字符数
         total_characters = len(summary_text)
@@ -133,38 +421,31 @@ class SummaryImageGenerator:
         # 计算表情数量 (简化：取消息数的 10%)
         emoji_count = int(message_count * 0.1)
 
+        # 各小时发言数（下标为小时），只展开一次，最活跃时段和图表共用
+        counts = [hourly_distribution.get(hour, 0) for hour in range(24)] if hourly_distribution else []
+
         # 计算最活跃时段
         most_active_period = "未知"
-        if hourly_distribution:
-            max_hour = max(hourly_distribution, key=hourly_distribution.get)
+        percentages: List[int] = []
+        if counts:
+            percentages, max_hour = _hourly_percentages(counts)
             most_active_period = f"{max_hour:02d}:00-{(max_hour+1)%24:02d}:00"
 
-        # ===== 渲染24小时活跃图表 =====
-        hourly_chart_html = ""
-        if "24H" in display_order and hourly_distribution:
-            # 准备图表数据
-            max_count = max(hourly_distribution.values()) if hourly_distribution.values() else 1
-            chart_data = []
-            for hour in range(24):
-                count = hourly_distribution.get(hour, 0)
-                percentage = int((count / max_count) * 100) if max_count > 0 else 0
-                chart_data.append({
+        # ===== 准备24小时活跃图表数据 =====
+        chart_data = []
+        if "24H" in display_order and counts:
+            chart_data = [
+                {
                     "hour": hour,
                     "count": count,
                     "percentage": percentage
-                })
-
-            # 使用模板渲染完整的24H模块（包含标题和图表）
-            hourly_chart_html = template_manager.render_template(
-                "activity_chart_section.html",
-                chart_data=chart_data
-            )
+                }
+                for hour, (count, percentage) in enumerate(zip(counts, percentages))
+            ]
 
-        # ===== 渲染话题列表 =====
-        topics_html = ""
+        # ===== 准备话题列表数据 =====
+        topic_list = []
         if "Topics" in display_order and topics:
-            # 准备话题数据
-            topic_list = []
             for idx, topic_item in enumerate(topics[:5], start=1):
                 topic_data = topic_item.get("topic", "")
                 detail = topic_item.get("detail", "")
@@ -183,16 +464,9 @@ class SummaryImageGenerator:
                     "contributors": "、".join(contributors[:5])
                 })
 
-            topics_html = template_manager.render_template(
-                "topic_item.html",
-                topics=topic_list
-            )
-
-        # ===== 渲染群友画像（user_titles）=====
-        portraits_html = ""
+        # ===== 准备群友画像（user_titles）数据 =====
+        title_list = []
         if "Portraits" in display_order and user_titles:
-            # 准备群友画像数据
-            title_list = []
             for title_item in user_titles[:6]:  # 最多显示6个
                 name = title_item.get("name", "")
                 title = title_item.get("title", "")
@@ -208,16 +482,9 @@ class SummaryImageGenerator:
                     "avatar_data": avatar_data
                 })
 
-            portraits_html = template_manager.render_template(
-                "user_title_item.html",
-                titles=title_list  # 注意：模板期望的变量名是 titles
-            )
-
-        # ===== 渲染群贤毕至（金句）=====
-        quotes_html = ""
+        # ===== 准备群贤毕至（金句）数据 =====
+        quote_list = []
         if "Quotes" in display_order and golden_quotes:
-            # 准备金句数据
-            quote_list = []
             for quote_item in golden_quotes[:4]:
                 content = quote_item.get("content", "")
                 sender = quote_item.get("sender", "")
@@ -229,95 +496,38 @@ class SummaryImageGenerator:
                     "reason": reason
                 })
 
-            quotes_html = template_manager.render_template(
-                "quote_item.html",
-                quotes=quote_list
-            )
-
-        # ===== 渲染炫压抑评级 =====
-        rankings_html = ""
-        if "Rankings" in display_order:
-            depression_rankings = []
-
-            if not depression_index or len(depression_index) == 0:
-                # 0人：显示"此群无压抑指数，可能是凉了~"
-                depression_rankings = []  # 空列表，模板会显示特殊消息
+        # ===== 准备炫压抑评级数据 =====
+        # 0人时保持空列表，模板会显示"此群无压抑指数，可能是凉了~"
+        depression_rankings = []
+        if "Rankings" in display_order and depression_index:
+            if len(depression_index) <= max_depression_display:
+                # 人数不超过最大展示数：全部显示，正常排名
+                depression_rankings = [
+                    _ranking_entry(entry, i) for i, entry in enumerate(depression_index, 1)
+                ]
+            elif depression_show_bottom:
+                # 展示前半 + 后半，正数优先（奇数时前半多1个）
+                # 6 -> 前3+后3, 7 -> 前4+后3, 8 -> 前4+后4
+                bottom_count = max_depression_display // 2
+                top_count = max_depression_display - bottom_count
+                depression_rankings = [
+                    _ranking_entry(entry, i) for i, entry in enumerate(depression_index[:top_count], 1)
+                ]
+                if bottom_count:
+                    # 后半部分（倒数）：fall 3, fall 2, fall 1
+                    depression_rankings += [
+                        _ranking_entry(entry, f"fall {bottom_count - i}")
+                        for i, entry in enumerate(depression_index[-bottom_count:])
+                    ]
             else:
-                # 有数据：根据配置决定展示方式
-                total_count = len(depression_index)
-
-                if total_count <= max_depression_display:
-                    # 人数不超过最大展示数：全部显示，正常排名
-                    for i, entry in enumerate(depression_index, 1):
-                        depression_rankings.append({
-                            "name": entry.get("name", ""),
-                            "rank": entry.get("rank", ""),
-                            "comment": entry.get("comment", ""),
-                            "position": i
-                        })
-                else:
-                    # 超过最大展示数：根据配置决定展示方式
-                    if depression_show_bottom:
-                        # 展示前半 + 后半，正数优先（奇数时前半多1个）
-                        # 6 -> 前3+后3, 7 -> 前4+后3, 8 -> 前4+后4
-                        if max_depression_display % 2 == 0:
-                            # 偶数：平分
-                            top_count = max_depression_display // 2
-                            bottom_count = max_depression_display // 2
-                        else:
-                            # 奇数：正数多1个
-                            top_count = max_depression_display // 2 + 1
-                            bottom_count = max_depression_display // 2
-                        # 前半部分
-                        for i, entry in enumerate(depression_index[:top_count], 1):
-                            depression_rankings.append({
-                                "name": entry.get("name", ""),
-                                "rank": entry.get("rank", ""),
-                                "comment": entry.get("comment", ""),
-                                "position": i
-                            })
-                        # 后半部分（倒数）
-                        bottom_entries = depression_index[-bottom_count:]
-                        for i, entry in enumerate(bottom_entries, 1):
-                            depression_rankings.append({
-                                "name": entry.get("name", ""),
-                                "rank": entry.get("rank", ""),
-                                "comment": entry.get("comment", ""),
-                                "position": f"fall {bottom_count - i + 1}"  # fall 3, fall 2, fall 1
-                            })
-                    else:
-                        # 只展示前 N 名
-                        for i, entry in enumerate(depression_index[:max_depression_display], 1):
-                            depression_rankings.append({
-                                "name": entry.get("name", ""),
-                                "rank": entry.get("rank", ""),
-                                "comment": entry.get("comment", ""),
-                                "position": i
-                            })
-
-            rankings_html = template_manager.render_template(
-                "depression_index_item.html",
-                depression_rankings=depression_rankings
-            )
-
-        # ===== 根据 display_order 动态组装模块HTML =====
-        modules_html_list = []
-        module_map = {
-            "24H": hourly_chart_html,
-            "Topics": topics_html,
-            "Portraits": portraits_html,
-            "Quotes": quotes_html,
-            "Rankings": rankings_html
-        }
-
-        for module_name in display_order:
-            if module_name in module_map and module_map[module_name]:
-                modules_html_list.append(module_map[module_name])
-
-        # 将所有模块HTML合并
-        modules_html = "\n".join(modules_html_list)
+                # 只展示前 N 名
+                depression_rankings = [
+                    _ranking_entry(entry, i)
+                    for i, entry in enumerate(depression_index[:max_depression_display], 1)
+                ]
 
         # ===== 渲染主模板 =====
+        # 各模块模板由主模板按 display_order 直接 include，一次渲染完成
         html_content = template_manager.render_template(
             "image_template.html",
             current_date=current_date,
@@ -326,71 +536,19 @@ class SummaryImageGenerator:
             emoji_count=emoji_count,
             total_characters=total_characters,
             most_active_period=most_active_period,
-            modules_html=modules_html  # 使用动态组装的模块HTML
+            display_order=display_order,
+            chart_data=chart_data,
+            topics=topic_list,
+            titles=title_list,  # 注意：模板期望的变量名是 titles
+            quotes=quote_list,
+            depression_rankings=depression_rankings
         )
 
         # ===== 使用 Playwright 渲染为图片 =====
         try:
-            # 获取插件根目录
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            # 向上一级到达插件目录 (chat_summary_plugin)
-            plugin_root = os.path.dirname(current_dir)
-            # 插件内的图片保存目录
-            images_dir = os.path.join(plugin_root, "data_GeneratePicture")
-
-            # 确保目录存在
-            os.makedirs(images_dir, exist_ok=True)
-
-            # ===== 清理同一群的旧图片 =====
-            if group_id:
-                try:
-                    import glob
-                    # 查找所有属于该群的图片文件
-                    pattern = os.path.join(images_dir, f"summary_{group_id}_*.jpg")
-                    old_images = glob.glob(pattern)
-
-                    for old_image in old_images:
-                        try:
-                            os.remove(old_image)
-                            logger.debug(f"已删除旧图片: {old_image}")
-                        except Exception as e:
-                            logger.warning(f"删除旧图片失败 {old_image}: {e}")
-                except Exception as e:
-                    logger.warning(f"清理旧图片失败: {e}")
-
-            # 生成新文件名（包含群号和时间戳）
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            if group_id:
-                filename = f"summary_{group_id}_{timestamp}.jpg"
-            else:
-                filename = f"summary_{uuid.uuid4().hex[:8]}_{timestamp}.jpg"
-
-            img_path = os.path.join(images_dir, filename)
-
-            # 使用 Playwright 渲染（保持原始宽度，使用2倍像素密度提高清晰度）
-            success = await render_html_to_image(
-                html_content,
-                img_path,
-                viewport_width=1000,         # 保持原始宽度
-                viewport_height=800,         # 保持原始高度
-                full_page=True,
-                image_type="jpeg",
-                quality=100,                 # 最高质量
-                device_scale_factor=2.0      # 2倍像素密度，图片更清晰但显示尺寸不变
+            return await SummaryImageGenerator._render_and_save(
+                html_content, "summary", group_id, "总结图片", high_dpi, return_bytes, image_format
             )
-
-            if not success:
-                raise IOError("HTML渲染为图片失败")
-
-            if not os.path.exists(img_path):
-                raise IOError("图片文件未生成")
-
-            # 检查文件大小
-            file_size = os.path.getsize(img_path) / (1024 * 1024)  # MB
-            logger.info(f"成功生成总结图片: {img_path} (大小: {file_size:.2f}MB)")
-
-            return img_path
-
         except Exception as e:
             logger.error(f"生成总结图片失败: {e}", exc_info=True)
             raise
@@ -410,7 +568,9 @@ class SummaryImageGenerator:
         depression_data: dict = None,
         golden_quotes: list = None,
         display_order: list = None,
-        target_date: datetime = None
+        target_date: datetime = None,
+        high_dpi: bool = False,
+        image_format: str = "jpeg"
     ) -> str:
         """生成个人用户总结图片
 
@@ -429,6 +589,8 @@ class SummaryImageGenerator:
             golden_quotes: 金句列表
             display_order: 模块显示顺序（支持组合：["3H", "Portraits,Rankings", "Quotes"]）
             target_date: 目标日期（用于显示正确的日期，默认为今天）
+            high_dpi: 是否使用高清渲染（2倍像素密度、质量95，用于打印等场景）
+            image_format: 图片格式（"jpeg" 或 "webp"，webp 需要安装 Pillow，否则仍输出 JPEG）
 
         Returns:
             str: 图片文件的绝对路径
@@ -441,19 +603,15 @@ class SummaryImageGenerator:
         if display_order is None:
             display_order = ["3H", "Portraits", "Rankings", "Quotes"]
 
-        # 获取插件目录和模板目录
-        plugin_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        template_dir = os.path.join(plugin_dir, "templates", "scrapbook")
-
-        # 创建模板管理器
-        template_manager = HTMLTemplateManager(template_dir)
+        # 获取模板管理器（按模板目录缓存，Jinja2 已编译的模板在多次生成间复用）
+        template_manager = _get_template_manager(_TEMPLATE_DIR)
 
         # ===== 准备模板数据 =====
 
         # 目标日期（如果未指定则使用今天）
         if target_date is None:
             target_date = datetime.now()
-        current_date = target_date.strftime("%Y年%m月%d日")
+        current_date = target_date.strftime(_DATE_FMT)
 
         # 用户头像URL（和群聊总结保持一致，使用直接URL而非base64）
         avatar_data = f"https://q1.qlogo.cn/g?b=qq&nk={user_id}&s=100" if user_id else ""
@@ -461,9 +619,9 @@ class SummaryImageGenerator:
         # ===== 渲染 3H 活跃轨迹 =====
         activity_3h_html = ""
         if "3H" in str(display_order) and hourly_distribution:
-            # 找到消息最多的时间段
-            max_hour = max(hourly_distribution, key=hourly_distribution.get)
-            max_count = hourly_distribution[max_hour]
+            # 找到消息最多的时间段（与群聊总结共用百分比计算）
+            counts = [hourly_distribution.get(hour, 0) for hour in range(24)]
+            percentages, max_hour = _hourly_percentages(counts)
 
             # 获取前后时间段
             prev_hour = (max_hour - 1) % 24
@@ -473,26 +631,21 @@ class SummaryImageGenerator:
             three_hours = [
                 {
                     "time_label": f"{prev_hour:02d}:00-{max_hour:02d}:00",
-                    "count": hourly_distribution.get(prev_hour, 0),
-                    "percentage": 0
+                    "count": counts[prev_hour],
+                    "percentage": percentages[prev_hour]
                 },
                 {
                     "time_label": f"{max_hour:02d}:00-{(max_hour+1)%24:02d}:00",
-                    "count": max_count,
+                    "count": counts[max_hour],
                     "percentage": 100
                 },
                 {
                     "time_label": f"{next_hour:02d}:00-{(next_hour+1)%24:02d}:00",
-                    "count": hourly_distribution.get(next_hour, 0),
-                    "percentage": 0
+                    "count": counts[next_hour],
+                    "percentage": percentages[next_hour]
                 }
             ]
 
-            # 计算百分比
-            if max_count > 0:
-                three_hours[0]["percentage"] = int((three_hours[0]["count"] / max_count) * 100)
-                three_hours[2]["percentage"] = int((three_hours[2]["count"] / max_count) * 100)
-
             # 渲染模板
             activity_3h_html = template_manager.render_template(
                 "user_3h_activity.html",
@@ -608,63 +761,10 @@ class SummaryImageGenerator:
 
         # ===== 使用 Playwright 渲染为图片 =====
         try:
-            # 获取插件根目录
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            plugin_root = os.path.dirname(current_dir)
-            images_dir = os.path.join(plugin_root, "data_GeneratePicture")
-
-            # 确保目录存在
-            os.makedirs(images_dir, exist_ok=True)
-
-            # 清理旧的个人总结图片
-            if user_id:
-                try:
-                    import glob
-                    pattern = os.path.join(images_dir, f"user_summary_{user_id}_*.jpg")
-                    old_images = glob.glob(pattern)
-
-                    for old_image in old_images:
-                        try:
-                            os.remove(old_image)
-                            logger.debug(f"已删除旧图片: {old_image}")
-                        except Exception as e:
-                            logger.warning(f"删除旧图片失败 {old_image}: {e}")
-                except Exception as e:
-                    logger.warning(f"清理旧图片失败: {e}")
-
-            # 生成新文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            if user_id:
-                filename = f"user_summary_{user_id}_{timestamp}.jpg"
-            else:
-                filename = f"user_summary_{uuid.uuid4().hex[:8]}_{timestamp}.jpg"
-
-            img_path = os.path.join(images_dir, filename)
-
-            # 使用 Playwright 渲染
-            success = await render_html_to_image(
-                html_content,
-                img_path,
-                viewport_width=1000,
-                viewport_height=800,
-                full_page=True,
-                image_type="jpeg",
-                quality=100,
-                device_scale_factor=2.0
+            return await SummaryImageGenerator._render_and_save(
+                html_content, "user_summary", user_id, "个人总结图片", high_dpi,
+                image_format=image_format
             )
-
-            if not success:
-                raise IOError("HTML渲染为图片失败")
-
-            if not os.path.exists(img_path):
-                raise IOError("图片文件未生成")
-
-            # 检查文件大小
-            file_size = os.path.getsize(img_path) / (1024 * 1024)  # MB
-            logger.info(f"成功生成个人总结图片: {img_path} (大小: {file_size:.2f}MB)")
-
-            return img_path
-
         except Exception as e:
             logger.error(f"生成个人总结图片失败: {e}", exc_info=True)
             raise
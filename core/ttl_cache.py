@@ -0,0 +1,80 @@
+"""
+带 TTL 的 LRU 缓存
+
+插件内各处的短期缓存共用（LLM 响应、单用户分析结果、聊天记录查询结果、已发送的总结图片），
+重复请求直接返回缓存结果，省去网络往返、数据库查询或重新渲染。
+"""
+
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class TTLCache:
+    """带 TTL 的 LRU 缓存（协程安全），可按条目数和总大小限制容量"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, max_bytes: int = 0):
+        """
+        Args:
+            maxsize: 最大缓存条目数
+            ttl: 条目过期时间（秒）
+            max_bytes: 条目总大小上限（字节，按 set 时传入的 size 累计），0 表示不限制
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, Tuple[float, int, tuple]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        # 懒加载，确保在事件循环内创建
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _pop(self, key: str):
+        """删除条目并扣减总大小（调用方需持有锁）"""
+        _, size, _ = self._data.pop(key)
+        self._total_bytes -= size
+
+    async def get(self, key: str) -> Optional[tuple]:
+        """读取缓存，未命中或已过期返回 None"""
+        async with self._get_lock():
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            expires_at, _, value = entry
+            if expires_at < time.monotonic():
+                self._pop(key)
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: tuple, ttl: Optional[float] = None, size: int = 0):
+        """写入缓存，超出条目数或总大小上限时淘汰最久未使用的条目
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl: 该条目的过期时间（秒），不指定时使用缓存默认值
+            size: 该条目的大小（字节），用于 max_bytes 限制；单个条目超过上限时不缓存
+        """
+        if self.max_bytes and size > self.max_bytes:
+            return
+
+        async with self._get_lock():
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), size, value)
+            self._total_bytes += size
+            while len(self._data) > self.maxsize or (self.max_bytes and self._total_bytes > self.max_bytes):
+                self._pop(next(iter(self._data)))
+
+    def clear(self):
+        """清空缓存"""
+        self._data.clear()
+        self._total_bytes = 0
@@ -18,10 +18,10 @@ async def generate_preview():
 
         # 直接设置内容，不需要加载文件
         print('设置HTML内容...')
-        await page.set_content(html_content, wait_until='networkidle', timeout=60000)
+        await page.set_content(html_content, wait_until='load', timeout=60000)
 
-        # 等待渲染
-        await page.wait_for_timeout(1000)
+        # 等待 Web 字体就绪（替代 networkidle 和固定延时）
+        await page.evaluate('async () => { await document.fonts.ready; }')
 
         # 截图
         output_file = os.path.join(current_dir, 'user_summary_preview.png')
@@ -10,6 +10,7 @@
 import sys
 import subprocess
 import os
+import importlib.util
 
 
 def print_step(step_num, total_steps, message):
@@ -19,35 +20,40 @@ def print_step(step_num, total_steps, message):
 
 
 def check_package_installed(package_name):
-    """检查 Python 包是否已安装"""
-    try:
-        __import__(package_name)
-        return True
-    except ImportError:
-        return False
+    """检查 Python 包是否已安装（只查找模块位置，不执行导入）"""
+    return importlib.util.find_spec(package_name) is not None
+
+
+# 需要的 Python 包及最低版本
+REQUIRED_PACKAGES = [
+    ("jinja2", "3.1.2"),
+    ("playwright", "1.48.0"),
+]
 
 
-def install_pip_package(package_name, version=None):
-    """安装 pip 包"""
-    package_spec = f"{package_name}>={version}" if version else package_name
-    print(f"正在安装 {package_spec}...")
+def install_pip_packages(package_specs):
+    """一次 pip 调用安装多个包（解析器统一处理依赖，复用到镜像源的连接）"""
+    package_list = " ".join(package_specs)
+    print(f"正在安装 {package_list}...")
 
     try:
         # 使用阿里云镜像源加速安装
         subprocess.check_call(
             [
                 sys.executable, "-m", "pip", "install",
-                package_spec,
+                *package_specs,
                 "-i", "https://mirrors.aliyun.com/pypi/simple/",
-                "--trusted-host", "mirrors.aliyun.com"
+                "--trusted-host", "mirrors.aliyun.com",
+                "--disable-pip-version-check",  # 跳过 pip 自身的版本检查（一次网络请求）
+                "--no-input"
             ],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE
         )
-        print(f"[OK] {package_name} 安装成功")
+        print(f"[OK] {package_list} 安装成功")
         return True
     except subprocess.CalledProcessError as e:
-        print(f"[ERROR] {package_name} 安装失败: {e}")
+        print(f"[ERROR] {package_list} 安装失败: {e}")
         return False
 
 
@@ -84,26 +90,21 @@ def main():
     print("  3. Chromium 浏览器 - 用于渲染 HTML 为图片")
     print("\n镜像源: 阿里云 (https://mirrors.aliyun.com/pypi/simple/)")
 
-    # 步骤 1: 检查并安装 jinja2
-    print_step(1, 3, "检查并安装 jinja2")
-    if check_package_installed("jinja2"):
-        print("[OK] jinja2 已安装")
-    else:
-        if not install_pip_package("jinja2", "3.1.2"):
-            print("\n安装失败! 请手动运行: pip install jinja2>=3.1.2")
-            return False
+    # 步骤 1: 检查并安装 jinja2 和 playwright（缺失的包合并为一次 pip 调用）
+    print_step(1, 2, "检查并安装 jinja2 和 playwright")
+    missing_specs = []
+    for package_name, version in REQUIRED_PACKAGES:
+        if check_package_installed(package_name):
+            print(f"[OK] {package_name} 已安装")
+        else:
+            missing_specs.append(f"{package_name}>={version}")
 
-    # 步骤 2: 检查并安装 playwright
-    print_step(2, 3, "检查并安装 playwright")
-    if check_package_installed("playwright"):
-        print("[OK] playwright 已安装")
-    else:
-        if not install_pip_package("playwright", "1.48.0"):
-            print("\n安装失败! 请手动运行: pip install playwright>=1.48.0")
-            return False
+    if missing_specs and not install_pip_packages(missing_specs):
+        print(f"\n安装失败! 请手动运行: pip install {' '.join(missing_specs)}")
+        return False
 
-    # 步骤 3: 安装 Chromium 浏览器
-    print_step(3, 3, "安装 Chromium 浏览器")
+    # 步骤 2: 安装 Chromium 浏览器
+    print_step(2, 2, "安装 Chromium 浏览器")
     if not install_playwright_browsers():
         print("\n浏览器安装失败! 请手动运行: python -m playwright install chromium")
         return False
@@ -22,11 +22,32 @@
 
 import re
 import asyncio
-import json
 import os
+from contextlib import suppress
 from datetime import datetime, timedelta
-from typing import List, Tuple, Optional, Dict, Union
-from collections import Counter
+from functools import lru_cache
+from typing import List, Tuple, Optional, Dict, Union, FrozenSet, Set
+
+# 时区优先使用标准库 zoneinfo（Python 3.9+），不可用时回退到 pytz
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    ZoneInfo = None
+
+# 优先使用 pybase64（SIMD 加速）编码图片，未安装时回退到标准库
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
+# 命令与 @ 解析用正则（模块加载时编译一次）
+_CMD_SUMMARY_RE = re.compile(r"^/summary\s*(.*)$")
+_CMD_MYSUMMARY_RE = re.compile(r"^/mysummary\s*(.*)$")
+_CQ_AT_RE = re.compile(r'\[CQ:at,qq=(\d+)\]')      # CQ 码格式: [CQ:at,qq=123456]
+_MAI_AT_RE = re.compile(r'@<([^:<>]+):(\d+)>')     # MaiBot 内部格式: @<昵称:QQ号>
+_SIMPLE_AT_RE = re.compile(r'^@(\S+)')             # 简单格式: @用户名
+_CQ_AT_SUB = re.compile(r'\[CQ:at,qq=\d+\]\s*')
+_MAI_AT_SUB = re.compile(r'@<[^:<>]+:\d+>\s*')
 
 
 def parse_config_list(value: Union[str, list], separator: str = ",") -> List[str]:
@@ -49,6 +70,22 @@ def parse_config_int_list(value: Union[str, list], separator: str = ",") -> List
             pass
     return result
 
+
+@lru_cache(maxsize=32)
+def _parse_config_int_set(value: Union[str, tuple]) -> FrozenSet[int]:
+    return frozenset(parse_config_int_list(list(value) if isinstance(value, tuple) else value))
+
+
+def parse_config_int_set(value: Union[str, list]) -> FrozenSet[int]:
+    """将配置值解析为整数集合（按配置值缓存，配置不变时不重复解析；用于成员判断）"""
+    if isinstance(value, list):
+        value = tuple(value)
+    try:
+        return _parse_config_int_set(value)
+    except TypeError:
+        # 配置值中含有不可哈希的元素，直接解析
+        return frozenset(parse_config_int_list(list(value)))
+
 from src.plugin_system import (
     BasePlugin,
     register_plugin,
@@ -57,66 +94,336 @@ from src.plugin_system import (
     EventType,
     MaiMessages,
     ConfigField,
-    database_api,
     llm_api,
     send_api,
     get_logger,
 )
 from src.common.database.database_model import Messages
+from peewee import fn
 from src.config.config import model_config
-from .core import SummaryImageGenerator, ChatAnalysisUtils
+from .core import SummaryImageGenerator, ChatAnalysisUtils, AnalysisConfig
+from .core.ttl_cache import TTLCache
+from .core.html_renderer import close_renderer
 
 logger = get_logger("chat_summary_plugin")
 
+# 已发送的总结图片（base64）缓存：同一群/用户同一天的重复请求直接复用，不再调用 LLM 和渲染
+# 图片常驻进程内存，除条目数外还限制总大小
+_summary_image_cache = TTLCache(
+    AnalysisConfig.SUMMARY_IMAGE_CACHE_SIZE,
+    AnalysisConfig.SUMMARY_IMAGE_CACHE_TTL_TODAY,
+    AnalysisConfig.SUMMARY_IMAGE_CACHE_MAX_MB * 1024 * 1024,
+)
+
+# 聊天记录查询结果缓存：短时间内同一聊天同一天的多次查询（总结命令、个人总结、自动总结）只查一次数据库
+_chat_messages_cache = TTLCache(AnalysisConfig.MESSAGE_CACHE_SIZE, AnalysisConfig.MESSAGE_CACHE_TTL)
+
+# 正在生成中的总结（缓存键）：同一份总结并发请求时只生成一次，结果会发到同一个群里
+_summaries_in_progress: Set[str] = set()
+
+
+def summary_cache_ttl(time_range: str) -> int:
+    """总结图片的缓存时间：昨天的记录不再变化，缓存更久；今天的只缓存几分钟"""
+    if time_range == "昨天":
+        return AnalysisConfig.SUMMARY_IMAGE_CACHE_TTL_PAST
+    return AnalysisConfig.SUMMARY_IMAGE_CACHE_TTL_TODAY
+
+
+# 时间范围参数 -> (起始时间, 结束时间) 计算函数，参数为 (当前时间, 今天零点)
+_TIME_RANGE_HANDLERS = {
+    "": lambda now, today_start: (today_start, now),
+    "今天": lambda now, today_start: (today_start, now),
+    "昨天": lambda now, today_start: (today_start - timedelta(days=1), today_start),
+}
+
+
+def parse_time_range(time_range: str) -> Tuple[Optional[float], Optional[float]]:
+    """解析时间范围（/summary 与 /mysummary 共用）
+
+    Args:
+        time_range: 时间范围字符串（""、"今天" 或 "昨天"）
+
+    Returns:
+        (start_time, end_time) 时间戳元组，不支持的时间范围返回 (None, None)
+    """
+    handler = _TIME_RANGE_HANDLERS.get(time_range)
+    if handler is None:
+        return None, None
+
+    now = datetime.now()
+    start, end = handler(now, now.replace(hour=0, minute=0, second=0, microsecond=0))
+    return start.timestamp(), end.timestamp()
+
+
+def check_group_permission(
+    command: BaseCommand, command_label: str, allow_non_group: bool
+) -> Tuple[Optional[int], Optional[Tuple[bool, str, bool]]]:
+    """命令的群聊权限检查（黑名单/白名单模式），/summary 和 /mysummary 共用
+
+    Args:
+        command: 命令实例
+        command_label: 日志中的命令名（如 "/summary"）
+        allow_non_group: 非群聊消息是否放行给其他命令（True 时返回 (True, "", False)）
+
+    Returns:
+        (群号, None) 表示检查通过；(None, 返回值) 表示 execute 应直接返回该返回值
+    """
+    chat_stream = command.message.chat_stream
+    if not chat_stream:
+        logger.error("chat_stream 为空，无法进行权限检查")
+        return None, (False, "chat_stream为空", False)
+
+    # 从 group_info 中获取真正的 QQ 群号
+    if not chat_stream.group_info:
+        logger.debug("这不是群聊消息，跳过权限检查")
+        if allow_non_group:
+            return None, (True, "", False)  # 非群聊消息，允许继续
+        return None, (False, "非群聊消息", False)
+
+    group_id = chat_stream.group_info.group_id
+
+    # group_id 可能是字符串或整数，统一转为整数进行比较
+    try:
+        group_id_int = int(group_id)
+    except (ValueError, TypeError):
+        logger.error(f"无效的 group_id: {group_id}")
+        return None, (False, "无效的群号", False)
+
+    use_blacklist = command.get_config("command_permission.use_blacklist", True)
+    target_chats = parse_config_int_set(command.get_config("command_permission.target_chats", ""))
+
+    if use_blacklist:
+        # 黑名单模式：列表中的群不能使用
+        if group_id_int in target_chats:
+            logger.debug(f"群聊 {group_id_int} 在黑名单中，静默跳过 {command_label} 命令")
+            return None, (False, "权限不足", False)  # 静默，不处理，让其他命令继续
+    elif target_chats and group_id_int not in target_chats:
+        # 白名单模式：只有列表中的群可以使用
+        logger.debug(f"群聊 {group_id_int} 不在白名单中，静默跳过 {command_label} 命令")
+        return None, (False, "权限不足", False)  # 静默，不处理，让其他命令继续
+
+    return group_id_int, None
+
+
+# QQ 头像 URL 格式
+_AVATAR_URL_FMT = "https://q1.qlogo.cn/g?b=qq&nk=%s&s=100"
+
+
+@lru_cache(maxsize=4096)
+def avatar_url(user_id: str) -> str:
+    """QQ 头像 URL（同一批群友每天都会出现，结果缓存复用）"""
+    return _AVATAR_URL_FMT % user_id if user_id else ""
+
+
+def attach_avatar_urls(user_titles: List[dict]):
+    """为群友称号列表的每一项填入头像 URL（avatar_data 字段，没有 user_id 时为空字符串）"""
+    for title_item in user_titles:
+        title_item["avatar_data"] = avatar_url(title_item.get("user_id", ""))
+
+
+def read_image_base64(img_path: str) -> str:
+    """读取图片文件并编码为 base64 字符串（发送接口只接受 base64 图片数据）
+
+    原始字节只在编码期间存在，不再额外保留一份引用。
+    """
+    with open(img_path, "rb") as f:
+        return base64.b64encode(f.read()).decode("ascii")
+
+
+def remove_image_file(img_path: str):
+    """删除已发送的临时图片（阻塞的文件操作，由调用方放到线程中执行）
+
+    直接 unlink，文件已不存在时静默跳过，其他错误只记录日志，不影响总结发送结果。
+    """
+    try:
+        with suppress(FileNotFoundError):
+            os.unlink(img_path)
+    except OSError as e:
+        logger.warning(f"清理临时图片失败: {e}")
+
+
+# 参与总结的消息：排除命令和通知（字段为空视为普通消息）
+_CHAT_MESSAGE_CONDITION = (
+    (Messages.is_command.is_null() | (Messages.is_command == False))  # noqa: E712
+    & (Messages.is_notify.is_null() | (Messages.is_notify == False))  # noqa: E712
+)
+
+# 总结流程实际用到的消息字段（预处理、按用户过滤和昵称查找），其余列不取回
+_SUMMARY_MESSAGE_FIELDS = (
+    Messages.time,
+    Messages.user_id,
+    Messages.user_nickname,
+    Messages.user_cardname,
+    Messages.processed_plain_text,
+)
+
+
+def query_chat_messages(chat_id: str, start_time: float, end_time: float) -> List[dict]:
+    """查询指定聊天在时间范围内的消息（排除命令和通知），按时间正序返回
+
+    database_api.db_query 的 filters 只支持等值匹配，这里直接使用 peewee 查询，
+    让时间范围和类型过滤在数据库中完成，只取回目标时间段的行和总结用到的列，并以字典形式返回。
+
+    Args:
+        chat_id: 聊天ID
+        start_time: 起始时间戳（包含）
+        end_time: 结束时间戳（不包含）
+
+    Returns:
+        聊天记录列表
+    """
+    query = (
+        Messages.select(*_SUMMARY_MESSAGE_FIELDS)
+        .where(
+            (Messages.chat_id == chat_id)
+            & (Messages.time >= start_time)
+            & (Messages.time < end_time)
+            & _CHAT_MESSAGE_CONDITION
+        )
+        .order_by(Messages.time)
+        .dicts()
+    )
+    return list(query)
+
+
+async def load_chat_messages(chat_id: str, start_time: float, end_time: float) -> List[dict]:
+    """获取指定聊天的聊天记录（三处总结流程共用的唯一入口，查询出错时返回空列表）
+
+    结果按 (聊天, 起始时间, 结束时间) 缓存 MESSAGE_CACHE_TTL 秒：结束时间为零点的已结束时间段按精确时间戳区分，
+    结束时间为"现在"的进行中时间段共用一个键，缓存期内的重复请求直接复用，最多漏掉这几十秒内的新消息。
+    返回的列表为共享对象，调用方不要修改。
+
+    Args:
+        chat_id: 聊天ID
+        start_time: 起始时间戳
+        end_time: 结束时间戳
+
+    Returns:
+        聊天记录列表
+    """
+    end = datetime.fromtimestamp(end_time)
+    end_key = int(end_time) if end.time() == datetime.min.time() else "open"
+    cache_key = f"{chat_id}:{int(start_time)}:{end_key}"
+    cached = await _chat_messages_cache.get(cache_key)
+    if cached is not None:
+        return cached[0]
+
+    try:
+        # 查询消息（时间范围、命令/通知过滤和排序都在数据库中完成）
+        messages = query_chat_messages(chat_id, start_time, end_time)
+    except Exception as e:
+        logger.error(f"获取聊天 {chat_id} 的聊天记录出错: {e}", exc_info=True)
+        return []
+
+    await _chat_messages_cache.set(cache_key, (messages,))
+    return messages
+
+
+async def load_command_messages(command: BaseCommand, start_time: float, end_time: float) -> List[dict]:
+    """获取命令所在聊天的聊天记录（/summary 与 /mysummary 共用）"""
+    chat_stream = command.message.chat_stream
+    if not chat_stream:
+        logger.error("chat_stream 为空")
+        return []
+
+    return await load_chat_messages(chat_stream.stream_id, start_time, end_time)
+
+
+def query_active_chats(
+    start_time: float, end_time: float, group_ids: Optional[Set[str]] = None, min_messages: int = 1
+) -> Dict[str, Optional[str]]:
+    """查询时间范围内消息数达到要求的聊天（分组计数在数据库中完成，每个聊天只取回一行）
+
+    Args:
+        start_time: 起始时间戳（包含）
+        end_time: 结束时间戳（不包含）
+        group_ids: 只查询这些群号（为空时查询全部聊天）
+        min_messages: 最少消息数量（与 query_chat_messages 一样不计命令和通知）
+
+    Returns:
+        {chat_id: group_id}，私聊的 group_id 为 None
+    """
+    condition = (Messages.time >= start_time) & (Messages.time < end_time) & _CHAT_MESSAGE_CONDITION
+    if group_ids:
+        condition &= Messages.chat_info_group_id.in_(list(group_ids))
+
+    query = (
+        Messages.select(Messages.chat_id, fn.MAX(Messages.chat_info_group_id))
+        .where(condition)
+        .group_by(Messages.chat_id)
+        .having(fn.COUNT(Messages.chat_id) >= max(min_messages, 1))
+        .tuples()
+    )
+
+    return {chat_id: group_id for chat_id, group_id in query if chat_id}
+
+
+# 总结 prompt 的开头模板（人设和记录概况，用 format_map 填充；聊天记录文本不经过模板格式化）
+SUMMARY_PROMPT_HEADER = "你是{bot_name}。{personality}\n{reply_style}\n\n以下是群聊记录（{message_count}条消息，{participant_count}人参与）：\n"
+
+# 总结 prompt 的固定指令部分（模块加载时构建一次）
+SUMMARY_PROMPT_INSTRUCTIONS = """
+
+请像给朋友讲故事一样复述群里发生了什么。
+
+要求：
+1. 按时间顺序讲，保持连贯性
+2. 精彩内容详细说，平淡内容略过
+3. 对话要说清谁说了什么、谁怎么回的
+4. 必须有具体人名和具体内容，不要抽象描述
+5. 口语化，不要用"首先""其次""然后""总之"这类词
+
+直接开始，不要标题。"""
+
+
+def build_summary_prompt(
+    messages: List[dict], participant_count: Optional[int] = None, max_chars: int = 0
+) -> str:
+    """构建聊天记录总结的提示词（/summary 与每日自动总结共用）
+
+    聊天记录文本可能有几十 KB，用 join 一次拼接，不嵌入 f-string 重复复制。
+
+    Args:
+        messages: 聊天记录列表（可以是预处理后的消息）
+        participant_count: 参与人数（调用方已统计时传入，避免再遍历一次）
+        max_chars: 聊天记录文本长度上限（0 表示不限制），超出时保留开头和结尾
+
+    Returns:
+        提示词文本
+    """
+    from src.config.config import global_config
+
+    # 统计参与用户（调用方未提供时）
+    if participant_count is None:
+        participant_count = len({msg.nickname for msg in ChatAnalysisUtils.preprocess_messages(messages) if msg.nickname})
+
+    header = SUMMARY_PROMPT_HEADER.format_map({
+        "bot_name": global_config.bot.nickname,
+        "personality": global_config.personality.personality,
+        "reply_style": global_config.personality.reply_style,
+        "message_count": len(messages),
+        "participant_count": participant_count,
+    })
+    return "".join((header, ChatAnalysisUtils.format_messages(messages, max_chars), SUMMARY_PROMPT_INSTRUCTIONS))
+
 
 class ChatSummaryCommand(BaseCommand):
     """聊天记录总结命令"""
 
     command_name = "chat_summary"
     command_description = "生成聊天记录总结"
-    command_pattern = r"^/summary\s*(.*)$"
+    command_pattern = _CMD_SUMMARY_RE.pattern
 
     async def execute(self) -> Tuple[bool, str, bool]:
         """执行聊天记录总结"""
         try:
             # ===== 权限检查 =====
-            # 获取当前群聊的 QQ 群号
-            if not self.message.chat_stream:
-                logger.error("chat_stream 为空，无法进行权限检查")
-                return False, "chat_stream为空", False
-
-            # 从 group_info 中获取真正的 QQ 群号
-            if not self.message.chat_stream.group_info:
-                logger.debug("这不是群聊消息，跳过权限检查")
-                return True, "", False  # 非群聊消息，允许继续
-
-            group_id = self.message.chat_stream.group_info.group_id
-
-            # 读取配置
-            use_blacklist = self.get_config("command_permission.use_blacklist", True)
-            target_chats = parse_config_int_list(self.get_config("command_permission.target_chats", ""))
-
-            # group_id 可能是字符串或整数，统一转为整数进行比较
-            try:
-                group_id_int = int(group_id)
-            except (ValueError, TypeError):
-                logger.error(f"无效的 group_id: {group_id}")
-                return False, "无效的群号", False
-
-            # 检查权限
-            if use_blacklist:
-                # 黑名单模式：列表中的群不能使用
-                if group_id_int in target_chats:
-                    logger.debug(f"群聊 {group_id_int} 在黑名单中，静默跳过 /summary 命令")
-                    return False, "权限不足", False  # 静默，不处理，让其他命令继续
-            else:
-                # 白名单模式：只有列表中的群可以使用
-                if target_chats and group_id_int not in target_chats:
-                    logger.debug(f"群聊 {group_id_int} 不在白名单中，静默跳过 /summary 命令")
-                    return False, "权限不足", False  # 静默，不处理，让其他命令继续
+            group_id_int, denied = check_group_permission(self, "/summary", allow_non_group=True)
+            if denied:
+                return denied
 
             # ===== 管理员权限检查 =====
-            admin_users = parse_config_int_list(self.get_config("command_permission.admin_users", ""))
+            admin_users = parse_config_int_set(self.get_config("command_permission.admin_users", ""))
             if admin_users:  # 如果列表不为空，进行管理员检查
                 # 获取当前用户的QQ号
                 user_id = self.message.message_info.user_info.user_id
@@ -128,9 +435,6 @@ class ChatSummaryCommand(BaseCommand):
                     logger.error(f"无效的 user_id: {user_id}")
                     return False, "无效的用户ID", False
 
-                # 确保 admin_users 是整数列表（WebUI 可能发送字符串列表）
-                admin_users = [int(uid) if isinstance(uid, str) else uid for uid in admin_users]
-
                 # 检查用户是否在管理员列表中
                 if user_id_int not in admin_users:
                     logger.debug(f"用户 {user_id_int} 不在管理员列表中，静默跳过 /summary 命令")
@@ -138,7 +442,7 @@ class ChatSummaryCommand(BaseCommand):
 
             # ===== 原有逻辑 =====
             # 获取命令参数
-            match = re.match(self.command_pattern, self.message.raw_message)
+            match = _CMD_SUMMARY_RE.match(self.message.raw_message)
             if not match:
                 await self.send_text("用法: /summary [今天|昨天]")
                 return True, "已发送使用说明", True
@@ -154,123 +458,119 @@ class ChatSummaryCommand(BaseCommand):
                 await self.send_text(f"只支持查询今天或昨天的记录哦")
                 return False, f"不支持的时间范围: {time_range}", False
 
-            # 获取聊天记录
-            messages = await self._get_messages(start_time, end_time)
+            # 同一群同一天的总结刚生成过：直接发送缓存的图片
+            # 键中带上时间范围，"昨天"不会复用当天未结束时缓存的"今天"图片
+            cache_key = f"group:{group_id_int}:{time_range}:{int(start_time)}"
+            cached = await _summary_image_cache.get(cache_key)
+            if cached is not None:
+                await self.send_custom("image", cached[0])
+                return True, "已发送缓存的聊天记录总结", True
 
-            if not messages:
-                await self.send_text(f"{time_range}没有聊天记录呢")
-                return True, "没有聊天记录", True
+            if cache_key in _summaries_in_progress:
+                await self.send_text(f"{time_range}的群聊总结正在生成中，稍等一下就好~")
+                return True, "总结正在生成中", True
 
-            # 发送等候提示
-            await self.send_text(f"⏳ 正在分析{time_range}的聊天记录，请稍候...")
+            _summaries_in_progress.add(cache_key)
+            try:
+                # 获取聊天记录
+                messages = await load_command_messages(self, start_time, end_time)
 
-            # 生成总结
-            summary = await self._generate_summary(messages, time_range)
+                if not messages:
+                    await self.send_text(f"{time_range}没有聊天记录呢")
+                    return True, "没有聊天记录", True
 
-            if summary:
-                # 生成并发送图片
-                try:
-                    # 准备图片信息
-                    title = f"{time_range}的群聊总结"
+                # 发送等候提示
+                await self.send_text(f"⏳ 正在分析{time_range}的聊天记录，请稍候...")
 
-                    # 统计信息
-                    participants = set()
-                    for msg in messages:
-                        nickname = msg.get("user_nickname", "")
-                        if nickname:
-                            participants.add(nickname)
-                    participant_count = len(participants)
+                # 预处理消息（只解析一次，供总结和各分析函数共用）
+                parsed_messages = ChatAnalysisUtils.preprocess_messages(messages)
 
-                    # 分析用户统计
-                    user_stats = ChatAnalysisUtils.analyze_user_stats(messages)
-
-                    # 计算24小时发言分布
-                    from collections import Counter
-                    hourly_distribution = Counter()
-                    for msg in messages:
-                        timestamp = msg.get("time", 0)
-                        hour = datetime.fromtimestamp(timestamp).hour
-                        hourly_distribution[hour] += 1
-                    # 转换为普通字典
-                    hourly_distribution = dict(hourly_distribution)
-
-                    # 始终分析所有数据，由 display_order 控制显示
-                    topics = await ChatAnalysisUtils.analyze_topics(messages) or []
-                    user_titles = await ChatAnalysisUtils.analyze_user_titles(messages, user_stats) or []
-                    golden_quotes = await ChatAnalysisUtils.analyze_golden_quotes(messages) or []
-                    depression_index = await ChatAnalysisUtils.analyze_depression_index(messages, user_stats) or []
+                # 统计信息：参与人数和24小时发言分布（一次遍历完成）
+                participant_count, hourly_distribution = ChatAnalysisUtils.analyze_group_overview(parsed_messages)
 
-                    # 为 user_titles 添加头像数据
-                    if user_titles:
-                        for title_item in user_titles:
-                            user_id = title_item.get("user_id", "")
-                            if user_id:
-                                # QQ头像URL格式
-                                title_item["avatar_data"] = f"https://q1.qlogo.cn/g?b=qq&nk={user_id}&s=100"
-                            else:
-                                title_item["avatar_data"] = ""
-
-                    # 获取显示顺序配置
-                    display_order = parse_config_list(self.get_config("summary.display_order", "24H,Topics,Portraits,Quotes,Rankings"))
-
-                    # 获取炫压抑评级配置
-                    max_depression_display = self.get_config("summary.max_depression_display", 6)
-                    depression_show_bottom = self.get_config("summary.depression_show_bottom", True)
-
-                    # 计算目标日期
-                    if time_range == "昨天":
-                        target_date = datetime.now() - timedelta(days=1)
-                    else:
-                        target_date = datetime.now()
+                # 生成总结
+                summary = await self._generate_summary(parsed_messages, time_range, participant_count)
 
-                    # 生成图片并获取临时文件路径
-                    img_path = await SummaryImageGenerator.generate_summary_image(
-                        title=title,
-                        summary_text=summary,
-                        time_info=target_date.strftime("%Y-%m-%d"),
-                        message_count=len(messages),
-                        participant_count=participant_count,
-                        topics=topics,
-                        user_titles=user_titles,
-                        golden_quotes=golden_quotes,
-                        depression_index=depression_index,
-                        hourly_distribution=hourly_distribution,
-                        user_profile=None,
-                        group_id=str(group_id_int),  # 添加群号用于标识和清理旧图片
-                        display_order=display_order,
-                        target_date=target_date,
-                        max_depression_display=max_depression_display,
-                        depression_show_bottom=depression_show_bottom
-                    )
+                if summary:
+                    # 消息太少时话题、金句等分析没有意义：只发送文字总结，省去四项 LLM 分析和图片渲染
+                    min_messages = self.get_config("summary.min_messages", 20)
+                    if len(messages) < min_messages:
+                        await self.send_text(summary)
+                        return True, "消息较少，已发送文字总结", True
 
-                    # 发送图片
+                    # 生成并发送图片
                     try:
-                        if not os.path.exists(img_path):
-                            raise FileNotFoundError(f"图片文件不存在: {img_path}")
+                        # 准备图片信息
+                        title = f"{time_range}的群聊总结"
 
-                        with open(img_path, 'rb') as f:
-                            img_data = f.read()
+                        # 分析用户统计
+                        user_stats = ChatAnalysisUtils.analyze_user_stats(parsed_messages)
 
-                        import base64
-                        img_base64 = base64.b64encode(img_data).decode('utf-8')
-                        await self.send_custom("image", img_base64)
-                        await asyncio.sleep(2)
-                    finally:
+                        # 始终分析所有数据，由 display_order 控制显示
+                        # 四项 LLM 分析互不依赖，并发执行（失败项为空列表）
+                        topics, user_titles, golden_quotes, depression_index = await ChatAnalysisUtils.analyze_all(
+                            parsed_messages, user_stats
+                        )
+
+                        # 为 user_titles 添加头像数据
+                        attach_avatar_urls(user_titles)
+
+                        # 获取显示顺序配置
+                        display_order = parse_config_list(self.get_config("summary.display_order", "24H,Topics,Portraits,Quotes,Rankings"))
+
+                        # 获取炫压抑评级配置
+                        max_depression_display = self.get_config("summary.max_depression_display", 6)
+                        depression_show_bottom = self.get_config("summary.depression_show_bottom", True)
+
+                        # 计算目标日期
+                        if time_range == "昨天":
+                            target_date = datetime.now() - timedelta(days=1)
+                        else:
+                            target_date = datetime.now()
+
+                        # 生成图片并获取临时文件路径
+                        img_path = await SummaryImageGenerator.generate_summary_image(
+                            title=title,
+                            summary_text=summary,
+                            time_info=target_date.strftime("%Y-%m-%d"),
+                            message_count=len(messages),
+                            participant_count=participant_count,
+                            topics=topics,
+                            user_titles=user_titles,
+                            golden_quotes=golden_quotes,
+                            depression_index=depression_index,
+                            hourly_distribution=hourly_distribution,
+                            user_profile=None,
+                            group_id=str(group_id_int),  # 添加群号用于标识和清理旧图片
+                            display_order=display_order,
+                            target_date=target_date,
+                            max_depression_display=max_depression_display,
+                            depression_show_bottom=depression_show_bottom,
+                            image_format=self.get_config("summary.image_format", "jpeg")
+                        )
+
+                        # 发送图片
                         try:
-                            if os.path.exists(img_path):
-                                os.remove(img_path)
-                        except Exception as e:
-                            logger.warning(f"清理临时图片失败: {e}")
+                            # 读取和编码放到线程中执行（文件不存在时 open 直接抛出 FileNotFoundError）
+                            img_base64 = await asyncio.to_thread(read_image_base64, img_path)
+                            await self.send_custom("image", img_base64)
+                            await _summary_image_cache.set(
+                                cache_key, (img_base64,), summary_cache_ttl(time_range), len(img_base64)
+                            )
+                        finally:
+                            await asyncio.to_thread(remove_image_file, img_path)
 
-                except Exception as e:
-                    logger.error(f"生成图片失败，使用文本输出: {e}", exc_info=True)
-                    # 降级到文本输出
-                    await self.send_text(summary)
+                    except Exception as e:
+                        logger.error(f"生成图片失败，使用文本输出: {e}", exc_info=True)
+                        # 降级到文本输出
+                        await self.send_text(summary)
 
-                return True, "已生成聊天记录总结", True
-            else:
-                await self.send_text("生成总结失败了，等会再试试吧")
-                return False, "生成总结失败", False
+                    return True, "已生成聊天记录总结", True
+                else:
+                    await self.send_text("生成总结失败了，等会再试试吧")
+                    return False, "生成总结失败", False
+            finally:
+                _summaries_in_progress.discard(cache_key)
 
         except Exception as e:
             logger.error(f"执行聊天记录总结命令时出错: {e}", exc_info=True)
@@ -286,131 +586,25 @@ class ChatSummaryCommand(BaseCommand):
         Returns:
             (start_time, end_time) 时间戳元组，失败返回 (None, None)
         """
-        now = datetime.now()
-        today_start = datetime(now.year, now.month, now.day)
-
-        try:
-            if time_range == "今天" or time_range == "":
-                start_time = today_start
-                end_time = now
-            elif time_range == "昨天":
-                start_time = today_start - timedelta(days=1)
-                end_time = today_start
-            else:
-                # 不支持的时间范围
-                return None, None
-
-            return start_time.timestamp(), end_time.timestamp()
-
-        except Exception as e:
-            logger.error(f"解析时间范围出错: {e}")
-            return None, None
-
-    async def _get_messages(
-        self, start_time: float, end_time: float
-    ) -> List[dict]:
-        """获取聊天记录
-
-        Args:
-            start_time: 起始时间戳
-            end_time: 结束时间戳
-
-        Returns:
-            聊天记录列表
-        """
-        try:
-            # 获取当前聊天ID
-            if not self.message.chat_stream:
-                logger.error("chat_stream 为空")
-                return []
-
-            chat_id = self.message.chat_stream.stream_id
-
-            # 查询消息
-            # 注意：由于peewee的限制，我们需要分两步查询
-            # 1. 先查询所有符合chat_id和时间范围的消息
-            all_messages = await database_api.db_query(
-                Messages,
-                query_type="get",
-                filters={"chat_id": chat_id},
-                order_by=["-time"],
-            )
-
-            # 检查查询结果 - db_query 可能返回 None 或空列表
-            if not all_messages or all_messages is None:
-                return []
-
-            # 2. 在内存中过滤时间范围和用户
-            filtered_messages = []
-
-            for msg in all_messages:
-                # 检查时间范围
-                msg_time = msg.get("time", 0)
-                if not (start_time <= msg_time < end_time):
-                    continue
-
-                # 检查是否为命令或通知（排除这些消息）
-                if msg.get("is_command") or msg.get("is_notify"):
-                    continue
-
-                filtered_messages.append(msg)
-
-            # 按时间正序排序（旧到新）
-            filtered_messages.sort(key=lambda x: x.get("time", 0))
-
-            return filtered_messages
-
-        except Exception as e:
-            logger.error(f"获取聊天记录出错: {e}", exc_info=True)
-            return []
+        return parse_time_range(time_range)
 
     async def _generate_summary(
-        self, messages: List[dict], time_range: str
+        self, messages: List[dict], time_range: str, participant_count: Optional[int] = None
     ) -> Optional[str]:
         """生成聊天记录总结
 
         Args:
-            messages: 聊天记录列表
+            messages: 聊天记录列表（可以是预处理后的消息）
             time_range: 时间范围描述
+            participant_count: 参与人数（调用方已统计时传入，避免再遍历一次）
 
         Returns:
             总结文本，失败返回None
         """
         try:
-            # 构建聊天记录文本
-            chat_text = ChatAnalysisUtils.format_messages(messages)
-
-            # 获取人设和回复风格
-            from src.config.config import global_config
-
-            bot_name = global_config.bot.nickname
-            personality = global_config.personality.personality
-            reply_style = global_config.personality.reply_style
-
-            # 统计参与用户
-            participants = set()
-            for msg in messages:
-                nickname = msg.get("user_nickname", "")
-                if nickname:
-                    participants.add(nickname)
-
-            # 构建提示词
-            prompt = f"""你是{bot_name}。{personality}
-{reply_style}
-
-以下是群聊记录（{len(messages)}条消息，{len(participants)}人参与）：
-{chat_text}
-
-请像给朋友讲故事一样复述群里发生了什么。
-
-要求：
-1. 按时间顺序讲，保持连贯性
-2. 精彩内容详细说，平淡内容略过
-3. 对话要说清谁说了什么、谁怎么回的
-4. 必须有具体人名和具体内容，不要抽象描述
-5. 口语化，不要用"首先""其次""然后""总之"这类词
-
-直接开始，不要标题。"""
+            prompt = build_summary_prompt(
+                messages, participant_count, self.get_config("summary.max_prompt_chars", 30000)
+            )
 
             # 使用LLM生成总结
             # 使用主回复模型 (replyer)
@@ -441,6 +635,10 @@ class SummaryScheduler:
     避免轮询检查，提高效率并减少资源消耗。
     """
 
+    # 单次等待的最长时间（秒）：长时间等待分段进行，每段结束后按当前时间重新计算，
+    # 系统时间跳变（NTP 校时、休眠唤醒）后不会错过执行时间点
+    MAX_WAIT_SECONDS = 3600
+
     def __init__(self, config_getter):
         """初始化调度器
 
@@ -451,20 +649,53 @@ class SummaryScheduler:
         self.is_running = False
         self.task = None
         self.last_execution_date = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._next_run = None
+
+        # 时区对象和执行时间按配置字符串缓存，配置不变时不再重复解析
+        self._tz = None
+        self._tz_str = None
+        self._schedule_time_str = None
+        self._schedule_time = (23, 0)
+
+    @staticmethod
+    def _load_timezone(timezone_str: str):
+        """加载时区对象（zoneinfo 优先，其次 pytz），都不可用时返回 None（使用系统时间）"""
+        if ZoneInfo is not None:
+            try:
+                return ZoneInfo(timezone_str)
+            except Exception as e:
+                logger.debug(f"zoneinfo 无法加载时区 {timezone_str}: {e}，尝试 pytz")
 
-    def _get_timezone_now(self):
-        """获取配置时区的当前时间"""
-        timezone_str = self.get_config("auto_summary.timezone", "Asia/Shanghai")
         try:
             import pytz
-            tz = pytz.timezone(timezone_str)
-            return datetime.now(tz)
+            return pytz.timezone(timezone_str)
         except ImportError:
-            logger.warning("pytz模块未安装，使用系统时间")
-            return datetime.now()
+            logger.warning("zoneinfo 和 pytz 均不可用，使用系统时间")
         except Exception as e:
             logger.warning(f"时区处理出错: {e}，使用系统时间")
-            return datetime.now()
+        return None
+
+    def _get_timezone_now(self):
+        """获取配置时区的当前时间"""
+        timezone_str = self.get_config("auto_summary.timezone", "Asia/Shanghai")
+        if timezone_str != self._tz_str:
+            self._tz = self._load_timezone(timezone_str)
+            self._tz_str = timezone_str
+        return datetime.now(self._tz) if self._tz is not None else datetime.now()
+
+    def _get_schedule_time(self) -> Tuple[int, int]:
+        """获取配置的每日执行时间 (小时, 分钟)"""
+        summary_time_str = self.get_config("auto_summary.time", "23:00")
+        if summary_time_str != self._schedule_time_str:
+            try:
+                hour, minute = map(int, summary_time_str.split(":"))
+            except ValueError:
+                logger.error(f"无效的时间格式: {summary_time_str}，使用默认值 23:00")
+                hour, minute = 23, 0
+            self._schedule_time_str = summary_time_str
+            self._schedule_time = (hour, minute)
+        return self._schedule_time
 
     async def start(self, summary_generator):
         """启动定时任务
@@ -482,6 +713,7 @@ class SummaryScheduler:
             return
 
         self.is_running = True
+        self._stop_event = asyncio.Event()
         self.task = asyncio.create_task(self._schedule_loop(summary_generator))
 
         summary_time = self.get_config("auto_summary.time", "23:00")
@@ -498,6 +730,9 @@ class SummaryScheduler:
             return
 
         self.is_running = False
+        if self._stop_event:
+            # 唤醒正在等待的循环，使其立即退出
+            self._stop_event.set()
         if self.task:
             self.task.cancel()
             try:
@@ -506,6 +741,18 @@ class SummaryScheduler:
                 pass
         logger.info("定时任务已停止")
 
+    async def _wait_for_stop(self, timeout: float) -> bool:
+        """等待指定秒数，期间收到停止信号立即返回
+
+        Returns:
+            bool: 收到停止信号返回 True，等待超时返回 False
+        """
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
     async def _schedule_loop(self, summary_generator):
         """定时任务循环
 
@@ -515,14 +762,9 @@ class SummaryScheduler:
         while self.is_running:
             try:
                 now = self._get_timezone_now()
-                summary_time_str = self.get_config("auto_summary.time", "23:00")
 
                 # 解析执行时间
-                try:
-                    hour, minute = map(int, summary_time_str.split(":"))
-                except ValueError:
-                    logger.error(f"无效的时间格式: {summary_time_str}，使用默认值 23:00")
-                    hour, minute = 23, 0
+                hour, minute = self._get_schedule_time()
 
                 # 计算今天的执行时间点
                 today_schedule = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
@@ -533,10 +775,19 @@ class SummaryScheduler:
 
                 # 计算等待秒数
                 wait_seconds = (today_schedule - now).total_seconds()
-                logger.info(f"⏰ 下次总结生成时间: {today_schedule.strftime('%Y-%m-%d %H:%M:%S')} (等待 {int(wait_seconds/3600)}小时{int((wait_seconds%3600)/60)}分钟)")
+                if today_schedule != self._next_run:
+                    self._next_run = today_schedule
+                    logger.info(f"⏰ 下次总结生成时间: {today_schedule.strftime('%Y-%m-%d %H:%M:%S')} (等待 {int(wait_seconds/3600)}小时{int((wait_seconds%3600)/60)}分钟)")
+
+                # 距离执行时间较远时只等待一段，之后重新计算（收到停止信号立即退出）
+                if wait_seconds > self.MAX_WAIT_SECONDS:
+                    if await self._wait_for_stop(self.MAX_WAIT_SECONDS):
+                        break
+                    continue
 
                 # 等待到执行时间
-                await asyncio.sleep(wait_seconds)
+                if await self._wait_for_stop(wait_seconds):
+                    break
 
                 # 检查是否还在运行
                 if not self.is_running:
@@ -558,7 +809,8 @@ class SummaryScheduler:
             except Exception as e:
                 logger.error(f"❌ 定时任务执行出错: {e}", exc_info=True)
                 # 出错后等待1分钟再重试
-                await asyncio.sleep(60)
+                if await self._wait_for_stop(60):
+                    break
 
 
 class UserSummaryCommand(BaseCommand):
@@ -566,40 +818,15 @@ class UserSummaryCommand(BaseCommand):
 
     command_name = "user_summary"
     command_description = "生成个人聊天总结"
-    command_pattern = r"^/mysummary\s*(.*)$"
+    command_pattern = _CMD_MYSUMMARY_RE.pattern
 
     async def execute(self) -> Tuple[bool, str, bool]:
         """执行个人用户总结"""
         try:
             # ===== 权限检查（复用群聊总结的权限逻辑）=====
-            if not self.message.chat_stream:
-                logger.error("chat_stream 为空，无法进行权限检查")
-                return False, "chat_stream为空", False
-
-            if not self.message.chat_stream.group_info:
-                logger.debug("这不是群聊消息，跳过")
-                return False, "非群聊消息", False
-
-            group_id = self.message.chat_stream.group_info.group_id
-
-            # 读取配置
-            use_blacklist = self.get_config("command_permission.use_blacklist", True)
-            target_chats = parse_config_int_list(self.get_config("command_permission.target_chats", ""))
-
-            try:
-                group_id_int = int(group_id)
-            except (ValueError, TypeError):
-                logger.error(f"无效的 group_id: {group_id}")
-                return False, "无效的群号", False
-
-            if use_blacklist:
-                if group_id_int in target_chats:
-                    logger.debug(f"群聊 {group_id_int} 在黑名单中，静默跳过 /mysummary 命令")
-                    return False, "权限不足", False
-            else:
-                if target_chats and group_id_int not in target_chats:
-                    logger.debug(f"群聊 {group_id_int} 不在白名单中，静默跳过 /mysummary 命令")
-                    return False, "权限不足", False
+            group_id_int, denied = check_group_permission(self, "/mysummary", allow_non_group=False)
+            if denied:
+                return denied
 
             # ===== /mysummary 独立权限检查 =====
             # 检查功能开关
@@ -613,14 +840,14 @@ class UserSummaryCommand(BaseCommand):
             current_user_nickname = self.message.message_info.user_info.user_nickname or "未知用户"
 
             # 获取 allowed_users 列表（用于后续判断查看他人权限）
-            allowed_users = parse_config_int_list(self.get_config("user_summary.allowed_users", ""))
+            allowed_users = parse_config_int_set(self.get_config("user_summary.allowed_users", ""))
             try:
                 current_user_id_int = int(current_user_id)
             except (ValueError, TypeError):
                 current_user_id_int = 0
 
             # ===== 解析参数 =====
-            match = re.match(self.command_pattern, self.message.raw_message)
+            match = _CMD_MYSUMMARY_RE.match(self.message.raw_message)
             if not match:
                 await self.send_text("用法: /mysummary [今天|昨天] 或 /mysummary @某人 [今天|昨天]")
                 return True, "已发送使用说明", True
@@ -633,24 +860,24 @@ class UserSummaryCommand(BaseCommand):
             time_range = "今天"
 
             # 1. 处理 CQ 码格式的 at，例如: [CQ:at,qq=123456]
-            cq_at_match = re.search(r'\[CQ:at,qq=(\d+)\]', args)
+            cq_at_match = _CQ_AT_RE.search(args)
             # 2. 匹配 @<昵称:QQ号> 格式（MaiBot 内部消息格式）
-            at_match = re.search(r'@<([^:<>]+):(\d+)>', args)
+            at_match = _MAI_AT_RE.search(args)
             # 3. 匹配 @用户名 格式（简单格式）
-            simple_at_match = re.search(r'^@(\S+)', args)
+            simple_at_match = _SIMPLE_AT_RE.search(args)
 
             if cq_at_match:
                 # CQ 码格式
                 target_user_id = cq_at_match.group(1)
                 # 移除CQ码，剩下的是时间参数
-                remaining_args = re.sub(r'\[CQ:at,qq=\d+\]\s*', '', args).strip()
+                remaining_args = _CQ_AT_SUB.sub('', args).strip()
                 time_range = remaining_args if remaining_args in ["今天", "昨天"] else "今天"
             elif at_match:
                 # @<昵称:QQ号> 格式
                 target_user_name = at_match.group(1)
                 target_user_id = at_match.group(2)
                 # 移除@部分，剩下的是时间参数
-                remaining_args = re.sub(r'@<[^:<>]+:\d+>\s*', '', args).strip()
+                remaining_args = _MAI_AT_SUB.sub('', args).strip()
                 time_range = remaining_args if remaining_args in ["今天", "昨天"] else "今天"
             elif simple_at_match:
                 # @用户名 格式 - 可能是昵称或QQ号
@@ -679,14 +906,16 @@ class UserSummaryCommand(BaseCommand):
                     time_range = "今天"
 
             # ===== 如果只有昵称没有QQ号，需要先获取消息记录来查找 =====
+            # 这里取到的消息记录后面直接复用（时间范围相同），不再重复查询
+            all_messages = None
             if target_user_name and not target_user_id:
                 # 先获取时间范围
                 temp_start_time, temp_end_time = self._parse_time_range(time_range)
                 if temp_start_time and temp_end_time:
                     # 获取消息记录
-                    temp_messages = await self._get_messages(temp_start_time, temp_end_time)
+                    all_messages = await load_command_messages(self, temp_start_time, temp_end_time)
                     # 从消息记录中查找匹配昵称的用户
-                    for msg in temp_messages:
+                    for msg in all_messages:
                         msg_nickname = msg.get("user_nickname", "")
                         msg_cardname = msg.get("user_cardname", "")
                         if target_user_name in [msg_nickname, msg_cardname]:
@@ -730,132 +959,128 @@ class UserSummaryCommand(BaseCommand):
                 await self.send_text(f"只支持查询今天或昨天的记录哦")
                 return False, f"不支持的时间范围: {time_range}", False
 
-            # ===== 获取聊天记录 =====
-            all_messages = await self._get_messages(start_time, end_time)
-
-            if not all_messages:
-                await self.send_text(f"{time_range}群里没有聊天记录呢")
-                return True, "没有聊天记录", True
-
-            # ===== 过滤出目标用户的消息（关键：只使用该用户的消息）=====
-            user_messages = ChatAnalysisUtils.filter_user_messages(all_messages, user_id)
-
-            # 尝试从消息记录中获取用户名（如果之前没有获取到）
-            if target_user_id and user_messages:
-                first_msg = user_messages[0]
-                msg_cardname = first_msg.get("user_cardname", "")
-                msg_nickname = first_msg.get("user_nickname", "")
-                if msg_cardname:
-                    user_name = msg_cardname
-                elif msg_nickname:
-                    user_name = msg_nickname
-
-            is_self = (user_id == current_user_id)
-
-            if not user_messages:
-                if is_self:
-                    await self.send_text(f"{time_range}你没有发言记录呢，多说说话吧~")
-                else:
-                    await self.send_text(f"{time_range}{user_name}没有发言记录呢~")
-                return True, "用户没有发言记录", True
-
-            if len(user_messages) < 3:
-                if is_self:
-                    await self.send_text(f"{time_range}你只发了{len(user_messages)}条消息，发言太少啦，多聊聊天再来总结吧~")
-                else:
-                    await self.send_text(f"{time_range}{user_name}只发了{len(user_messages)}条消息，发言太少无法生成总结~")
-                return True, "用户发言太少", True
-
-            # 发送等候提示
-            await self.send_text(f"⏳ 正在分析{user_name}的{time_range}发言记录，请稍候...")
-
-            # ===== 分析用户数据（只使用该用户的消息）=====
-            # 统计数据
-            user_stats = ChatAnalysisUtils.analyze_single_user_stats(user_messages)
-
-            # AI总结（只使用该用户的消息）
-            summary_text = await ChatAnalysisUtils.analyze_single_user_summary(
-                user_messages, user_name, user_id
-            )
-
-            # 群友画像（只使用该用户的消息）
-            portrait_data = await ChatAnalysisUtils.analyze_single_user_portrait(
-                user_messages, user_name, user_id
-            )
+            # 同一用户同一天的个人总结刚生成过：直接发送缓存的图片
+            cache_key = f"user:{group_id_int}:{user_id}:{time_range}:{int(start_time)}"
+            cached = await _summary_image_cache.get(cache_key)
+            if cached is not None:
+                await self.send_custom("image", cached[0])
+                return True, "已发送缓存的个人总结", True
 
-            # 炫压抑评级（只使用该用户的消息）
-            depression_data = await ChatAnalysisUtils.analyze_single_user_depression(
-                user_messages, user_name, user_id
-            )
+            if cache_key in _summaries_in_progress:
+                await self.send_text(f"{user_name}的{time_range}总结正在生成中，稍等一下就好~")
+                return True, "总结正在生成中", True
 
-            # 金句（只使用该用户的消息）
-            golden_quotes = await ChatAnalysisUtils.analyze_single_user_quotes(
-                user_messages, user_name, user_id
-            )
+            _summaries_in_progress.add(cache_key)
+            try:
+                # ===== 获取聊天记录（解析昵称时已获取的直接复用）=====
+                if all_messages is None:
+                    all_messages = await load_command_messages(self, start_time, end_time)
+
+                if not all_messages:
+                    await self.send_text(f"{time_range}群里没有聊天记录呢")
+                    return True, "没有聊天记录", True
+
+                # ===== 过滤出目标用户的消息（关键：只使用该用户的消息）=====
+                user_messages = ChatAnalysisUtils.filter_user_messages(all_messages, user_id)
+
+                # 尝试从消息记录中获取用户名（如果之前没有获取到）
+                if target_user_id and user_messages:
+                    first_msg = user_messages[0]
+                    msg_cardname = first_msg.get("user_cardname", "")
+                    msg_nickname = first_msg.get("user_nickname", "")
+                    if msg_cardname:
+                        user_name = msg_cardname
+                    elif msg_nickname:
+                        user_name = msg_nickname
+
+                is_self = (user_id == current_user_id)
+
+                if not user_messages:
+                    if is_self:
+                        await self.send_text(f"{time_range}你没有发言记录呢，多说说话吧~")
+                    else:
+                        await self.send_text(f"{time_range}{user_name}没有发言记录呢~")
+                    return True, "用户没有发言记录", True
 
-            # ===== 获取配置的显示顺序 =====
-            display_order_raw = self.get_config("user_summary.display_order", "3H,Portraits|Rankings")
-            # 解析显示顺序：用逗号分隔模块，用|分隔并排显示的模块
-            display_order = parse_config_list(display_order_raw)
-            # 将|替换回逗号（用于兼容旧格式）
-            display_order = [item.replace("|", ",") for item in display_order]
+                if len(user_messages) < 3:
+                    if is_self:
+                        await self.send_text(f"{time_range}你只发了{len(user_messages)}条消息，发言太少啦，多聊聊天再来总结吧~")
+                    else:
+                        await self.send_text(f"{time_range}{user_name}只发了{len(user_messages)}条消息，发言太少无法生成总结~")
+                    return True, "用户发言太少", True
 
-            # 计算目标日期
-            if time_range == "昨天":
-                target_date = datetime.now() - timedelta(days=1)
-            else:
-                target_date = datetime.now()
+                # 发送等候提示
+                await self.send_text(f"⏳ 正在分析{user_name}的{time_range}发言记录，请稍候...")
 
-            # ===== 生成图片 =====
-            try:
-                img_path = await SummaryImageGenerator.generate_user_summary_image(
-                    user_name=user_name,
-                    user_id=user_id,
-                    summary_text=summary_text or "",
-                    message_count=user_stats["message_count"],
-                    total_characters=user_stats["char_count"],
-                    emoji_count=user_stats["emoji_count"],
-                    hourly_distribution=user_stats["hourly_distribution"],
-                    user_title=portrait_data.get("title", "") if portrait_data else "",
-                    user_mbti=portrait_data.get("mbti", "") if portrait_data else "",
-                    portrait_data=portrait_data,
-                    depression_data=depression_data,
-                    golden_quotes=golden_quotes,
-                    display_order=display_order,
-                    target_date=target_date
+                # ===== 分析用户数据（只使用该用户的消息）=====
+                # 统计数据 + AI总结、群友画像、炫压抑评级、金句：合并为一次 LLM 请求（失败时自动回退为分别请求）
+                user_results = await ChatAnalysisUtils.analyze_single_user_combined(
+                    user_messages, user_name, user_id
                 )
+                user_stats = user_results["stats"]
+                summary_text = user_results["summary"]
+                portrait_data = user_results["portrait"]
+                depression_data = user_results["depression"]
+                golden_quotes = user_results["quotes"]
+
+                # ===== 获取配置的显示顺序 =====
+                display_order_raw = self.get_config("user_summary.display_order", "3H,Portraits|Rankings")
+                # 解析显示顺序：用逗号分隔模块，用|分隔并排显示的模块
+                display_order = parse_config_list(display_order_raw)
+                # 将|替换回逗号（用于兼容旧格式）
+                display_order = [item.replace("|", ",") for item in display_order]
+
+                # 计算目标日期
+                if time_range == "昨天":
+                    target_date = datetime.now() - timedelta(days=1)
+                else:
+                    target_date = datetime.now()
 
-                # 发送图片（和群聊总结保持一致的发送方式）
+                # ===== 生成图片 =====
                 try:
-                    if not os.path.exists(img_path):
-                        raise FileNotFoundError(f"图片文件不存在: {img_path}")
-
-                    with open(img_path, 'rb') as f:
-                        img_data = f.read()
-
-                    import base64
-                    img_base64 = base64.b64encode(img_data).decode('utf-8')
-                    await self.send_custom("image", img_base64)
-                    logger.info(f"成功发送个人总结图片: {img_path}")
-                    await asyncio.sleep(2)
-                finally:
+                    img_path = await SummaryImageGenerator.generate_user_summary_image(
+                        user_name=user_name,
+                        user_id=user_id,
+                        summary_text=summary_text or "",
+                        message_count=user_stats["message_count"],
+                        total_characters=user_stats["char_count"],
+                        emoji_count=user_stats["emoji_count"],
+                        hourly_distribution=user_stats["hourly_distribution"],
+                        user_title=portrait_data.get("title", "") if portrait_data else "",
+                        user_mbti=portrait_data.get("mbti", "") if portrait_data else "",
+                        portrait_data=portrait_data,
+                        depression_data=depression_data,
+                        golden_quotes=golden_quotes,
+                        display_order=display_order,
+                        target_date=target_date,
+                        image_format=self.get_config("summary.image_format", "jpeg")
+                    )
+
+                    # 发送图片（和群聊总结保持一致的发送方式）
                     try:
-                        if os.path.exists(img_path):
-                            os.remove(img_path)
-                    except Exception as e:
-                        logger.warning(f"清理临时图片失败: {e}")
+                        # 读取和编码放到线程中执行（文件不存在时 open 直接抛出 FileNotFoundError）
+                        img_base64 = await asyncio.to_thread(read_image_base64, img_path)
+                        await self.send_custom("image", img_base64)
+                        await _summary_image_cache.set(
+                            cache_key, (img_base64,), summary_cache_ttl(time_range), len(img_base64)
+                        )
+                        logger.info(f"成功发送个人总结图片: {img_path}")
+                    finally:
+                        await asyncio.to_thread(remove_image_file, img_path)
 
-                return True, "成功生成个人总结", True
+                    return True, "成功生成个人总结", True
 
-            except Exception as e:
-                logger.error(f"生成个人总结图片失败: {e}", exc_info=True)
-                # 如果图片生成失败，发送文字版本
-                if summary_text:
-                    await self.send_text(f"📊 {user_name}的{time_range}总结\n\n{summary_text}")
-                    return True, "发送文字版总结", True
-                else:
-                    await self.send_text("生成总结失败了，请稍后再试~")
-                    return False, "生成失败", False
+                except Exception as e:
+                    logger.error(f"生成个人总结图片失败: {e}", exc_info=True)
+                    # 如果图片生成失败，发送文字版本
+                    if summary_text:
+                        await self.send_text(f"📊 {user_name}的{time_range}总结\n\n{summary_text}")
+                        return True, "发送文字版总结", True
+                    else:
+                        await self.send_text("生成总结失败了，请稍后再试~")
+                        return False, "生成失败", False
+            finally:
+                _summaries_in_progress.discard(cache_key)
 
         except Exception as e:
             logger.error(f"执行个人总结命令出错: {e}", exc_info=True)
@@ -864,65 +1089,7 @@ class UserSummaryCommand(BaseCommand):
 
     def _parse_time_range(self, time_range: str) -> Tuple[Optional[float], Optional[float]]:
         """解析时间范围"""
-        now = datetime.now()
-        today_start = datetime(now.year, now.month, now.day)
-
-        try:
-            if time_range == "今天" or time_range == "":
-                start_time = today_start
-                end_time = now
-            elif time_range == "昨天":
-                start_time = today_start - timedelta(days=1)
-                end_time = today_start
-            else:
-                return None, None
-
-            return start_time.timestamp(), end_time.timestamp()
-
-        except Exception as e:
-            logger.error(f"解析时间范围出错: {e}")
-            return None, None
-
-    async def _get_messages(
-        self, start_time: float, end_time: float
-    ) -> List[dict]:
-        """获取聊天记录"""
-        try:
-            if not self.message.chat_stream:
-                logger.error("chat_stream 为空")
-                return []
-
-            chat_id = self.message.chat_stream.stream_id
-
-            all_messages = await database_api.db_query(
-                Messages,
-                query_type="get",
-                filters={"chat_id": chat_id},
-                order_by=["-time"],
-            )
-
-            if not all_messages or all_messages is None:
-                return []
-
-            filtered_messages = []
-
-            for msg in all_messages:
-                msg_time = msg.get("time", 0)
-                if not (start_time <= msg_time < end_time):
-                    continue
-
-                if msg.get("is_command") or msg.get("is_notify"):
-                    continue
-
-                filtered_messages.append(msg)
-
-            filtered_messages.sort(key=lambda x: x.get("time", 0))
-
-            return filtered_messages
-
-        except Exception as e:
-            logger.error(f"获取聊天记录出错: {e}", exc_info=True)
-            return []
+        return parse_time_range(time_range)
 
 
 class DailySummaryEventHandler(BaseEventHandler):
@@ -962,241 +1129,138 @@ class DailySummaryEventHandler(BaseEventHandler):
             start_time = today_start.timestamp()
             end_time = now.timestamp()
 
-            # 获取今天有消息的所有群聊ID
-            all_messages = await database_api.db_query(
-                Messages,
-                query_type="get",
-                filters={},
-                order_by=["-time"],
-            )
-
-            if not all_messages:
-                return
-
-            # 提取唯一的 chat_id 并建立 chat_id -> group_id 的映射
-            chat_id_to_group_id = {}
-            today_message_count = 0
-
-            for msg in all_messages:
-                msg_time = msg.get("time", 0)
-                if start_time <= msg_time < end_time:
-                    today_message_count += 1
-                    chat_id = msg.get("chat_id")
-                    group_id = msg.get("chat_info_group_id")
-
-                    if chat_id and chat_id not in chat_id_to_group_id:
-                        chat_id_to_group_id[chat_id] = group_id
+            # 获取配置（每次任务只读取一次，所有群共用）
+            target_chats = parse_config_int_set(self.get_config("auto_summary.target_chats", ""))
+            min_messages = self.get_config("auto_summary.min_messages", 10)
+            max_prompt_chars = self.get_config("summary.max_prompt_chars", 30000)
+            # 图片配置和所有群相同的参数（自动总结使用今天的日期）
+            image_options = {
+                "title": "📊 今日群聊总结",
+                "time_info": now.strftime("%Y-%m-%d"),
+                "target_date": now,
+                "display_order": parse_config_list(
+                    self.get_config("summary.display_order", "24H,Topics,Portraits,Quotes,Rankings")
+                ),
+                "max_depression_display": self.get_config("summary.max_depression_display", 6),
+                "depression_show_bottom": self.get_config("summary.depression_show_bottom", True),
+                "image_format": self.get_config("summary.image_format", "jpeg"),
+            }
+
+            # 获取今天消息数达到要求的聊天，建立 chat_id -> group_id 的映射
+            # 只查询今天的范围，配置了目标群聊时按实际的 group_id 在数据库中过滤，
+            # 消息太少的群在分组计数时直接排除，不再逐个查询聊天记录
+            target_group_ids = {str(gid) for gid in target_chats}
+            chat_id_to_group_id = query_active_chats(start_time, end_time, target_group_ids, min_messages)
 
             if not chat_id_to_group_id:
                 return
 
-            # 获取配置
-            target_chats = parse_config_int_list(self.get_config("auto_summary.target_chats", ""))
-            min_messages = self.get_config("auto_summary.min_messages", 10)
-
-            # 过滤目标群聊（使用实际的 group_id 进行匹配）
-            if target_chats:
-                target_group_ids = set(str(gid) for gid in target_chats)
-                filtered_chat_ids = {}
-
-                for chat_id, group_id in chat_id_to_group_id.items():
-                    if str(group_id) in target_group_ids:
-                        filtered_chat_ids[chat_id] = group_id
+            # 为每个群聊生成总结：各群互不影响，并发执行（限制同时进行的群数，避免 LLM 限流和渲染占用过多内存）
+            semaphore = asyncio.Semaphore(AnalysisConfig.DAILY_SUMMARY_CONCURRENCY)
 
-                chat_id_to_group_id = filtered_chat_ids
-
-            # 为每个群聊生成总结
-            for chat_id, group_id in chat_id_to_group_id.items():
-                try:
-                    # 获取今天的聊天记录
-                    messages = await self._get_messages_for_chat(
-                        chat_id, start_time, end_time
+            async def summarize_with_limit(chat_id: str, group_id):
+                async with semaphore:
+                    await self._generate_daily_summary_for_chat(
+                        chat_id, group_id, start_time, end_time, min_messages, max_prompt_chars, image_options
                     )
 
-                    # 检查消息数量是否达到最小要求
-                    if len(messages) < min_messages:
-                        continue
-
-                    # 生成总结
-                    summary = await self._generate_summary_for_chat(messages)
-
-                    if summary:
-                        # 生成并发送图片
-                        try:
-                            # 统计参与用户
-                            participants = set()
-                            for msg in messages:
-                                nickname = msg.get("user_nickname", "")
-                                if nickname:
-                                    participants.add(nickname)
-
-                            # 分析用户统计
-                            user_stats = ChatAnalysisUtils.analyze_user_stats(messages)
-                            user_titles = []
-                            golden_quotes = []
-                            topics = []
-
-                            # 计算24小时发言分布
-                            from collections import Counter
-                            hourly_distribution = Counter()
-                            for msg in messages:
-                                timestamp = msg.get("time", 0)
-                                hour = datetime.fromtimestamp(timestamp).hour
-                                hourly_distribution[hour] += 1
-                            # 转换为普通字典
-                            hourly_distribution = dict(hourly_distribution)
-
-                            # 始终分析所有数据，由 display_order 控制显示
-                            topics = await ChatAnalysisUtils.analyze_topics(messages) or []
-                            user_titles = await ChatAnalysisUtils.analyze_user_titles(messages, user_stats) or []
-                            golden_quotes = await ChatAnalysisUtils.analyze_golden_quotes(messages) or []
-                            depression_index = await ChatAnalysisUtils.analyze_depression_index(messages, user_stats) or []
-
-                            # 为 user_titles 添加头像数据
-                            if user_titles:
-                                for title_item in user_titles:
-                                    user_id = title_item.get("user_id", "")
-                                    if user_id:
-                                        # QQ头像URL格式
-                                        title_item["avatar_data"] = f"https://q1.qlogo.cn/g?b=qq&nk={user_id}&s=100"
-                                    else:
-                                        title_item["avatar_data"] = ""
-
-                            # 获取显示顺序配置
-                            display_order = parse_config_list(self.get_config("summary.display_order", "24H,Topics,Portraits,Quotes,Rankings"))
-
-                            # 获取炫压抑评级配置
-                            max_depression_display = self.get_config("summary.max_depression_display", 6)
-                            depression_show_bottom = self.get_config("summary.depression_show_bottom", True)
-
-                            # 自动总结使用今天的日期
-                            target_date = datetime.now()
-
-                            # 生成图片并获取临时文件路径
-                            img_path = await SummaryImageGenerator.generate_summary_image(
-                                title="📊 今日群聊总结",
-                                summary_text=summary,
-                                time_info=target_date.strftime("%Y-%m-%d"),
-                                message_count=len(messages),
-                                participant_count=len(participants),
-                                topics=topics,
-                                user_titles=user_titles,
-                                golden_quotes=golden_quotes,
-                                depression_index=depression_index,
-                                hourly_distribution=hourly_distribution,
-                                group_id=str(group_id),  # 添加群号用于标识和清理旧图片
-                                display_order=display_order,
-                                target_date=target_date,
-                                max_depression_display=max_depression_display,
-                                depression_show_bottom=depression_show_bottom
-                            )
-
-                            # 发送图片
-                            try:
-                                if not os.path.exists(img_path):
-                                    raise FileNotFoundError(f"图片文件不存在: {img_path}")
-
-                                with open(img_path, 'rb') as f:
-                                    img_data = f.read()
-
-                                import base64
-                                img_base64 = base64.b64encode(img_data).decode('utf-8')
-                                await send_api.image_to_stream(img_base64, chat_id, storage_message=False)
-                                await asyncio.sleep(2)
-                            finally:
-                                try:
-                                    if os.path.exists(img_path):
-                                        os.remove(img_path)
-                                except Exception as e:
-                                    logger.warning(f"清理临时图片失败: {e}")
-
-                        except Exception as e:
-                            logger.error(f"生成图片失败，使用文本输出: {e}", exc_info=True)
-                            # 降级到文本输出
-                            prefix = "📊 今日群聊总结\n\n"
-                            await send_api.text_to_stream(prefix + summary, chat_id, storage_message=False)
-                    else:
-                        logger.warning(f"群聊 {group_id} 总结生成失败")
-
-                except Exception as e:
-                    logger.error(f"为群聊 {group_id} 生成总结失败: {e}", exc_info=True)
+            await asyncio.gather(*(
+                summarize_with_limit(chat_id, group_id)
+                for chat_id, group_id in chat_id_to_group_id.items()
+            ))
 
         except Exception as e:
             logger.error(f"生成每日总结失败: {e}", exc_info=True)
 
-    async def _get_messages_for_chat(
-        self, chat_id: str, start_time: float, end_time: float
-    ) -> List[dict]:
-        """获取指定群聊的聊天记录"""
-        try:
-            # 查询消息
-            all_messages = await database_api.db_query(
-                Messages,
-                query_type="get",
-                filters={"chat_id": chat_id},
-                order_by=["-time"],
-            )
-
-            if not all_messages:
-                return []
+    async def _generate_daily_summary_for_chat(
+        self,
+        chat_id: str,
+        group_id,
+        start_time: float,
+        end_time: float,
+        min_messages: int,
+        max_prompt_chars: int,
+        image_options: Dict,
+    ):
+        """为单个群聊生成并发送今日总结（出错只记录日志，不影响其他群）
 
-            # 过滤时间范围和消息类型
-            filtered_messages = []
-            for msg in all_messages:
-                msg_time = msg.get("time", 0)
-                if not (start_time <= msg_time < end_time):
-                    continue
+        Args:
+            chat_id: 聊天ID
+            group_id: 群号
+            start_time: 起始时间戳
+            end_time: 结束时间戳
+            min_messages: 生成总结所需的最少消息数量
+            max_prompt_chars: 文字总结的聊天记录最大字符数
+            image_options: 所有群共用的图片参数（标题、日期和显示配置）
+        """
+        try:
+            # 获取今天的聊天记录
+            messages = await load_chat_messages(chat_id, start_time, end_time)
 
-                # 排除命令和通知
-                if msg.get("is_command") or msg.get("is_notify"):
-                    continue
+            # 检查消息数量是否达到最小要求
+            if len(messages) < min_messages:
+                return
 
-                filtered_messages.append(msg)
+            # 预处理消息（只解析一次，供总结和各分析函数共用）
+            parsed_messages = ChatAnalysisUtils.preprocess_messages(messages)
 
-            # 按时间正序排序
-            filtered_messages.sort(key=lambda x: x.get("time", 0))
-            return filtered_messages
+            # 参与人数和24小时发言分布：小时取自预处理结果（按分钟缓存），不再逐条构造 datetime
+            participant_count, hourly_distribution = ChatAnalysisUtils.analyze_group_overview(parsed_messages)
 
-        except Exception as e:
-            logger.error(f"获取群聊 {chat_id} 的聊天记录出错: {e}", exc_info=True)
-            return []
+            # 生成总结
+            summary = await self._generate_summary_for_chat(parsed_messages, participant_count, max_prompt_chars)
 
-    async def _generate_summary_for_chat(self, messages: List[dict]) -> Optional[str]:
-        """为指定聊天记录生成总结"""
-        try:
-            # 构建聊天记录文本
-            chat_text = ChatAnalysisUtils.format_messages(messages)
+            if summary:
+                # 生成并发送图片
+                try:
+                    # 分析用户统计
+                    user_stats = ChatAnalysisUtils.analyze_user_stats(parsed_messages)
 
-            # 获取人设和回复风格
-            from src.config.config import global_config
-            bot_name = global_config.bot.nickname
-            personality = global_config.personality.personality
-            reply_style = global_config.personality.reply_style
+                    # 始终分析所有数据，由 display_order 控制显示
+                    # 四项 LLM 分析互不依赖，并发执行（失败项为空列表）
+                    topics, user_titles, golden_quotes, depression_index = await ChatAnalysisUtils.analyze_all(
+                        parsed_messages, user_stats
+                    )
 
-            # 统计参与用户
-            participants = set()
-            for msg in messages:
-                nickname = msg.get("user_nickname", "")
-                if nickname:
-                    participants.add(nickname)
+                    # 为 user_titles 添加头像数据
+                    attach_avatar_urls(user_titles)
 
-            # 构建提示词
-            prompt = f"""你是{bot_name}。{personality}
-{reply_style}
+                    # 生成图片（直接取回图片字节，不经临时文件）
+                    image_bytes = await SummaryImageGenerator.generate_summary_image(
+                        summary_text=summary,
+                        message_count=len(messages),
+                        participant_count=participant_count,
+                        topics=topics,
+                        user_titles=user_titles,
+                        golden_quotes=golden_quotes,
+                        depression_index=depression_index,
+                        hourly_distribution=hourly_distribution,
+                        group_id=str(group_id),  # 添加群号用于标识和清理旧图片
+                        return_bytes=True,
+                        **image_options
+                    )
 
-以下是群聊记录（{len(messages)}条消息，{len(participants)}人参与）：
-{chat_text}
+                    # 发送图片（发送接口只接受 base64 图片数据）
+                    img_base64 = base64.b64encode(image_bytes).decode("ascii")
+                    await send_api.image_to_stream(img_base64, chat_id, storage_message=False)
 
-请像给朋友讲故事一样复述群里发生了什么。
+                except Exception as e:
+                    logger.error(f"生成图片失败，使用文本输出: {e}", exc_info=True)
+                    # 降级到文本输出
+                    prefix = "📊 今日群聊总结\n\n"
+                    await send_api.text_to_stream(prefix + summary, chat_id, storage_message=False)
+            else:
+                logger.warning(f"群聊 {group_id} 总结生成失败")
 
-要求：
-1. 按时间顺序讲，保持连贯性
-2. 精彩内容详细说，平淡内容略过
-3. 对话要说清谁说了什么、谁怎么回的
-4. 必须有具体人名和具体内容，不要抽象描述
-5. 口语化，不要用"首先""其次""然后""总之"这类词
+        except Exception as e:
+            logger.error(f"为群聊 {group_id} 生成总结失败: {e}", exc_info=True)
 
-直接开始，不要标题。"""
+    async def _generate_summary_for_chat(
+        self, messages: List[dict], participant_count: Optional[int] = None, max_prompt_chars: int = 0
+    ) -> Optional[str]:
+        """为指定聊天记录生成总结（participant_count、max_prompt_chars 由调用方读取后传入）"""
+        try:
+            prompt = build_summary_prompt(messages, participant_count, max_prompt_chars)
 
             # 使用LLM生成总结
             model_task_config = model_config.model_task_config.replyer
@@ -1218,6 +1282,29 @@ class DailySummaryEventHandler(BaseEventHandler):
             return None
 
 
+class SummaryShutdownEventHandler(BaseEventHandler):
+    """程序退出时停止定时任务并关闭渲染浏览器"""
+
+    event_type = EventType.ON_STOP
+    handler_name = "summary_shutdown_handler"
+    handler_description = "停止每日总结定时任务并关闭渲染器"
+    weight = 10
+    intercept_message = False
+
+    async def execute(
+        self, message: MaiMessages | None
+    ) -> Tuple[bool, bool, Optional[str], Optional[any], Optional[MaiMessages]]:
+        """执行事件处理"""
+        scheduler = DailySummaryEventHandler._scheduler
+        if scheduler is not None:
+            await scheduler.stop()
+            DailySummaryEventHandler._scheduler = None
+            DailySummaryEventHandler._scheduler_started = False
+
+        await close_renderer()
+        return True, True, None, None, None
+
+
 @register_plugin
 class ChatSummaryPlugin(BasePlugin):
     """聊天记录总结插件"""
@@ -1240,7 +1327,7 @@ class ChatSummaryPlugin(BasePlugin):
     # 配置Schema定义
     config_schema: dict = {
         "plugin": {
-            "config_version": ConfigField(type=str, default="1.3.0", description="配置文件版本"),
+            "config_version": ConfigField(type=str, default="1.4.0", description="配置文件版本"),
             "enabled": ConfigField(type=bool, default=False, description="是否启用插件"),
         },
         "summary": {
@@ -1261,6 +1348,21 @@ class ChatSummaryPlugin(BasePlugin):
                 default=True,
                 description="是否展示倒数排名（开启：前N/2名+后N/2名；关闭：只展示前N名）",
             ),
+            "min_messages": ConfigField(
+                type=int,
+                default=20,
+                description="生成图片总结所需的最少消息数量（不足时只发送文字总结，跳过话题/画像/金句/评级分析；0=不限制）",
+            ),
+            "max_prompt_chars": ConfigField(
+                type=int,
+                default=30000,
+                description="文字总结发送给模型的聊天记录最大字符数（超出时保留开头和结尾，中间省略；0=不限制）",
+            ),
+            "image_format": ConfigField(
+                type=str,
+                default="jpeg",
+                description="总结图片格式（jpeg 或 webp；webp 体积更小，需要安装 Pillow，未安装时仍使用 jpeg），个人总结同样生效",
+            ),
         },
         "user_summary": {
             "enabled": ConfigField(type=bool, default=True, description="是否启用个人总结功能（关闭后所有人都无法使用/mysummary命令）"),
@@ -1282,7 +1384,7 @@ class ChatSummaryPlugin(BasePlugin):
         "auto_summary": {
             "enabled": ConfigField(type=bool, default=False, description="是否启用每日自动总结"),
             "time": ConfigField(type=str, default="23:00", description="每日自动总结的时间（HH:MM格式）"),
-            "timezone": ConfigField(type=str, default="Asia/Shanghai", description="时区设置（需安装pytz模块）"),
+            "timezone": ConfigField(type=str, default="Asia/Shanghai", description="时区设置（使用标准库 zoneinfo，不可用时需安装pytz模块）"),
             "min_messages": ConfigField(type=int, default=10, description="生成总结所需的最少消息数量"),
             "target_chats": ConfigField(
                 type=str,
@@ -1320,4 +1422,5 @@ class ChatSummaryPlugin(BasePlugin):
             (ChatSummaryCommand.get_command_info(), ChatSummaryCommand),
             (UserSummaryCommand.get_command_info(), UserSummaryCommand),
             (DailySummaryEventHandler.get_handler_info(), DailySummaryEventHandler),
+            (SummaryShutdownEventHandler.get_handler_info(), SummaryShutdownEventHandler),
         ]